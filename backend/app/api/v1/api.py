@@ -3,7 +3,7 @@ API v1 Router - Aggregates all API endpoints
 """
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import camera, esp32, n8n, sensors, ai_chat
+from app.api.v1.endpoints import camera, esp32, n8n, sensors, ai_chat, debug, jobs
 
 api_router = APIRouter()
 
@@ -13,3 +13,5 @@ api_router.include_router(esp32.router, prefix="/esp32", tags=["esp32"])
 api_router.include_router(n8n.router, prefix="/n8n", tags=["n8n"])
 api_router.include_router(sensors.router, prefix="/sensors", tags=["sensors"])
 api_router.include_router(ai_chat.router, prefix="/ai", tags=["ai"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(debug.router, prefix="/debug", tags=["debug"])
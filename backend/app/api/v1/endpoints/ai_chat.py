@@ -2,14 +2,18 @@
 AI Chat API endpoints
 Handles AI vision analysis, chat interactions, and image understanding
 """
-from fastapi import APIRouter, HTTPException, Body, File, UploadFile
+from fastapi import APIRouter, HTTPException, Body, File, UploadFile, Query
 from typing import Optional, List
 import base64
 import logging
 import os
 
+from app.api.v1.endpoints.jobs import submit_job
 from app.core.config import settings
+from app.core.metrics import track_upstream
 from app.models.ai import ChatMessage, ImageAnalysisRequest, ImageAnalysisResponse, ChatResponse
+from app.services.events import bus, AnalysisDone
+from app.services.vision import analyze_image as analyze
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -19,7 +23,8 @@ logger = logging.getLogger(__name__)
 async def analyze_image(
     filename: Optional[str] = Body(None, description="Image filename from captures folder"),
     image_file: Optional[UploadFile] = File(None, description="Upload image directly"),
-    prompt: str = Body("What do you see in this image?", description="Analysis prompt")
+    prompt: str = Body("What do you see in this image?", description="Analysis prompt"),
+    background: bool = Query(False, description="Run as a background job (filename only)")
 ):
     """
     Analyze an image using AI vision model
@@ -28,6 +33,9 @@ async def analyze_image(
     - An existing image from the captures folder (by filename)
     - A newly uploaded image file
     
+    With `background=true` an existing image is analyzed as an
+    `analyze_image` job; follow it with `GET /jobs/{id}`.
+    
     Requires OPENAI_API_KEY to be configured
     """
     if not settings.OPENAI_API_KEY:
@@ -36,6 +44,13 @@ async def analyze_image(
             detail="AI service not configured. Set OPENAI_API_KEY environment variable."
         )
     
+    if background:
+        if not filename:
+            raise HTTPException(status_code=400, detail="Background analysis needs a filename")
+        if not os.path.exists(os.path.join(settings.CAPTURE_DIR, filename)):
+            raise HTTPException(status_code=404, detail="Image not found")
+        return await submit_job("analyze_image", {"filename": filename, "prompt": prompt, "trigger": "api"})
+    
     try:
         # Get image data
         if filename:
@@ -50,20 +65,11 @@ async def analyze_image(
         else:
             raise HTTPException(status_code=400, detail="Either filename or image_file must be provided")
         
-        # Encode image to base64
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        # Call OpenAI Vision API (placeholder - implement actual API call)
-        # This would use the OpenAI Python SDK
-        logger.info(f"Analyzing image with prompt: {prompt}")
-        
-        # Placeholder response
-        analysis = {
-            "description": "This is a placeholder response. Implement OpenAI Vision API integration.",
-            "objects_detected": ["camera", "device"],
-            "confidence": 0.85,
-            "tags": ["technology", "electronics"]
-        }
+        analysis = await analyze(image_data, prompt)
+        if filename:
+            bus.publish_nowait(AnalysisDone(
+                filename=filename, analysis=analysis, prompt=prompt, model=settings.AI_MODEL, trigger="api"
+            ))
         
         return ImageAnalysisResponse(
             success=True,
@@ -132,8 +138,9 @@ async def chat_with_ai(
         # Call OpenAI API (placeholder)
         logger.info(f"Chat request: {message}")
         
-        # Placeholder response
-        response_text = "This is a placeholder AI response. Implement OpenAI Chat API integration to get real responses."
+        # Placeholder response (the API call goes inside the timed block)
+        with track_upstream("ai", "chat"):
+            response_text = "This is a placeholder AI response. Implement OpenAI Chat API integration to get real responses."
         
         return ChatResponse(
             success=True,
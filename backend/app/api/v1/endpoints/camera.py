@@ -6,17 +6,42 @@ from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse, FileResponse
 from typing import Optional, List
 from datetime import datetime
+import asyncio
 import httpx
 import os
 import logging
 
+from app.api.v1.endpoints.jobs import submit_job
 from app.core.config import settings
 from app.models.camera import CaptureResponse, CameraSettings, ImageMetadata
+from app.models.jobs import BatchDeleteRequest
+from app.services.admission import admission, AdmissionRejected, Slot
+from app.services.capture import CaptureError, capture_timestamp, fetch_image, relabel_image, save_image
+from app.services.events import bus, CaptureSaved
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+class SlotStreamingResponse(StreamingResponse):
+    """
+    Streaming response holding an upstream slot until it is finished with
+
+    The slot is released when the response ends for any reason, including a
+    client that disconnects before the body is iterated at all.
+    """
+
+    def __init__(self, content, slot: Slot, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release()
+
+
 @router.post("/capture", response_model=CaptureResponse)
 async def capture_image(
     save: bool = Query(True, description="Save image to disk"),
@@ -29,48 +54,38 @@ async def capture_image(
     - **label**: Optional custom label for the image filename
     """
     try:
-        async with httpx.AsyncClient(timeout=settings.ESP32_TIMEOUT) as client:
-            response = await client.get(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/capture")
+        try:
+            image_data = await fetch_image()
+        except CaptureError:
+            raise HTTPException(status_code=500, detail="Failed to capture image from ESP32")
+        timestamp = capture_timestamp()
+        
+        if save:
+            filename, filepath = await asyncio.to_thread(save_image, image_data, timestamp, label)
+            bus.publish_nowait(CaptureSaved(
+                filename=filename, filepath=filepath, size_bytes=len(image_data), trigger="api"
+            ))
             
-            if response.status_code != 200:
-                raise HTTPException(status_code=500, detail="Failed to capture image from ESP32")
+            logger.info(f"Image captured and saved: {filename}")
             
-            image_data = response.content
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            return CaptureResponse(
+                success=True,
+                filename=filename,
+                filepath=filepath,
+                size_bytes=len(image_data),
+                timestamp=timestamp,
+                message="Image captured successfully"
+            )
+        else:
+            return CaptureResponse(
+                success=True,
+                size_bytes=len(image_data),
+                timestamp=timestamp,
+                message="Image captured (not saved)"
+            )
             
-            if save:
-                # Create filename with optional label
-                if label:
-                    filename = f"capture_{timestamp}_{label}.jpg"
-                else:
-                    filename = f"capture_{timestamp}.jpg"
-                
-                filepath = os.path.join(settings.CAPTURE_DIR, filename)
-                
-                # Ensure capture directory exists
-                os.makedirs(settings.CAPTURE_DIR, exist_ok=True)
-                
-                with open(filepath, 'wb') as f:
-                    f.write(image_data)
-                
-                logger.info(f"Image captured and saved: {filename}")
-                
-                return CaptureResponse(
-                    success=True,
-                    filename=filename,
-                    filepath=filepath,
-                    size_bytes=len(image_data),
-                    timestamp=timestamp,
-                    message="Image captured successfully"
-                )
-            else:
-                return CaptureResponse(
-                    success=True,
-                    size_bytes=len(image_data),
-                    timestamp=timestamp,
-                    message="Image captured (not saved)"
-                )
-                
+    except (HTTPException, AdmissionRejected):
+        raise
     except httpx.TimeoutException:
         logger.error("ESP32 connection timeout")
         raise HTTPException(status_code=504, detail="ESP32 connection timeout")
@@ -85,15 +100,21 @@ async def stream_camera():
     Get live camera stream from ESP32
     Returns MJPEG stream
     """
+    # Hold a stream slot for the whole transfer; taken here so a busy device is a 503
+    slot = await admission.hold("esp32_stream")
     try:
         async def generate():
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                async with client.stream('GET', f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/capture") as response:
-                    async for chunk in response.aiter_bytes():
-                        yield chunk
+            try:
+                async with httpx.AsyncClient(timeout=30.0) as client:
+                    async with client.stream('GET', f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/capture") as response:
+                        async for chunk in response.aiter_bytes():
+                            yield chunk
+            finally:
+                slot.release()
         
-        return StreamingResponse(generate(), media_type="image/jpeg")
+        return SlotStreamingResponse(generate(), slot, media_type="image/jpeg")
     except Exception as e:
+        slot.release()
         logger.error(f"Error streaming camera: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error streaming camera: {str(e)}")
 
@@ -172,6 +193,18 @@ async def delete_image(filename: str):
         raise HTTPException(status_code=500, detail=f"Error deleting image: {str(e)}")
 
 
+@router.post("/images/batch-delete", status_code=202)
+async def batch_delete_images(request: BatchDeleteRequest):
+    """
+    Delete several images in the background
+
+    Returns a `delete_images` job; follow it with `GET /jobs/{id}`.
+
+    - **filenames**: Capture file names to delete
+    """
+    return await submit_job("delete_images", {"filenames": request.filenames})
+
+
 @router.post("/images/{filename}/rename")
 async def rename_image(filename: str, new_label: str):
     """
@@ -183,16 +216,7 @@ async def rename_image(filename: str, new_label: str):
         raise HTTPException(status_code=404, detail="Image not found")
     
     try:
-        # Extract timestamp from original filename
-        parts = filename.split('_')
-        if len(parts) >= 3:
-            timestamp = f"{parts[1]}_{parts[2].split('.')[0]}"
-            new_filename = f"capture_{timestamp}_{new_label}.jpg"
-        else:
-            new_filename = f"{new_label}.jpg"
-        
-        new_filepath = os.path.join(settings.CAPTURE_DIR, new_filename)
-        os.rename(old_filepath, new_filepath)
+        new_filename = relabel_image(filename, new_label)
         
         logger.info(f"Image renamed: {filename} -> {new_filename}")
         return {
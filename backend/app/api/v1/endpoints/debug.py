@@ -0,0 +1,108 @@
+"""
+Debug API endpoints
+Runtime diagnostics for the running backend process
+"""
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+import asyncio
+import logging
+import threading
+
+from app.core.config import settings
+from app.core.loop_monitor import monitor as loop_monitor
+from app.core.profiler import profiler, render_collapsed, ProfilerBusyError
+from app.core.rate_limit import limiter
+from app.services.admission import admission
+from app.services.events import bus
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("/loop")
+async def get_loop_report(
+    limit: int = Query(20, ge=1, le=200, description="Maximum number of offenders to return")
+):
+    """
+    Event loop lag and the worst blocking offenders
+    
+    Offenders are grouped by route and blocking call site, sorted by total
+    time the loop was blocked.
+    """
+    if not settings.LOOP_MONITOR_ENABLED:
+        raise HTTPException(status_code=404, detail="Loop monitor is not enabled")
+    
+    return loop_monitor.report(limit=limit)
+
+
+@router.delete("/loop")
+async def reset_loop_report():
+    """
+    Reset collected blocking offenders (e.g. after deploying a fix)
+    """
+    if not settings.LOOP_MONITOR_ENABLED:
+        raise HTTPException(status_code=404, detail="Loop monitor is not enabled")
+    
+    loop_monitor.reset()
+    logger.info("Loop monitor report reset")
+    return {"success": True, "message": "Loop monitor report reset"}
+
+
+@router.get("/events")
+async def get_event_bus_stats():
+    """
+    Event bus topics and subscribers
+    
+    Per subscriber: backpressure policy, queue depth, handled/failed counts
+    and events shed because its queue was full.
+    """
+    return bus.stats()
+
+
+@router.get("/limits")
+async def get_limits():
+    """
+    Rate limiter and upstream admission control
+    
+    Rate limits per route with the number of buckets tracked and requests
+    rejected; per upstream: slots in flight, callers waiting and calls refused.
+    """
+    return {
+        "rate_limit": {"enabled": settings.RATE_LIMIT_ENABLED, **limiter.stats()},
+        "upstreams": admission.stats()
+    }
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def run_profile(
+    seconds: float = Query(10, gt=0, description="Profile duration in seconds"),
+    interval_ms: float = Query(10, ge=1, le=1000, description="Sampling interval in milliseconds"),
+    all_threads: bool = Query(False, description="Sample every thread, not just the event loop"),
+    lines: bool = Query(False, description="Split frames by line number")
+):
+    """
+    Sample the running process and return collapsed stacks
+    
+    Output is flamegraph-compatible (`frame;frame;frame count` per line).
+    Only one profile runs at a time. Disabled unless PROFILER_ENABLED=true.
+    """
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is not enabled")
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be at most {settings.PROFILER_MAX_SECONDS}"
+        )
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    # This handler runs on the event loop thread, which is what we usually want to see
+    loop_thread_id = None if all_threads else threading.get_ident()
+    logger.info(f"Profiling for {seconds}s every {interval_ms}ms")
+    
+    try:
+        stacks = await asyncio.to_thread(profiler.run, seconds, interval_ms / 1000, loop_thread_id, lines)
+    except ProfilerBusyError:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    return PlainTextResponse(render_collapsed(stacks))
@@ -2,14 +2,18 @@
 ESP32 Device Management API endpoints
 Handles device status, diagnostics, and configuration
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 import httpx
 import logging
 import asyncio
 
+from app.api.v1.endpoints.jobs import submit_job
 from app.core.config import settings
+from app.core.metrics import track_upstream
 from app.models.esp32 import DeviceStatus, DeviceInfo, NetworkInfo, SystemStats
+from app.services.admission import admission, AdmissionRejected
+from app.services.diagnostics import empty_results, hardware_test
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -23,9 +27,10 @@ async def get_device_status():
     Returns connectivity status, uptime, and basic health metrics
     """
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
+        async with admission.slot("esp32"), httpx.AsyncClient(timeout=5.0) as client:
             start_time = asyncio.get_event_loop().time()
-            response = await client.get(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/")
+            with track_upstream("esp32", "status"):
+                response = await client.get(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/")
             end_time = asyncio.get_event_loop().time()
             
             response_time_ms = int((end_time - start_time) * 1000)
@@ -37,6 +42,8 @@ async def get_device_status():
                 http_status=response.status_code,
                 message="ESP32 is online and responding"
             )
+    except AdmissionRejected:
+        raise
     except httpx.TimeoutException:
         logger.warning("ESP32 connection timeout")
         return DeviceStatus(
@@ -129,9 +136,10 @@ async def restart_device():
     Sends a restart command to the ESP32
     """
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
+        async with admission.slot("esp32"), httpx.AsyncClient(timeout=5.0) as client:
             # This would need a /restart endpoint on the ESP32
-            response = await client.post(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/restart")
+            with track_upstream("esp32", "restart"):
+                response = await client.post(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/restart")
             
             if response.status_code == 200:
                 logger.info("ESP32 restart command sent")
@@ -141,50 +149,30 @@ async def restart_device():
                 }
             else:
                 raise HTTPException(status_code=500, detail="Failed to send restart command")
+    except (HTTPException, AdmissionRejected):
+        raise
     except Exception as e:
         logger.error(f"Error restarting device: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error restarting device: {str(e)}")
 
 
 @router.post("/test")
-async def run_hardware_test():
+async def run_hardware_test(
+    background: bool = Query(False, description="Run as a background job and return its id")
+):
     """
     Run hardware diagnostic test on ESP32
     
-    Tests camera, LED, memory, and connectivity
+    Tests camera, LED, memory, and connectivity. With `background=true` the
+    test runs as an `esp32_diagnostics` job; follow it with `GET /jobs/{id}`.
     """
-    results = {
-        "connectivity": False,
-        "camera": False,
-        "led": False,
-        "memory": False,
-        "overall": False
-    }
+    if background:
+        return await submit_job("esp32_diagnostics", {})
+    
+    results = empty_results()
     
     try:
-        # Test 1: Connectivity
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/")
-            results["connectivity"] = response.status_code == 200
-        
-        # Test 2: Camera
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/capture")
-            results["camera"] = response.status_code == 200 and len(response.content) > 1000
-        
-        # Test 3: LED (would need ESP32 endpoint)
-        results["led"] = True  # Assume working if device is online
-        
-        # Test 4: Memory (would need ESP32 endpoint)
-        results["memory"] = True  # Assume working if device is online
-        
-        # Overall result
-        results["overall"] = all([
-            results["connectivity"],
-            results["camera"],
-            results["led"],
-            results["memory"]
-        ])
+        await hardware_test(results)
         
         logger.info(f"Hardware test completed: {results}")
         
@@ -194,6 +182,8 @@ async def run_hardware_test():
             "message": "Hardware test completed" if results["overall"] else "Some tests failed"
         }
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error running hardware test: {str(e)}")
         return {
@@ -211,9 +201,10 @@ async def ping_device():
     Returns response time in milliseconds
     """
     try:
-        async with httpx.AsyncClient(timeout=2.0) as client:
+        async with admission.slot("esp32"), httpx.AsyncClient(timeout=2.0) as client:
             start_time = asyncio.get_event_loop().time()
-            response = await client.get(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/")
+            with track_upstream("esp32", "ping"):
+                response = await client.get(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/")
             end_time = asyncio.get_event_loop().time()
             
             response_time_ms = int((end_time - start_time) * 1000)
@@ -224,6 +215,8 @@ async def ping_device():
                 "response_time_ms": response_time_ms,
                 "message": f"ESP32 responded in {response_time_ms}ms"
             }
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.warning(f"ESP32 ping failed: {str(e)}")
         return {
@@ -0,0 +1,137 @@
+"""
+Background job API endpoints
+Submit, follow and cancel long-running jobs
+"""
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse, JSONResponse
+from typing import Optional
+import os
+import logging
+
+from app.models.jobs import JobRequest
+from app.services.jobs import jobs, JobQueueFull, FINISHED, STATUSES
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+async def submit_job(job_type: str, params: dict, priority: int = 0, idempotency_key: Optional[str] = None) -> JSONResponse:
+    """Queue a job and answer 202 with it; shared by endpoints that offload work"""
+    try:
+        job, created = await jobs.submit(job_type, params, priority=priority, idempotency_key=idempotency_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Job queue is full, retry later", headers={"Retry-After": "5"})
+    if created:
+        logger.info(f"Job {job['id']} ({job_type}) queued")
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "duplicate": not created,
+        "job_id": job["id"],
+        "job": job
+    })
+
+
+@router.get("")
+async def list_jobs(
+    status: Optional[str] = Query(None, description=f"Filter by status ({', '.join(STATUSES)})"),
+    type: Optional[str] = Query(None, description="Filter by job type"),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of jobs to return")
+):
+    """
+    List jobs, most recent first (results are omitted; fetch a job for its result)
+
+    - **status**: Only jobs with this status
+    - **type**: Only jobs of this type
+    - **limit**: Maximum number of jobs to return (1-500)
+    """
+    if status is not None and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(STATUSES)}")
+    try:
+        return {
+            "stats": await jobs.stats(),
+            "jobs": await jobs.list(status, type, limit)
+        }
+    except Exception as e:
+        logger.error(f"Error listing jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error listing jobs: {str(e)}")
+
+
+@router.get("/types")
+async def list_job_types():
+    """
+    Registered job types with their required parameters and concurrency limits
+    """
+    return {
+        "types": [
+            {
+                "name": t.name,
+                "description": t.description,
+                "required": list(t.required),
+                "concurrency": t.concurrency,
+                "timeout_seconds": t.timeout
+            }
+            for t in jobs.types.values()
+        ]
+    }
+
+
+@router.post("", status_code=202)
+async def create_job(request: JobRequest):
+    """
+    Queue a background job
+
+    Returns at once with the job; follow it with `GET /jobs/{id}`.
+
+    - **type**: Job type (see `GET /jobs/types`)
+    - **params**: Parameters for the job type
+    - **priority**: Higher priorities run first
+    - **idempotency_key**: Repeated submits with the same key return the first job
+    """
+    return await submit_job(request.type, request.params, request.priority, request.idempotency_key)
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: int):
+    """
+    Status, progress and result of a job
+    """
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: int):
+    """
+    Cancel a queued or running job
+    """
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    status = await jobs.cancel(job_id)
+    return {
+        "success": status == "cancelled",
+        "job_id": job_id,
+        "status": status
+    }
+
+
+@router.get("/{job_id}/download")
+async def download_job_file(job_id: int):
+    """
+    Download the file a finished job produced (e.g. a readings export)
+    """
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    path = job["result"].get("file") if isinstance(job["result"], dict) else None
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Job has no file")
+    return FileResponse(path, filename=os.path.basename(path), media_type="application/x-ndjson")
@@ -2,24 +2,33 @@
 n8n Integration API endpoints
 Handles workflow triggers, webhook management, and n8n communication
 """
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Header, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from datetime import datetime
 from typing import Dict, Any, List, Optional
-import httpx
-import base64
+import json
 import logging
 
 from app.core.config import settings
 from app.models.n8n import WorkflowTrigger, WorkflowStatus, WebhookPayload
+from app.services.admission import AdmissionRejected
+from app.services.cache import AsyncTTLCache
+from app.services.n8n_client import n8n
+from app.services.n8n_inbound import receiver, InboundRejected
+from app.services.webhook_outbox import outbox, STATUSES
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-
-def get_n8n_auth():
-    """Get basic auth for n8n"""
-    credentials = f"{settings.N8N_BASIC_AUTH_USER}:{settings.N8N_BASIC_AUTH_PASSWORD}"
-    encoded = base64.b64encode(credentials.encode()).decode()
-    return f"Basic {encoded}"
+# Workflow list and details; our own activate/deactivate calls invalidate it
+workflow_cache = AsyncTTLCache(
+    "n8n_workflows",
+    ttl=settings.N8N_WORKFLOW_CACHE_TTL_SECONDS,
+    stale=settings.N8N_WORKFLOW_CACHE_STALE_SECONDS,
+)
+WORKFLOW_LIST_KEY = "list"
 
 
 @router.get("/status")
@@ -28,18 +37,17 @@ async def get_n8n_status():
     Check n8n server status and connectivity
     """
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(
-                f"{settings.N8N_URL}/healthz",
-                headers={"Authorization": get_n8n_auth()}
-            )
-            
-            return {
-                "online": response.status_code == 200,
-                "url": settings.N8N_URL,
-                "status_code": response.status_code,
-                "message": "n8n is online and responding"
-            }
+        response = await n8n.request("GET", "/healthz", "health", timeout=5.0)
+        
+        return {
+            "online": response.status_code == 200,
+            "url": settings.N8N_URL,
+            "status_code": response.status_code,
+            "message": "n8n is online and responding",
+            "client": n8n.stats(),
+            "workflow_cache": workflow_cache.stats(),
+            "inbound": receiver.stats()
+        }
     except Exception as e:
         logger.error(f"Error checking n8n status: {str(e)}")
         return {
@@ -49,27 +57,53 @@ async def get_n8n_status():
         }
 
 
+def _conditional_headers(current: Optional[dict]) -> Optional[Dict[str, str]]:
+    if current and current.get("etag"):
+        return {"If-None-Match": current["etag"]}
+    return None
+
+
+async def _fetch_workflows(current: Optional[dict]) -> dict:
+    response = await n8n.request(
+        "GET", "/api/v1/workflows", "list_workflows", headers=_conditional_headers(current)
+    )
+    if response.status_code == 304 and current:
+        return current
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Failed to fetch workflows")
+    return {"etag": response.headers.get("etag"), "data": response.json().get("data", [])}
+
+
+def _workflow_loader(workflow_id: str):
+    async def fetch(current: Optional[dict]) -> dict:
+        response = await n8n.request(
+            "GET", f"/api/v1/workflows/{workflow_id}", "get_workflow", headers=_conditional_headers(current)
+        )
+        if response.status_code == 304 and current:
+            return current
+        if response.status_code != 200:
+            raise HTTPException(status_code=404, detail="Workflow not found")
+        return {"etag": response.headers.get("etag"), "data": response.json()}
+    return fetch
+
+
 @router.get("/workflows")
 async def list_workflows():
     """
     List all n8n workflows
+    
+    Served from a short-lived cache (N8N_WORKFLOW_CACHE_TTL_SECONDS); stale
+    entries are returned while a single background refresh runs.
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{settings.N8N_URL}/api/v1/workflows",
-                headers={"Authorization": get_n8n_auth()}
-            )
-            
-            if response.status_code == 200:
-                workflows = response.json()
-                return {
-                    "success": True,
-                    "count": len(workflows.get("data", [])),
-                    "workflows": workflows.get("data", [])
-                }
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Failed to fetch workflows")
+        workflows = await workflow_cache.get(WORKFLOW_LIST_KEY, _fetch_workflows)
+        return {
+            "success": True,
+            "count": len(workflows["data"]),
+            "workflows": workflows["data"]
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing workflows: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error listing workflows: {str(e)}")
@@ -78,19 +112,13 @@ async def list_workflows():
 @router.get("/workflows/{workflow_id}")
 async def get_workflow(workflow_id: str):
     """
-    Get details of a specific workflow
+    Get details of a specific workflow (cached like the workflow list)
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{settings.N8N_URL}/api/v1/workflows/{workflow_id}",
-                headers={"Authorization": get_n8n_auth()}
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(status_code=404, detail="Workflow not found")
+        workflow = await workflow_cache.get(("workflow", workflow_id), _workflow_loader(workflow_id))
+        return workflow["data"]
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting workflow: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting workflow: {str(e)}")
@@ -102,18 +130,16 @@ async def activate_workflow(workflow_id: str):
     Activate a workflow
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.patch(
-                f"{settings.N8N_URL}/api/v1/workflows/{workflow_id}",
-                headers={"Authorization": get_n8n_auth()},
-                json={"active": True}
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"Workflow {workflow_id} activated")
-                return {"success": True, "message": f"Workflow {workflow_id} activated"}
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Failed to activate workflow")
+        response = await n8n.request(
+            "PATCH", f"/api/v1/workflows/{workflow_id}", "activate_workflow", json={"active": True}
+        )
+        
+        if response.status_code == 200:
+            workflow_cache.invalidate(WORKFLOW_LIST_KEY, ("workflow", workflow_id))
+            logger.info(f"Workflow {workflow_id} activated")
+            return {"success": True, "message": f"Workflow {workflow_id} activated"}
+        else:
+            raise HTTPException(status_code=response.status_code, detail="Failed to activate workflow")
     except Exception as e:
         logger.error(f"Error activating workflow: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error activating workflow: {str(e)}")
@@ -125,24 +151,22 @@ async def deactivate_workflow(workflow_id: str):
     Deactivate a workflow
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.patch(
-                f"{settings.N8N_URL}/api/v1/workflows/{workflow_id}",
-                headers={"Authorization": get_n8n_auth()},
-                json={"active": False}
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"Workflow {workflow_id} deactivated")
-                return {"success": True, "message": f"Workflow {workflow_id} deactivated"}
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Failed to deactivate workflow")
+        response = await n8n.request(
+            "PATCH", f"/api/v1/workflows/{workflow_id}", "deactivate_workflow", json={"active": False}
+        )
+        
+        if response.status_code == 200:
+            workflow_cache.invalidate(WORKFLOW_LIST_KEY, ("workflow", workflow_id))
+            logger.info(f"Workflow {workflow_id} deactivated")
+            return {"success": True, "message": f"Workflow {workflow_id} deactivated"}
+        else:
+            raise HTTPException(status_code=response.status_code, detail="Failed to deactivate workflow")
     except Exception as e:
         logger.error(f"Error deactivating workflow: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error deactivating workflow: {str(e)}")
 
 
-@router.post("/trigger/camera-capture")
+@router.post("/trigger/camera-capture", status_code=202)
 async def trigger_camera_capture_workflow(
     label: Optional[str] = None,
     metadata: Optional[Dict[str, Any]] = None
@@ -150,7 +174,8 @@ async def trigger_camera_capture_workflow(
     """
     Trigger n8n workflow for camera capture
     
-    This sends a webhook to n8n to start a camera capture workflow
+    Queues a webhook to n8n to start a camera capture workflow. The call is
+    delivered in the background; follow it with `GET /outbox/{delivery_id}`.
     """
     try:
         payload = {
@@ -160,28 +185,23 @@ async def trigger_camera_capture_workflow(
             "metadata": metadata or {}
         }
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # This assumes you have a webhook set up in n8n
-            response = await client.post(
-                f"{settings.N8N_URL}/webhook/camera-capture",
-                json=payload
-            )
-            
-            if response.status_code in [200, 201]:
-                logger.info("Camera capture workflow triggered")
-                return {
-                    "success": True,
-                    "message": "Camera capture workflow triggered",
-                    "payload": payload
-                }
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Failed to trigger workflow")
+        # This assumes you have a webhook set up in n8n
+        delivery_id = await outbox.enqueue("camera-capture", payload)
+        logger.info(f"Camera capture workflow queued (delivery {delivery_id})")
+        return {
+            "success": True,
+            "message": "Camera capture workflow queued",
+            "delivery_id": delivery_id,
+            "payload": payload
+        }
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error triggering workflow: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error triggering workflow: {str(e)}")
 
 
-@router.post("/trigger/motion-detected")
+@router.post("/trigger/motion-detected", status_code=202)
 async def trigger_motion_detection_workflow(
     sensor_id: str,
     confidence: float = 1.0,
@@ -190,11 +210,9 @@ async def trigger_motion_detection_workflow(
     """
     Trigger n8n workflow for motion detection
     
-    Sends motion detection event to n8n for processing
+    Queues a motion detection event for n8n; delivered in the background
     """
     try:
-        from datetime import datetime
-        
         payload = {
             "event": "motion_detected",
             "timestamp": datetime.now().isoformat(),
@@ -203,27 +221,22 @@ async def trigger_motion_detection_workflow(
             "metadata": metadata or {}
         }
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{settings.N8N_URL}/webhook/motion-detected",
-                json=payload
-            )
-            
-            if response.status_code in [200, 201]:
-                logger.info(f"Motion detection workflow triggered for sensor {sensor_id}")
-                return {
-                    "success": True,
-                    "message": "Motion detection workflow triggered",
-                    "payload": payload
-                }
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Failed to trigger workflow")
+        delivery_id = await outbox.enqueue("motion-detected", payload)
+        logger.info(f"Motion detection workflow queued for sensor {sensor_id} (delivery {delivery_id})")
+        return {
+            "success": True,
+            "message": "Motion detection workflow queued",
+            "delivery_id": delivery_id,
+            "payload": payload
+        }
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error triggering motion workflow: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error triggering motion workflow: {str(e)}")
 
 
-@router.post("/webhook/{webhook_name}")
+@router.post("/webhook/{webhook_name}", status_code=202)
 async def send_webhook(
     webhook_name: str,
     payload: Dict[str, Any] = Body(...)
@@ -231,51 +244,274 @@ async def send_webhook(
     """
     Send custom webhook to n8n
     
-    Generic endpoint to trigger any n8n webhook
+    Generic endpoint to trigger any n8n webhook. The call is queued in the
+    outbox and delivered in the background with retries.
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{settings.N8N_URL}/webhook/{webhook_name}",
-                json=payload
-            )
-            
-            if response.status_code in [200, 201]:
-                logger.info(f"Webhook {webhook_name} triggered")
-                return {
-                    "success": True,
-                    "message": f"Webhook {webhook_name} triggered",
-                    "response": response.json() if response.content else None
-                }
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Failed to send webhook")
+        delivery_id = await outbox.enqueue(webhook_name, payload)
+        logger.info(f"Webhook {webhook_name} queued (delivery {delivery_id})")
+        return {
+            "success": True,
+            "message": f"Webhook {webhook_name} queued",
+            "delivery_id": delivery_id
+        }
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error sending webhook: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error sending webhook: {str(e)}")
 
 
+@router.post("/inbound", status_code=202)
+async def receive_inbound_webhook(
+    request: Request,
+    x_n8n_timestamp: Optional[str] = Header(None),
+    x_n8n_signature: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Accept a signed callback from an n8n workflow
+    
+    The body is a WebhookPayload whose `event` names the command (`capture`,
+    `label_image`, `analyze_image`). It is acknowledged as soon as it is
+    verified and queued as a background job; follow it with `GET /jobs/{id}`.
+    
+    - **X-N8N-Timestamp**: epoch seconds, signed along with the body
+    - **X-N8N-Signature**: `sha256=` + hex HMAC-SHA256 of `<timestamp>.<body>` keyed with N8N_INBOUND_SECRET
+    - **Idempotency-Key**: repeated requests with the same key return the first job
+    """
+    if not receiver.enabled:
+        raise HTTPException(status_code=404, detail="Inbound webhooks are not enabled")
+    
+    body = await request.body()
+    try:
+        receiver.verify(body, x_n8n_timestamp, x_n8n_signature)
+        payload = WebhookPayload.model_validate_json(body)
+        key = idempotency_key or (payload.metadata or {}).get("idempotency_key")
+        job, duplicate = await receiver.accept(payload, str(key) if key is not None else None)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    except InboundRejected as e:
+        headers = {"Retry-After": "1"} if e.status_code == 503 else None
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+    
+    if not duplicate:
+        logger.info(f"n8n command {job['type']} accepted as job {job['id']}")
+    return {
+        "success": True,
+        "duplicate": duplicate,
+        "job_id": job["id"],
+        "job": job
+    }
+
+
+@router.get("/outbox")
+async def list_outbox(
+    status: Optional[str] = Query(None, description="pending, delivered or failed"),
+    webhook: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=1000)
+):
+    """
+    Webhook outbox status
+    
+    Counts per delivery status and the most recent entries.
+    
+    - **status**: only entries with this status
+    - **webhook**: only entries for this webhook
+    - **limit**: maximum entries returned (newest first)
+    """
+    if status is not None and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(STATUSES)}")
+    try:
+        return {
+            **(await outbox.stats()),
+            "entries": await outbox.list(status, webhook, limit)
+        }
+    except Exception as e:
+        logger.error(f"Error reading webhook outbox: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reading webhook outbox: {str(e)}")
+
+
+@router.get("/outbox/{delivery_id}")
+async def get_outbox_entry(delivery_id: int):
+    """
+    Delivery status of one queued webhook call
+    """
+    entry = await outbox.get(delivery_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Outbox entry {delivery_id} not found")
+    return entry
+
+
+@router.post("/outbox/{delivery_id}/retry")
+async def retry_outbox_entry(delivery_id: int):
+    """
+    Queue a failed webhook call for delivery again
+    
+    Answers 503 when the webhook already has N8N_OUTBOX_MAX_PENDING
+    undelivered events.
+    """
+    if not await outbox.retry(delivery_id):
+        raise HTTPException(status_code=409, detail=f"Outbox entry {delivery_id} is not in failed state")
+    return {
+        "success": True,
+        "message": f"Outbox entry {delivery_id} queued for retry"
+    }
+
+
+# n8n caps executions per page at 250
+EXECUTIONS_PAGE_MAX = 250
+
+
+def _execution_params(
+    limit: int,
+    cursor: Optional[str],
+    status: Optional[str],
+    workflow_id: Optional[str],
+    include_data: bool,
+) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    if status:
+        params["status"] = status
+    if workflow_id:
+        params["workflowId"] = workflow_id
+    if include_data:
+        params["includeData"] = "true"
+    return params
+
+
+def _fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Comma-separated field names to keep, or None for whole executions"""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()] or None
+
+
+def _project(items: List[dict], fields: Optional[List[str]]) -> List[dict]:
+    if fields is None:
+        return items
+    return [{f: item[f] for f in fields if f in item} for item in items]
+
+
+async def _fetch_executions(params: Dict[str, Any]) -> dict:
+    response = await n8n.request("GET", "/api/v1/executions", "list_executions", params=params)
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Failed to fetch executions")
+    return response.json()
+
+
 @router.get("/executions")
-async def list_executions(limit: int = 20):
+async def list_executions(
+    limit: int = Query(20, ge=1, le=EXECUTIONS_PAGE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    status: Optional[str] = Query(None, description="success, error or waiting"),
+    workflow_id: Optional[str] = None,
+    include_data: bool = False,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to keep, e.g. id,status,startedAt"),
+    stream: bool = Query(False, description="Pass the n8n response through unparsed")
+):
     """
     List recent workflow executions
+    
+    One page per call; pass **next_cursor** back as **cursor** for the next.
+    
+    - **fields**: return only these execution fields
+    - **stream**: relay n8n's own response body (`data` + `nextCursor`) as
+      it arrives, without parsing it; cannot be combined with **fields**
     """
+    params = _execution_params(limit, cursor, status, workflow_id, include_data)
+    if stream:
+        if fields:
+            raise HTTPException(status_code=400, detail="fields cannot be combined with stream")
+        return await _relay_executions(params)
+    
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{settings.N8N_URL}/api/v1/executions",
-                headers={"Authorization": get_n8n_auth()},
-                params={"limit": limit}
-            )
-            
-            if response.status_code == 200:
-                executions = response.json()
-                return {
-                    "success": True,
-                    "count": len(executions.get("data", [])),
-                    "executions": executions.get("data", [])
-                }
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Failed to fetch executions")
+        executions = await _fetch_executions(params)
+        data = _project(executions.get("data", []), _fields(fields))
+        return {
+            "success": True,
+            "count": len(data),
+            "executions": data,
+            "next_cursor": executions.get("nextCursor")
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing executions: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error listing executions: {str(e)}")
+
+
+async def _relay_executions(params: Dict[str, Any]) -> StreamingResponse:
+    """Forward the upstream body chunk by chunk (still compressed if n8n compressed it)"""
+    try:
+        response = await n8n.stream("GET", "/api/v1/executions", "list_executions", params=params)
+    except Exception as e:
+        logger.error(f"Error listing executions: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error listing executions: {str(e)}")
+    if response.status_code != 200:
+        await response.aclose()
+        raise HTTPException(status_code=response.status_code, detail="Failed to fetch executions")
+    
+    async def body():
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await response.aclose()
+    
+    headers = {}
+    if "content-encoding" in response.headers:
+        headers["Content-Encoding"] = response.headers["content-encoding"]
+    return StreamingResponse(
+        body(),
+        media_type=response.headers.get("content-type", "application/json"),
+        headers=headers
+    )
+
+
+@router.get("/executions/export")
+async def export_executions(
+    status: Optional[str] = Query(None, description="success, error or waiting"),
+    workflow_id: Optional[str] = None,
+    include_data: bool = False,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to keep"),
+    max_items: int = Query(10000, ge=1, description="Stop after this many executions")
+):
+    """
+    Stream executions across all pages as NDJSON
+    
+    Follows n8n's `nextCursor` one page at a time, writing each page out
+    before fetching the next, so memory stays bounded by one page.
+    """
+    params = _execution_params(min(EXECUTIONS_PAGE_MAX, max_items), None, status, workflow_id, include_data)
+    projection = _fields(fields)
+    try:
+        # First page up front so upstream errors still map to a status code
+        first = await _fetch_executions(params)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exporting executions: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error exporting executions: {str(e)}")
+    
+    async def body():
+        page, remaining = first, max_items
+        try:
+            while True:
+                items = _project(page.get("data", []), projection)[:remaining]
+                if items:
+                    yield ("\n".join(json.dumps(item) for item in items) + "\n").encode()
+                remaining -= len(items)
+                cursor = page.get("nextCursor")
+                if not cursor or remaining <= 0:
+                    break
+                params["cursor"] = cursor
+                params["limit"] = min(EXECUTIONS_PAGE_MAX, remaining)
+                page = await _fetch_executions(params)
+        except Exception as e:
+            # Headers are already sent; end the stream early
+            logger.error(f"Error exporting executions: {str(e)}")
+    
+    return StreamingResponse(body(), media_type="application/x-ndjson")
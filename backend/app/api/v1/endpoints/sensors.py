@@ -2,20 +2,106 @@
 Sensors API endpoints
 Handles motion sensors, LCD display, and other extensible sensors
 """
-from fastapi import APIRouter, HTTPException, Body
-from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, HTTPException, Body, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import asyncio
+import json
 import logging
+import time
 
+from app.api.v1.endpoints.jobs import submit_job
 from app.core.config import settings
-from app.models.sensors import SensorReading, MotionEvent, LCDMessage, SensorStatus
+from app.models.sensors import LCDMessage, SensorStatus
+from app.services.anomaly import detector
+from app.services.lcd import lcd_queue, UnknownDisplayError
+from app.services.motion_log import motion_log, event_to_dict
+from app.services.persistence import journal
+from app.services.rollups import AGGREGATES, format_bucket, parse_bucket, render
+from app.services.sensor_hub import hub, KINDS
+from app.services.sensor_registry import registry
+from app.services.sensor_store import store as sensor_store, SensorStoreFullError
+from app.services.sensor_ingest import (
+    record_reading, record_motion, ingest_json_array, ingest_ndjson, motion_debouncer, InvalidBatchError
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# In-memory storage for sensor data (use Redis/DB in production)
-motion_events: List[MotionEvent] = []
-sensor_readings: Dict[str, List[SensorReading]] = {}
+# Rows fetched per keyset page while streaming an export
+EXPORT_PAGE_SIZE = 1000
+
+
+def _parse_time(value: Optional[str], name: str) -> Optional[float]:
+    """Epoch seconds from a query parameter holding epoch seconds or ISO 8601"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: use epoch seconds or ISO 8601")
+
+
+def _parse_cursor(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _split(value: Optional[str]) -> Optional[set]:
+    """Comma-separated filter values, or None for no filter"""
+    if not value:
+        return None
+    return {v.strip() for v in value.split(",") if v.strip()} or None
+
+
+def _subscribe(sensor_id: Optional[str], sensor_type: Optional[str], kind: Optional[str]):
+    kinds = _split(kind) or set(KINDS)
+    if not kinds <= set(KINDS):
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    return hub.subscribe(_split(sensor_id), _split(sensor_type), kinds)
+
+
+def _export_response(fetch: Callable[[Optional[int]], Tuple[List[dict], Optional[int]]], fmt: str) -> StreamingResponse:
+    """
+    Stream every page from ``fetch(cursor)`` as NDJSON or a JSON array
+
+    Pages are fetched one at a time with keyset cursors, so memory stays
+    bounded and the event loop is released between pages.
+    """
+    if fmt not in ("ndjson", "json"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or json")
+
+    async def body():
+        cursor = None
+        first = True
+        if fmt == "json":
+            yield b"["
+        while True:
+            rows, cursor = fetch(cursor)
+            if rows:
+                encoded = [json.dumps(row) for row in rows]
+                if fmt == "ndjson":
+                    yield ("\n".join(encoded) + "\n").encode()
+                else:
+                    yield (("" if first else ",") + ",".join(encoded)).encode()
+                    first = False
+            if cursor is None:
+                break
+            await asyncio.sleep(0)
+        if fmt == "json":
+            yield b"]"
+
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+    return StreamingResponse(body(), media_type=media_type)
 
 
 @router.get("/status")
@@ -27,12 +113,20 @@ async def get_sensors_status():
         "motion_sensor": {
             "enabled": settings.MOTION_SENSOR_ENABLED,
             "status": "active" if settings.MOTION_SENSOR_ENABLED else "disabled",
-            "events_count": len(motion_events)
+            "events_count": len(motion_log),
+            "dropped_count": motion_log.dropped,
+            "workflow": {"enabled": settings.MOTION_WORKFLOW_ENABLED, **motion_debouncer.stats()}
         },
         "lcd_screen": {
             "enabled": settings.LCD_SCREEN_ENABLED,
-            "status": "active" if settings.LCD_SCREEN_ENABLED else "disabled"
-        }
+            "status": "active" if settings.LCD_SCREEN_ENABLED else "disabled",
+            "queue": lcd_queue.stats()
+        },
+        "readings_store": sensor_store.memory_usage(),
+        "registry": registry.stats(),
+        "persistence": journal.stats(),
+        "push": hub.stats(),
+        "anomaly_detection": detector.stats()
     }
 
 
@@ -45,27 +139,18 @@ async def record_motion_event(
     """
     Record a motion detection event
     
-    Called when motion sensor detects movement
+    Called when motion sensor detects movement. With MOTION_WORKFLOW_ENABLED
+    the event also feeds the n8n motion workflow, debounced per sensor.
     """
     if not settings.MOTION_SENSOR_ENABLED:
         raise HTTPException(status_code=403, detail="Motion sensor is not enabled")
     
-    event = MotionEvent(
-        sensor_id=sensor_id,
-        timestamp=datetime.now().isoformat(),
-        confidence=confidence,
-        metadata=metadata or {}
-    )
-    
-    motion_events.append(event)
+    event = record_motion(sensor_id, confidence, metadata)
     logger.info(f"Motion detected by sensor {sensor_id} (confidence: {confidence})")
     
-    # Optionally trigger n8n workflow
-    # await trigger_motion_detection_workflow(sensor_id, confidence, metadata)
-    
     return {
         "success": True,
-        "event": event.dict(),
+        "event": event,
         "message": "Motion event recorded"
     }
 
@@ -73,34 +158,70 @@ async def record_motion_event(
 @router.get("/motion/events")
 async def get_motion_events(
     limit: int = 50,
-    sensor_id: Optional[str] = None
+    sensor_id: Optional[str] = None,
+    from_: Optional[str] = Query(None, alias="from", description="Start time (epoch seconds or ISO 8601)"),
+    to: Optional[str] = Query(None, description="End time (epoch seconds or ISO 8601)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
     """
     Get recent motion detection events
     
     - **limit**: Maximum number of events to return
     - **sensor_id**: Filter by specific sensor
+    - **from** / **to**: Time window; pages through it oldest first
+    - **cursor**: Continue after the previous page
+    
+    Without a time window or cursor, the most recent `limit` events are returned.
     """
-    filtered_events = motion_events
+    if from_ is not None or to is not None or cursor is not None:
+        count, events, next_cursor = motion_log.page(
+            sensor_id=sensor_id or None,
+            since=_parse_time(from_, "from"),
+            until=_parse_time(to, "to"),
+            cursor=_parse_cursor(cursor),
+            limit=limit,
+        )
+        return {
+            "count": count,
+            "events": [event_to_dict(e) for e in events],
+            "next_cursor": None if next_cursor is None else str(next_cursor)
+        }
     
-    if sensor_id:
-        filtered_events = [e for e in motion_events if e.sensor_id == sensor_id]
+    count, events = motion_log.query(sensor_id=sensor_id or None, limit=limit)
     
     # Return most recent events
     return {
-        "count": len(filtered_events),
-        "events": [e.dict() for e in filtered_events[-limit:]]
+        "count": count,
+        "events": [event_to_dict(e) for e in events]
     }
 
 
+@router.get("/motion/events/export")
+async def export_motion_events(
+    sensor_id: Optional[str] = None,
+    from_: Optional[str] = Query(None, alias="from", description="Start time (epoch seconds or ISO 8601)"),
+    to: Optional[str] = Query(None, description="End time (epoch seconds or ISO 8601)"),
+    format: str = Query("ndjson", description="ndjson or json")
+):
+    """
+    Stream all motion events in a time window, oldest first
+    """
+    since, until = _parse_time(from_, "from"), _parse_time(to, "to")
+    
+    def fetch(cursor):
+        _, events, next_cursor = motion_log.page(sensor_id or None, since, until, cursor, EXPORT_PAGE_SIZE)
+        return [event_to_dict(e) for e in events], next_cursor
+    
+    return _export_response(fetch, format)
+
+
 @router.delete("/motion/events")
 async def clear_motion_events():
     """
     Clear all motion detection events
     """
-    global motion_events
-    count = len(motion_events)
-    motion_events = []
+    count = motion_log.clear()
+    journal.log_motion_clear()
     
     logger.info(f"Cleared {count} motion events")
     return {
@@ -110,53 +231,161 @@ async def clear_motion_events():
     }
 
 
+@router.websocket("/ws")
+async def sensor_websocket(
+    websocket: WebSocket,
+    sensor_id: Optional[str] = None,
+    sensor_type: Optional[str] = None,
+    kind: Optional[str] = None
+):
+    """
+    Push new readings and motion events over a WebSocket
+    
+    Filters (comma-separated): `sensor_id`, `sensor_type`, `kind` (readings, motion).
+    Each text frame is one JSON message.
+    """
+    try:
+        subscription = _subscribe(sensor_id, sensor_type, kind)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    if subscription is None:
+        await websocket.close(code=1013, reason="Too many subscribers")
+        return
+    
+    await websocket.accept()
+    
+    async def pump():
+        while True:
+            for _, text in await subscription.get():
+                await websocket.send_text(text)
+    
+    sender = asyncio.create_task(pump())
+    try:
+        # Incoming frames are ignored; this only watches for the disconnect
+        while not sender.done():
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def sensor_event_stream(
+    sensor_id: Optional[str] = None,
+    sensor_type: Optional[str] = None,
+    kind: Optional[str] = None
+):
+    """
+    Push new readings and motion events as Server-Sent Events
+    
+    Same filters as the WebSocket. The event name is the message type
+    (`readings` or `motion`); a comment line is sent periodically as a keepalive.
+    """
+    try:
+        subscription = _subscribe(sensor_id, sensor_type, kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many subscribers")
+    
+    async def events():
+        try:
+            while True:
+                try:
+                    messages = await asyncio.wait_for(subscription.get(), settings.PUSH_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield "".join(f"event: {kind}\ndata: {text}\n\n" for kind, text in messages)
+        finally:
+            hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/lcd/display")
 async def display_on_lcd(message: LCDMessage):
     """
     Display message on LCD screen
     
-    Sends text to be displayed on the ESP32 LCD screen
+    Queues text for the ESP32 LCD screen and returns immediately. Updates to
+    the same line are coalesced (last write wins) and the device receives at
+    most one frame per LCD_FRAME_INTERVAL_MS, across all displays. With
+    **duration_seconds** the line is cleared again automatically.
+    **display_id** must be one of LCD_DISPLAYS (404 otherwise).
     """
     if not settings.LCD_SCREEN_ENABLED:
         raise HTTPException(status_code=403, detail="LCD screen is not enabled")
+    if message.line > settings.LCD_LINES:
+        raise HTTPException(status_code=400, detail=f"line must be between 1 and {settings.LCD_LINES}")
     
     try:
-        # This would send the message to ESP32 LCD endpoint
-        # For now, just log it
-        logger.info(f"LCD Display: {message.text} (line: {message.line}, duration: {message.duration_seconds}s)")
+        lcd_queue.write(message.display_id, message.line, message.text, message.duration_seconds)
         
         return {
             "success": True,
-            "message": "Text displayed on LCD",
+            "message": "Text queued for LCD",
+            "display_id": message.display_id,
             "displayed_text": message.text,
             "line": message.line
         }
+    except UnknownDisplayError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error displaying on LCD: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error displaying on LCD: {str(e)}")
 
 
 @router.post("/lcd/clear")
-async def clear_lcd():
+async def clear_lcd(display_id: str = Query("lcd_screen_1", description="Target display")):
     """
     Clear LCD screen
+    
+    Clears every line and cancels pending expiries; queued like any other update.
     """
     if not settings.LCD_SCREEN_ENABLED:
         raise HTTPException(status_code=403, detail="LCD screen is not enabled")
     
     try:
-        # This would send clear command to ESP32
-        logger.info("LCD screen cleared")
+        lcd_queue.clear(display_id)
         
         return {
             "success": True,
-            "message": "LCD screen cleared"
+            "message": "LCD screen clear queued",
+            "display_id": display_id
         }
+    except UnknownDisplayError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error clearing LCD: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error clearing LCD: {str(e)}")
 
 
+@router.get("/lcd/status")
+async def get_lcd_status(display_id: str = Query("lcd_screen_1", description="Target display")):
+    """
+    Get LCD display state
+    
+    Current lines, whether the device is in sync and queue counters.
+    """
+    if not settings.LCD_SCREEN_ENABLED:
+        raise HTTPException(status_code=403, detail="LCD screen is not enabled")
+    
+    status = lcd_queue.status(display_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown display {display_id}")
+    return status
+
+
 @router.post("/reading")
 async def record_sensor_reading(
     sensor_id: str = Body(...),
@@ -170,52 +399,206 @@ async def record_sensor_reading(
     
     Extensible endpoint for any type of sensor data
     """
-    reading = SensorReading(
-        sensor_id=sensor_id,
-        sensor_type=sensor_type,
-        value=value,
-        unit=unit,
-        timestamp=datetime.now().isoformat(),
-        metadata=metadata or {}
-    )
-    
-    if sensor_id not in sensor_readings:
-        sensor_readings[sensor_id] = []
+    try:
+        reading = record_reading(sensor_id, sensor_type, value, unit, metadata)
+    except SensorStoreFullError as e:
+        logger.error(f"Sensor reading rejected: {str(e)}")
+        raise HTTPException(status_code=507, detail=str(e))
     
-    sensor_readings[sensor_id].append(reading)
     logger.info(f"Sensor reading recorded: {sensor_type} = {value} {unit}")
     
     return {
         "success": True,
-        "reading": reading.dict(),
+        "reading": reading,
         "message": "Sensor reading recorded"
     }
 
 
+@router.post("/readings/batch")
+async def ingest_sensor_readings(request: Request):
+    """
+    Record many sensor readings in one request
+    
+    Accepts either a JSON array of readings (`application/json`) or a streamed
+    body with one reading per line (`application/x-ndjson`). Each reading has
+    `sensor_id`, `sensor_type`, `value`, `unit` and optional `timestamp`
+    (epoch seconds or ISO 8601, defaults to receive time) and `metadata`.
+    
+    Invalid readings are rejected individually; the rest are stored.
+    """
+    content_type = request.headers.get("content-type", "")
+    start = time.perf_counter()
+    
+    try:
+        if "ndjson" in content_type or "jsonlines" in content_type:
+            result = await ingest_ndjson(request.stream())
+        else:
+            max_bytes = settings.SENSOR_BATCH_MAX_MB * 1024 * 1024
+            too_large = HTTPException(
+                status_code=413,
+                detail=f"Batch larger than {settings.SENSOR_BATCH_MAX_MB} MB; use application/x-ndjson"
+            )
+            if int(request.headers.get("content-length") or 0) > max_bytes:
+                raise too_large
+            # Content-Length is absent on chunked bodies, so count what arrives
+            chunks, received = [], 0
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > max_bytes:
+                    raise too_large
+                chunks.append(chunk)
+            result = await ingest_json_array(b"".join(chunks))
+    except InvalidBatchError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error ingesting sensor batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error ingesting sensor batch: {str(e)}")
+    
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(f"Sensor batch ingested: {result.accepted} accepted, {result.rejected} rejected in {elapsed_ms:.1f}ms")
+    
+    return {
+        "success": result.rejected == 0,
+        "accepted": result.accepted,
+        "rejected": result.rejected,
+        "errors": result.errors,
+        "message": f"Recorded {result.accepted} readings"
+    }
+
+
 @router.get("/readings/{sensor_id}")
 async def get_sensor_readings(
     sensor_id: str,
-    limit: int = 100
+    limit: int = 100,
+    bucket: Optional[str] = Query(None, description="Downsample into buckets, e.g. 30s, 5m, 1h, 1d"),
+    agg: str = Query("mean", description="Comma-separated aggregates: min, max, mean, last, count"),
+    from_: Optional[str] = Query(None, alias="from", description="Start time (epoch seconds or ISO 8601)"),
+    to: Optional[str] = Query(None, description="End time (epoch seconds or ISO 8601)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
     """
     Get readings from a specific sensor
     
     - **sensor_id**: Sensor identifier
-    - **limit**: Maximum number of readings to return
+    - **limit**: Maximum number of readings (or buckets) to return
+    - **bucket**: Return one aggregated point per bucket instead of raw readings
+    - **agg**: Aggregates computed per bucket
+    - **from** / **to**: Time window; raw readings are paged through it oldest first
+      (bucketed queries default to the last `limit` buckets)
+    - **cursor**: Continue after the previous page of raw readings
+    
+    Bucketed queries are served from the 1m/1h/1d rollups when the bucket is a
+    multiple of one of them, which reaches further back than the raw readings.
+    Without a time window or cursor, the most recent `limit` readings are returned.
     """
-    if sensor_id not in sensor_readings:
+    if bucket is not None:
+        try:
+            width = parse_bucket(bucket)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        fields = [f.strip() for f in agg.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in AGGREGATES]
+        if unknown or not fields:
+            raise HTTPException(status_code=400, detail=f"Invalid agg {agg!r}; choose from {', '.join(AGGREGATES)}")
+        
+        until = _parse_time(to, "to") or time.time()
+        since = _parse_time(from_, "from")
+        if since is None:
+            since = until - width * limit
+        source, aggregates = sensor_store.downsample(sensor_id, width, since, until)
+        aggregates = aggregates[-limit:] if limit > 0 else []
+        
         return {
             "sensor_id": sensor_id,
-            "count": 0,
-            "readings": []
+            "bucket": format_bucket(width),
+            "source": source,
+            "count": len(aggregates),
+            "points": [
+                {"timestamp": datetime.fromtimestamp(a[0]).isoformat(), **render(a, fields)} for a in aggregates
+            ]
         }
     
-    readings = sensor_readings[sensor_id][-limit:]
+    if from_ is not None or to is not None or cursor is not None:
+        readings, next_cursor = sensor_store.page(
+            sensor_id,
+            since=_parse_time(from_, "from"),
+            until=_parse_time(to, "to"),
+            cursor=_parse_cursor(cursor),
+            limit=limit,
+        )
+        return {
+            "sensor_id": sensor_id,
+            "count": len(readings),
+            "readings": readings,
+            "next_cursor": None if next_cursor is None else str(next_cursor)
+        }
+    
+    readings = sensor_store.recent(sensor_id, limit)
     
     return {
         "sensor_id": sensor_id,
         "count": len(readings),
-        "readings": [r.dict() for r in readings]
+        "readings": readings
+    }
+
+
+@router.get("/readings/{sensor_id}/export")
+async def export_sensor_readings(
+    sensor_id: str,
+    from_: Optional[str] = Query(None, alias="from", description="Start time (epoch seconds or ISO 8601)"),
+    to: Optional[str] = Query(None, description="End time (epoch seconds or ISO 8601)"),
+    format: str = Query("ndjson", description="ndjson or json"),
+    background: bool = Query(False, description="Write the export to a file as a background job")
+):
+    """
+    Stream all readings of a sensor in a time window
+    
+    NDJSON output can be posted back to `/readings/batch` as-is. With
+    `background=true` an `export_readings` job writes NDJSON to a file
+    instead; download it from `GET /jobs/{id}/download` when it finishes.
+    """
+    since, until = _parse_time(from_, "from"), _parse_time(to, "to")
+    if background:
+        return await submit_job("export_readings", {"sensor_id": sensor_id, "since": since, "until": until})
+    
+    def fetch(cursor):
+        return sensor_store.page(sensor_id, since, until, cursor, EXPORT_PAGE_SIZE)
+    
+    return _export_response(fetch, format)
+
+
+@router.get("/anomalies")
+async def get_anomalies(
+    sensor_id: Optional[str] = None,
+    limit: int = 50
+):
+    """
+    Get recent anomalous readings
+    
+    - **sensor_id**: Filter by specific sensor
+    - **limit**: Maximum number of anomalies to return
+    """
+    anomalies = detector.recent(sensor_id or None, limit)
+    
+    return {
+        "count": len(anomalies),
+        "anomalies": anomalies
+    }
+
+
+@router.post("/anomalies/reset")
+async def reset_anomaly_baseline(sensor_id: Optional[str] = None):
+    """
+    Forget the learned baseline for one sensor (or all), e.g. after recalibration
+    """
+    detector.reset(sensor_id or None)
+    logger.info(f"Anomaly baseline reset for {sensor_id or 'all sensors'}")
+    
+    return {
+        "success": True,
+        "message": f"Anomaly baseline reset for {sensor_id or 'all sensors'}"
     }
 
 
@@ -232,29 +615,21 @@ async def list_sensors():
             "id": "motion_sensor_1",
             "type": "motion",
             "status": "active",
-            "events_count": len(motion_events)
+            "events_count": len(motion_log)
         })
     
     # LCD screen
     if settings.LCD_SCREEN_ENABLED:
-        sensors.append({
-            "id": "lcd_screen_1",
-            "type": "display",
-            "status": "active"
-        })
-    
-    # Other sensors from readings
-    for sensor_id, readings in sensor_readings.items():
-        if readings:
-            latest = readings[-1]
+        for display_id in lcd_queue.displays:
             sensors.append({
-                "id": sensor_id,
-                "type": latest.sensor_type,
-                "status": "active",
-                "readings_count": len(readings),
-                "latest_value": f"{latest.value} {latest.unit}"
+                "id": display_id,
+                "type": "display",
+                "status": "active"
             })
     
+    # Other sensors from the registry
+    sensors.extend(registry.list())
+    
     return {
         "count": len(sensors),
         "sensors": sensors
@@ -270,19 +645,20 @@ async def configure_sensor(
     """
     Configure a sensor
     
-    Generic endpoint to update sensor configuration
+    Generic endpoint to update sensor configuration. Keys in **config** are
+    merged into the sensor's saved configuration, which is pushed to the
+    ESP32 in the next batch (see `config_synced` in `/list`).
     """
     try:
         logger.info(f"Configuring sensor {sensor_id} ({sensor_type}): {config}")
-        
-        # This would send configuration to ESP32
-        # For now, just acknowledge
+        entry = await registry.configure(sensor_id, sensor_type, config)
         
         return {
             "success": True,
             "sensor_id": sensor_id,
-            "sensor_type": sensor_type,
-            "config": config,
+            "sensor_type": entry["type"],
+            "config": entry["config"],
+            "config_version": entry["config_version"],
             "message": f"Sensor {sensor_id} configured"
         }
     except Exception as e:
@@ -27,12 +27,23 @@ class Settings(BaseSettings):
     ESP32_IP: str = os.getenv("ESP32_IP", "10.0.0.30")
     ESP32_PORT: int = int(os.getenv("ESP32_PORT", "80"))
     ESP32_TIMEOUT: int = int(os.getenv("ESP32_TIMEOUT", "10"))
+    ESP32_MAX_CONCURRENT: int = int(os.getenv("ESP32_MAX_CONCURRENT", "2"))  # requests in flight to the device
+    ESP32_MAX_WAITING: int = int(os.getenv("ESP32_MAX_WAITING", "8"))  # callers queued for a slot; more get 503
+    ESP32_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ESP32_QUEUE_TIMEOUT_SECONDS", "5"))  # longest wait for a slot
+    ESP32_MAX_STREAMS: int = int(os.getenv("ESP32_MAX_STREAMS", "1"))  # live streams open at once; more get 503
     
     # n8n Configuration
     N8N_URL: str = os.getenv("N8N_URL", "http://n8n:5678")
     N8N_API_KEY: str = os.getenv("N8N_API_KEY", "")
     N8N_BASIC_AUTH_USER: str = os.getenv("N8N_BASIC_AUTH_USER", "admin")
     N8N_BASIC_AUTH_PASSWORD: str = os.getenv("N8N_BASIC_AUTH_PASSWORD", "changeme123")
+    N8N_CREDENTIALS_FILE: str = os.getenv("N8N_CREDENTIALS_FILE", "")  # KEY=value overrides, re-read when it changes
+    N8N_CREDENTIALS_CHECK_SECONDS: float = float(os.getenv("N8N_CREDENTIALS_CHECK_SECONDS", "5"))
+    N8N_MAX_CONNECTIONS: int = int(os.getenv("N8N_MAX_CONNECTIONS", "20"))  # shared connection pool size
+    N8N_WORKFLOW_CACHE_TTL_SECONDS: float = float(os.getenv("N8N_WORKFLOW_CACHE_TTL_SECONDS", "30"))
+    N8N_WORKFLOW_CACHE_STALE_SECONDS: float = float(os.getenv("N8N_WORKFLOW_CACHE_STALE_SECONDS", "300"))  # served while refreshing
+    N8N_INBOUND_SECRET: str = os.getenv("N8N_INBOUND_SECRET", "")  # HMAC key for /n8n/inbound; empty disables it
+    N8N_INBOUND_TOLERANCE_SECONDS: float = float(os.getenv("N8N_INBOUND_TOLERANCE_SECONDS", "300"))  # max signature age
     
     # Storage
     CAPTURE_DIR: str = os.getenv("CAPTURE_DIR", "/app/captures")
@@ -45,6 +56,96 @@ class Settings(BaseSettings):
     # Sensor Configuration
     MOTION_SENSOR_ENABLED: bool = os.getenv("MOTION_SENSOR_ENABLED", "false").lower() == "true"
     LCD_SCREEN_ENABLED: bool = os.getenv("LCD_SCREEN_ENABLED", "false").lower() == "true"
+    LCD_LINES: int = int(os.getenv("LCD_LINES", "4"))
+    LCD_DISPLAYS: str = os.getenv("LCD_DISPLAYS", "lcd_screen_1")  # comma-separated display ids on the ESP32
+    LCD_FRAME_INTERVAL_MS: int = int(os.getenv("LCD_FRAME_INTERVAL_MS", "200"))  # at most one device call per interval
+    LCD_DEVICE_PATH: str = os.getenv("LCD_DEVICE_PATH", "/lcd")
+    SENSOR_SERIES_CAPACITY: int = int(os.getenv("SENSOR_SERIES_CAPACITY", "10000"))  # readings kept per sensor
+    SENSOR_STORE_MEMORY_MB: int = int(os.getenv("SENSOR_STORE_MEMORY_MB", "64"))
+    SENSOR_CONFIG_DEVICE_PATH: str = os.getenv("SENSOR_CONFIG_DEVICE_PATH", "/sensors/config")
+    SENSOR_CONFIG_PUSH_DELAY_MS: int = int(os.getenv("SENSOR_CONFIG_PUSH_DELAY_MS", "500"))  # batching window
+    SENSOR_CONFIG_BATCH_MAX: int = int(os.getenv("SENSOR_CONFIG_BATCH_MAX", "50"))  # sensors per device call
+    SENSOR_BATCH_MAX_MB: int = int(os.getenv("SENSOR_BATCH_MAX_MB", "32"))  # JSON array bodies; NDJSON is streamed
+    MOTION_LOG_CAPACITY: int = int(os.getenv("MOTION_LOG_CAPACITY", "10000"))  # oldest events dropped beyond this
+    MOTION_WORKFLOW_ENABLED: bool = os.getenv("MOTION_WORKFLOW_ENABLED", "false").lower() == "true"  # recorded motion -> n8n
+    MOTION_DEBOUNCE_MODE: str = os.getenv("MOTION_DEBOUNCE_MODE", "leading")  # leading, trailing, both or off
+    MOTION_DEBOUNCE_SECONDS: float = float(os.getenv("MOTION_DEBOUNCE_SECONDS", "10"))  # quiet gap that ends a burst
+    MOTION_DEBOUNCE_MAX_WAIT_SECONDS: float = float(os.getenv("MOTION_DEBOUNCE_MAX_WAIT_SECONDS", "60"))
+    
+    # Persistence (write-ahead log + snapshots for sensor readings and motion events)
+    DATA_DIR: str = os.getenv("DATA_DIR", "/app/data")
+    WAL_ENABLED: bool = os.getenv("WAL_ENABLED", "true").lower() == "true"
+    WAL_SEGMENT_MB: int = int(os.getenv("WAL_SEGMENT_MB", "64"))
+    WAL_FLUSH_INTERVAL_MS: int = int(os.getenv("WAL_FLUSH_INTERVAL_MS", "50"))  # group commit period
+    WAL_SNAPSHOT_INTERVAL_SECONDS: int = int(os.getenv("WAL_SNAPSHOT_INTERVAL_SECONDS", "300"))
+    
+    # Anomaly detection on ingested readings
+    ANOMALY_DETECTION_ENABLED: bool = os.getenv("ANOMALY_DETECTION_ENABLED", "true").lower() == "true"
+    ANOMALY_METHOD: str = os.getenv("ANOMALY_METHOD", "ewma")  # ewma or mad
+    ANOMALY_THRESHOLD: float = float(os.getenv("ANOMALY_THRESHOLD", "4.0"))  # |z-score| above which a reading is flagged
+    ANOMALY_EWMA_ALPHA: float = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.05"))
+    ANOMALY_WARMUP: int = int(os.getenv("ANOMALY_WARMUP", "30"))  # readings per sensor before scoring starts
+    ANOMALY_MAD_WINDOW: int = int(os.getenv("ANOMALY_MAD_WINDOW", "500"))
+    ANOMALY_LOG_CAPACITY: int = int(os.getenv("ANOMALY_LOG_CAPACITY", "1000"))
+    ANOMALY_WEBHOOK: str = os.getenv("ANOMALY_WEBHOOK", "")  # n8n webhook name, e.g. sensor-anomaly
+    ANOMALY_WEBHOOK_COOLDOWN_SECONDS: int = int(os.getenv("ANOMALY_WEBHOOK_COOLDOWN_SECONDS", "60"))
+    
+    # n8n webhook outbox (persistent, delivered in the background)
+    N8N_OUTBOX_PATH: str = os.getenv("N8N_OUTBOX_PATH", os.path.join(DATA_DIR, "n8n_outbox.sqlite3"))
+    N8N_OUTBOX_WORKERS: int = int(os.getenv("N8N_OUTBOX_WORKERS", "4"))  # concurrent deliveries
+    N8N_OUTBOX_PER_WEBHOOK: int = int(os.getenv("N8N_OUTBOX_PER_WEBHOOK", "2"))  # concurrent deliveries per webhook
+    N8N_OUTBOX_TIMEOUT_SECONDS: float = float(os.getenv("N8N_OUTBOX_TIMEOUT_SECONDS", "10"))
+    N8N_OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("N8N_OUTBOX_MAX_ATTEMPTS", "10"))
+    N8N_OUTBOX_BACKOFF_SECONDS: float = float(os.getenv("N8N_OUTBOX_BACKOFF_SECONDS", "1"))  # doubled per attempt
+    N8N_OUTBOX_BACKOFF_MAX_SECONDS: float = float(os.getenv("N8N_OUTBOX_BACKOFF_MAX_SECONDS", "300"))
+    N8N_OUTBOX_BATCH_WEBHOOKS: str = os.getenv("N8N_OUTBOX_BATCH_WEBHOOKS", "")  # comma-separated webhook names
+    N8N_OUTBOX_BATCH_MAX: int = int(os.getenv("N8N_OUTBOX_BATCH_MAX", "50"))
+    N8N_OUTBOX_BATCH_WINDOW_MS: int = int(os.getenv("N8N_OUTBOX_BATCH_WINDOW_MS", "200"))
+    N8N_OUTBOX_RETENTION_HOURS: float = float(os.getenv("N8N_OUTBOX_RETENTION_HOURS", "24"))  # delivered/failed entries
+    N8N_OUTBOX_MAX_PENDING: int = int(os.getenv("N8N_OUTBOX_MAX_PENDING", "10000"))  # undelivered entries per webhook
+    
+    # In-process event bus and the pipelines built on it
+    EVENT_QUEUE_SIZE: int = int(os.getenv("EVENT_QUEUE_SIZE", "1000"))  # events buffered per subscriber
+    EVENT_PUT_TIMEOUT_SECONDS: float = float(os.getenv("EVENT_PUT_TIMEOUT_SECONDS", "5"))  # wait for room at blocking subscribers
+    MOTION_CAPTURE_ENABLED: bool = os.getenv("MOTION_CAPTURE_ENABLED", "false").lower() == "true"  # capture on debounced motion
+    CAPTURE_ANALYSIS_ENABLED: bool = os.getenv("CAPTURE_ANALYSIS_ENABLED", "false").lower() == "true"  # AI-analyze saved captures
+    CAPTURE_ANALYSIS_PROMPT: str = os.getenv("CAPTURE_ANALYSIS_PROMPT", "What do you see in this image?")
+    ANALYSIS_WEBHOOK: str = os.getenv("ANALYSIS_WEBHOOK", "")  # n8n webhook name for finished analyses, e.g. image-analyzed
+    
+    # Background jobs (persistent, run by a worker pool)
+    JOBS_PATH: str = os.getenv("JOBS_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "4"))  # jobs running at once, across all types
+    JOBS_MAX_QUEUED: int = int(os.getenv("JOBS_MAX_QUEUED", "10000"))  # submits beyond this are refused
+    JOBS_RETENTION_HOURS: float = float(os.getenv("JOBS_RETENTION_HOURS", "24"))  # finished jobs and their files
+    JOBS_EXPORT_DIR: str = os.getenv("JOBS_EXPORT_DIR", os.path.join(DATA_DIR, "exports"))
+    
+    # Rate limiting (token bucket per client and route)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    # Routes without an override: unlimited by default (0), since sensors and
+    # dashboards behind one proxy legitimately send many requests per second
+    RATE_LIMIT_PER_SECOND: float = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))  # default refill rate
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", "40"))  # default bucket size
+    # Per-route overrides: "METHOD /path/template=rate:burst", comma-separated; rate 0 means unlimited
+    RATE_LIMIT_ROUTES: str = os.getenv(
+        "RATE_LIMIT_ROUTES", "POST /api/v1/camera/capture=1:5,POST /api/v1/esp32/test=0.1:2"
+    )
+    # Clients are keyed by address; a header names the client only on requests from a trusted proxy
+    RATE_LIMIT_CLIENT_HEADER: str = os.getenv("RATE_LIMIT_CLIENT_HEADER", "")  # e.g. X-Real-IP
+    RATE_LIMIT_TRUSTED_PROXIES: str = os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "")  # comma-separated addresses
+    RATE_LIMIT_MAX_BUCKETS: int = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "10000"))  # least recently used are dropped
+    
+    # Real-time push (WebSocket / Server-Sent Events)
+    PUSH_QUEUE_SIZE: int = int(os.getenv("PUSH_QUEUE_SIZE", "1000"))  # messages buffered per subscriber
+    PUSH_MAX_SUBSCRIBERS: int = int(os.getenv("PUSH_MAX_SUBSCRIBERS", "100"))
+    PUSH_KEEPALIVE_SECONDS: int = int(os.getenv("PUSH_KEEPALIVE_SECONDS", "15"))
+    
+    # Observability
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    LOOP_MONITOR_ENABLED: bool = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+    LOOP_MONITOR_INTERVAL_SECONDS: float = float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.05"))
+    LOOP_BLOCK_THRESHOLD_MS: float = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+    PROFILER_ENABLED: bool = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+    PROFILER_MAX_SECONDS: int = int(os.getenv("PROFILER_MAX_SECONDS", "60"))
     
     class Config:
         case_sensitive = True
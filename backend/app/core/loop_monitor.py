@@ -0,0 +1,182 @@
+"""
+Event loop lag and blocking-call detector
+
+A heartbeat coroutine measures how late the event loop wakes up. A watchdog
+thread notices when the heartbeat falls behind the blocking threshold and
+samples the loop thread's stack while it is still stuck, so the report shows
+what was blocking and which route it ran under.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 64
+MAX_OFFENDERS = 200
+BACKGROUND_ROUTE = "<background>"
+
+
+def frame_label(frame, lines: bool = True) -> str:
+    """``module.py:function:line`` (or ``module.py:function``) for one frame"""
+    code = frame.f_code
+    if not lines:
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+def collapse_stack(frame, limit: int = MAX_STACK_DEPTH, lines: bool = True) -> List[str]:
+    """Frames from outermost to innermost, as used by collapsed-stack flamegraphs"""
+    labels = []
+    while frame is not None and len(labels) < limit:
+        labels.append(frame_label(frame, lines))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class LoopMonitor:
+    """Continuously measures loop lag and records what blocks the loop"""
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self._routes_by_code: Dict[object, str] = {}
+        self._loop_thread_id: Optional[int] = None
+        self._deadline = time.monotonic()
+        self._lock = threading.Lock()
+        self._episode: Optional[Counter] = None
+        self._offenders: Dict[Tuple[str, str], dict] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.blocked_episodes = 0
+        self.max_lag = 0.0
+
+    def register_routes(self, routes):
+        """Map endpoint code objects to route templates for attribution"""
+        for route in routes:
+            endpoint = getattr(route, "endpoint", None)
+            code = getattr(endpoint, "__code__", None)
+            if code is not None:
+                self._routes_by_code[code] = getattr(route, "path", str(route))
+
+    def start(self):
+        """Start monitoring the running loop (call from the loop thread)"""
+        self._loop_thread_id = threading.get_ident()
+        self._deadline = time.monotonic() + self.interval
+        self._stopped.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"Loop monitor started (interval {self.interval * 1000:.0f}ms, "
+            f"threshold {self.threshold * 1000:.0f}ms)"
+        )
+
+    def stop(self):
+        self._stopped.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            self._deadline = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._deadline)
+
+            metrics.EVENT_LOOP_LAG.set(lag)
+            metrics.EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+            with self._lock:
+                episode, self._episode = self._episode, None
+            if episode:
+                self._record_episode(lag, episode)
+
+    def _watch(self):
+        # Check several times per threshold so a block is sampled while it is happening
+        period = max(0.005, self.threshold / 4)
+        while not self._stopped.wait(period):
+            if time.monotonic() - self._deadline < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            sample = self._attribute(frame)
+            del frame
+            with self._lock:
+                if self._episode is None:
+                    self._episode = Counter()
+                self._episode[sample] += 1
+
+    def _attribute(self, frame) -> Tuple[str, str, Tuple[str, ...]]:
+        """(route, innermost frame, collapsed stack) for a loop thread sample"""
+        stack = collapse_stack(frame)
+        route = BACKGROUND_ROUTE
+        current = frame
+        while current is not None:
+            found = self._routes_by_code.get(current.f_code)
+            if found:
+                route = found
+                break
+            current = current.f_back
+        return route, stack[-1] if stack else "?", tuple(stack)
+
+    def _record_episode(self, lag: float, episode: Counter):
+        self.blocked_episodes += 1
+        (route, site, stack), _ = episode.most_common(1)[0]
+        key = (route, site)
+        offender = self._offenders.get(key)
+        if offender is None:
+            if len(self._offenders) >= MAX_OFFENDERS:
+                return
+            offender = self._offenders[key] = {
+                "route": route,
+                "site": site,
+                "count": 0,
+                "total_blocked_ms": 0.0,
+                "max_blocked_ms": 0.0,
+            }
+        blocked_ms = lag * 1000
+        offender["count"] += 1
+        offender["total_blocked_ms"] += blocked_ms
+        offender["max_blocked_ms"] = max(offender["max_blocked_ms"], blocked_ms)
+        offender["last_seen"] = time.time()
+        offender["stack"] = list(stack)
+        logger.warning(f"Event loop blocked for {blocked_ms:.0f}ms in {route} at {site}")
+
+    def report(self, limit: int = 20) -> dict:
+        """Worst offenders by total blocked time"""
+        offenders = sorted(self._offenders.values(), key=lambda o: o["total_blocked_ms"], reverse=True)
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "current_lag_ms": round(metrics.EVENT_LOOP_LAG.labels().value * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "blocked_episodes": self.blocked_episodes,
+            "offenders": [
+                {**o, "total_blocked_ms": round(o["total_blocked_ms"], 1), "max_blocked_ms": round(o["max_blocked_ms"], 1)}
+                for o in offenders[:limit]
+            ],
+        }
+
+    def reset(self):
+        self._offenders.clear()
+        self.blocked_episodes = 0
+        self.max_lag = 0.0
+
+
+monitor = LoopMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL_SECONDS,
+    threshold=settings.LOOP_BLOCK_THRESHOLD_MS / 1000,
+)
@@ -0,0 +1,367 @@
+"""
+Prometheus-style metrics
+Low-overhead counters, gauges and histograms rendered in the text exposition
+format, plus the ASGI middleware that instruments every request.
+
+Metric children are plain Python objects updated from the event loop thread,
+so no locking is needed on the hot path.
+"""
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bound plus +Inf; stored non-cumulative and summed on render
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    kind = ""
+    child_class = _CounterChild
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.register(self)
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *values: str):
+        """Return the child for these label values (cache it on hot paths)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    kind = "counter"
+    child_class = _CounterChild
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    kind = "gauge"
+    child_class = _GaugeChild
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together by /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP server
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ("method", "route")
+)
+HTTP_RATE_LIMITED = Counter(
+    "http_rate_limited_total", "Requests rejected with 429 by the rate limiter", ("method", "route")
+)
+
+# Upstream dependencies (ESP32, n8n, AI)
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds", "Latency of calls to upstream services",
+    ("upstream", "operation", "outcome")
+)
+UPSTREAM_IN_FLIGHT = Gauge("upstream_in_flight", "Calls holding an upstream admission slot", ("upstream",))
+UPSTREAM_WAITING = Gauge("upstream_waiting", "Calls queued for an upstream admission slot", ("upstream",))
+UPSTREAM_ADMISSION_WAIT = Histogram(
+    "upstream_admission_wait_seconds", "Time calls waited for an upstream admission slot", ("upstream",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+UPSTREAM_REJECTED = Counter(
+    "upstream_rejected_total", "Calls refused by upstream admission control", ("upstream", "reason")
+)
+
+# Camera
+CAPTURE_BYTES_WRITTEN = Counter("capture_bytes_written_total", "Bytes of captured images written to disk")
+CAPTURES_SAVED = Counter("captures_saved_total", "Captured images written to disk")
+
+# Persistence
+WAL_BYTES_WRITTEN = Counter("wal_bytes_written_total", "Bytes written to the write-ahead log")
+WAL_COMMIT_DURATION = Histogram(
+    "wal_commit_duration_seconds", "Time to write and fsync one WAL group commit",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+
+# Sensors
+SENSOR_ANOMALIES = Counter("sensor_anomalies_total", "Readings flagged as anomalous", ("sensor_type",))
+
+# n8n webhook outbox
+WEBHOOK_DELIVERIES = Counter(
+    "webhook_deliveries_total", "Outbox webhook delivery outcomes per event", ("webhook", "result")
+)
+OUTBOX_PENDING = Gauge("webhook_outbox_pending", "Outbox entries not yet delivered or failed")
+
+# Event bus
+EVENTS_PUBLISHED = Counter("events_published_total", "Events published on the in-process bus", ("topic",))
+EVENTS_SHED = Counter(
+    "events_shed_total", "Events not queued for a subscriber because its queue was full", ("subscriber", "reason")
+)
+EVENT_HANDLER_DURATION = Histogram(
+    "event_handler_duration_seconds", "Time subscribers spend handling one event", ("subscriber", "result")
+)
+
+# Background jobs
+JOBS_QUEUED = Gauge("jobs_queued", "Background jobs waiting to run")
+JOBS_FINISHED = Counter("jobs_finished_total", "Background jobs finished, by outcome", ("type", "status"))
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Background job run time", ("type",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+)
+
+# Real-time push
+PUSH_SUBSCRIBERS = Gauge("push_subscribers", "Connected WebSocket/SSE subscribers")
+PUSH_MESSAGES_SHED = Counter(
+    "push_messages_shed_total", "Messages not delivered individually to slow subscribers", ("reason",)
+)
+
+# Caches
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by result", ("cache", "result"))
+
+# Event loop
+EVENT_LOOP_LAG = Gauge("event_loop_lag_seconds", "Most recent event loop scheduling lag")
+EVENT_LOOP_LAG_HISTOGRAM = Histogram(
+    "event_loop_lag_distribution_seconds", "Event loop scheduling lag",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+
+@contextmanager
+def track_upstream(upstream: str, operation: str) -> Iterator[None]:
+    """Time a call to an upstream service, labelling failures as errors"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        UPSTREAM_REQUEST_DURATION.labels(upstream, operation, outcome).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup; the hit ratio is hits / (hits + misses)"""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+UNMATCHED_ROUTE = "<unmatched>"
+ROUTE_CACHE_SIZE = 2048
+# Any other request method is labelled OTHER: clients can send arbitrary method strings
+KNOWN_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+OTHER_METHOD = "OTHER"
+
+
+def method_label(method: str) -> str:
+    """Request method as a metric label, with unknown methods collapsed like unmatched routes"""
+    return method if method in KNOWN_METHODS else OTHER_METHOD
+
+
+class RouteTemplates:
+    """
+    Path template (``/api/v1/camera/images/{filename}``) of the route a request matches
+
+    Lookups for concrete paths are memoised, which keeps the per-request cost
+    to a dictionary lookup.
+    """
+
+    def __init__(self, router):
+        self.router = router
+        self._cache: Dict[Tuple[str, str], str] = {}
+
+    def __call__(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        template = self._cache.get(key)
+        if template is not None:
+            return template
+
+        template = UNMATCHED_ROUTE
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                template = getattr(route, "path", UNMATCHED_ROUTE)
+                break
+        if len(self._cache) < ROUTE_CACHE_SIZE:
+            self._cache[key] = template
+        return template
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route counts, latency and in-flight requests
+
+    Routes are labelled by their path template and unknown methods as
+    ``OTHER``, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, router):
+        self.app = app
+        self._route_template = RouteTemplates(router)
+        self._children: Dict[Tuple[str, str], tuple] = {}
+
+    def _children_for(self, method: str, route: str):
+        children = self._children.get((method, route))
+        if children is None:
+            children = self._children[(method, route)] = (
+                HTTP_REQUEST_DURATION.labels(method, route),
+                HTTP_REQUESTS_IN_FLIGHT.labels(method, route),
+            )
+        return children
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = method_label(scope["method"])
+        route = self._route_template(scope)
+        duration, in_flight = self._children_for(method, route)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration.observe(time.perf_counter() - start)
+            in_flight.dec()
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
@@ -0,0 +1,95 @@
+"""
+On-demand sampling profiler
+Samples thread stacks of the running process at a fixed interval and
+aggregates them into collapsed-stack text (``frame;frame;frame count``),
+the input format of flamegraph.pl, speedscope and inferno.
+
+Sampling runs in its own thread and only reads frame objects, so the
+application keeps serving requests while a profile is being taken.
+"""
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from app.core.loop_monitor import collapse_stack
+
+logger = logging.getLogger(__name__)
+
+MAX_DISTINCT_STACKS = 20000
+TRUNCATED_STACK = "[truncated]"
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is already running"""
+
+
+class SamplingProfiler:
+    """Time-bounded stack sampler; one profile at a time per process"""
+
+    def __init__(self):
+        self._running = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._running.locked()
+
+    def run(
+        self,
+        seconds: float,
+        interval: float,
+        thread_id: Optional[int] = None,
+        lines: bool = False,
+    ) -> Counter:
+        """
+        Sample for ``seconds`` and return collapsed stacks with sample counts
+
+        With ``thread_id`` only that thread is sampled (e.g. the event loop
+        thread); otherwise every thread except the sampler itself.
+        """
+        if not self._running.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+        try:
+            return self._sample(seconds, interval, thread_id, lines)
+        finally:
+            self._running.release()
+
+    def _sample(self, seconds: float, interval: float, thread_id: Optional[int], lines: bool) -> Counter:
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        next_tick = time.monotonic()
+
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            for ident, frame in sys._current_frames().items():
+                if ident == own_id or (thread_id is not None and ident != thread_id):
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                key = ";".join([names.get(ident, f"thread-{ident}")] + collapse_stack(frame, lines=lines))
+                if key not in stacks and len(stacks) >= MAX_DISTINCT_STACKS:
+                    key = TRUNCATED_STACK
+                stacks[key] += 1
+            frame = None
+            samples += 1
+            # Fixed-rate schedule so slow samples don't stretch the interval
+            next_tick += interval
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+        logger.info(f"Profile finished: {samples} samples, {len(stacks)} distinct stacks")
+        return stacks
+
+
+def render_collapsed(stacks: Counter) -> str:
+    """Collapsed-stack text, most frequent stacks first"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,156 @@
+"""
+Rate limiting
+Token buckets per client and route, enforced by an ASGI middleware before a
+request reaches its handler, so one noisy client (e.g. a looping n8n
+workflow) cannot starve the others.
+
+Each (client, route) pair has a bucket of ``burst`` tokens refilled at
+``rate`` tokens per second; a request takes one token or is answered with
+429 and a Retry-After header. Clients are identified by their address. A
+client-supplied header could be changed on every request to get a fresh
+bucket, so RATE_LIMIT_CLIENT_HEADER is believed only on requests coming
+from one of RATE_LIMIT_TRUSTED_PROXIES (a reverse proxy that sets it).
+Routes are matched by path template, so ``/camera/images/{filename}`` is one
+route whatever the file name.
+"""
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Never limited: probes and scrapes
+EXEMPT_PATHS = ("/health", "/metrics")
+
+
+def parse_routes(spec: str) -> Dict[Tuple[str, str], Tuple[float, int]]:
+    """``"POST /api/v1/camera/capture=1:5,..."`` -> {("POST", "/api/v1/camera/capture"): (1.0, 5)}"""
+    routes = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            route, limit = item.rsplit("=", 1)
+            method, path = route.split(None, 1)
+            rate, burst = limit.split(":")
+            routes[(method.upper(), path.strip())] = (float(rate), int(burst))
+        except ValueError:
+            logger.error(f"Ignoring malformed rate limit rule {item!r}; expected 'METHOD /path=rate:burst'")
+    return routes
+
+
+class RateLimiter:
+    """Token buckets keyed by (client, method, route), least recently used dropped beyond ``max_buckets``"""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        routes: Dict[Tuple[str, str], Tuple[float, int]],
+        max_buckets: int,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.routes = routes
+        self.max_buckets = max_buckets
+        # key -> [tokens, last refill time]
+        self._buckets: "OrderedDict[Tuple[str, str, str], list]" = OrderedDict()
+        self.rejected = 0
+
+    def limit_for(self, method: str, route: str) -> Tuple[float, int]:
+        return self.routes.get((method, route), (self.rate, self.burst))
+
+    def take(self, client: str, method: str, route: str, now: Optional[float] = None) -> float:
+        """Take a token; returns 0 if allowed, otherwise the seconds until one is available"""
+        rate, burst = self.limit_for(method, route)
+        if rate <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        key = (client, method, route)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(burst), now]
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return 0.0
+        self.rejected += 1
+        return (1.0 - bucket[0]) / rate
+
+    def stats(self) -> dict:
+        return {
+            "per_second": self.rate,
+            "burst": self.burst,
+            "routes": {f"{method} {path}": {"per_second": rate, "burst": burst}
+                       for (method, path), (rate, burst) in self.routes.items()},
+            "buckets": len(self._buckets),
+            "rejected": self.rejected,
+        }
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 once a client's bucket for a route is empty"""
+
+    def __init__(self, app, router, limiter: RateLimiter, client_header: str = "", trusted_proxies: str = ""):
+        self.app = app
+        self.limiter = limiter
+        self.client_header = client_header.lower().encode()
+        self.trusted_proxies = {p.strip() for p in trusted_proxies.split(",") if p.strip()}
+        self._route_template = metrics.RouteTemplates(router)
+        if self.client_header and not self.trusted_proxies:
+            logger.warning("RATE_LIMIT_CLIENT_HEADER is set without RATE_LIMIT_TRUSTED_PROXIES; it is ignored")
+
+    def _client(self, scope) -> str:
+        client = scope.get("client")
+        address = client[0] if client else "unknown"
+        if self.client_header and address in self.trusted_proxies:
+            for name, value in scope["headers"]:
+                if name == self.client_header:
+                    # Proxies append to X-Forwarded-For; the last entry is the one the trusted proxy added
+                    return value.decode("latin-1").rsplit(",", 1)[-1].strip() or address
+        return address
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route_template(scope)
+        wait = self.limiter.take(self._client(scope), method, route)
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+
+        metrics.HTTP_RATE_LIMITED.labels(metrics.method_label(method), route).inc()
+        body = json.dumps({"detail": f"Rate limit exceeded, retry in {wait:.1f}s"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(wait)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+limiter = RateLimiter(
+    rate=settings.RATE_LIMIT_PER_SECOND,
+    burst=settings.RATE_LIMIT_BURST,
+    routes=parse_routes(settings.RATE_LIMIT_ROUTES),
+    max_buckets=settings.RATE_LIMIT_MAX_BUCKETS,
+)
@@ -4,12 +4,28 @@ Main application entry point
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 import logging
+import math
 
 from app.core.config import settings
 from app.api.v1.api import api_router
 from app.core.logging_config import setup_logging
+from app.core import metrics
+from app.core.loop_monitor import monitor as loop_monitor
+from app.core.rate_limit import limiter, RateLimitMiddleware
+from app.services.admission import AdmissionRejected
+from app.services import job_types, pipeline
+from app.services.events import bus
+from app.services.jobs import jobs
+from app.services.lcd import lcd_queue
+from app.services.n8n_client import n8n
+from app.services.persistence import journal
+from app.services.sensor_ingest import motion_debouncer
+from app.services.sensor_registry import registry
+from app.services.sensor_store import store as sensor_store
+from app.services.webhook_outbox import outbox
 
 # Setup logging
 setup_logging()
@@ -22,7 +38,39 @@ async def lifespan(app: FastAPI):
     logger.info("Starting ESP32 Camera System API")
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"ESP32 IP: {settings.ESP32_IP}")
+    
+    if settings.WAL_ENABLED:
+        journal.open(
+            settings.DATA_DIR,
+            segment_bytes=settings.WAL_SEGMENT_MB * 1024 * 1024,
+            flush_interval=settings.WAL_FLUSH_INTERVAL_MS / 1000,
+        )
+        journal.start_snapshots(settings.WAL_SNAPSHOT_INTERVAL_SECONDS)
+        registry.open(settings.DATA_DIR)
+    registry.rebuild(sensor_store)
+    registry.start()
+    outbox.start()
+    pipeline.setup()
+    bus.start()
+    job_types.register()
+    jobs.start()
+    
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.register_routes(app.routes)
+        loop_monitor.start()
+    
     yield
+    
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.stop()
+    await lcd_queue.stop()
+    await registry.stop()
+    motion_debouncer.flush()
+    await jobs.stop()
+    await bus.stop()
+    await outbox.stop()
+    await n8n.aclose()
+    journal.close()
     logger.info("Shutting down ESP32 Camera System API")
 
 
@@ -37,6 +85,16 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Rate limiting (inside CORS so 429 responses carry CORS headers)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        router=app.router,
+        limiter=limiter,
+        client_header=settings.RATE_LIMIT_CLIENT_HEADER,
+        trusted_proxies=settings.RATE_LIMIT_TRUSTED_PROXIES,
+    )
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -46,10 +104,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request metrics (outermost so CORS handling is timed too)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, router=app.router)
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+@app.exception_handler(AdmissionRejected)
+async def upstream_busy(request, exc: AdmissionRejected):
+    """An upstream (ESP32, n8n webhook) is saturated: 503 with a retry hint"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -69,3 +141,11 @@ async def health_check():
         "version": settings.VERSION,
         "environment": settings.ENVIRONMENT
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,18 @@
+"""
+Background job models
+"""
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
+
+
+class JobRequest(BaseModel):
+    """A job to queue"""
+    type: str = Field(..., description="Job type (see GET /jobs/types)")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Parameters for the job type")
+    priority: int = Field(0, description="Higher priorities run first")
+    idempotency_key: Optional[str] = Field(None, max_length=200, description="Repeated submits return the first job")
+
+
+class BatchDeleteRequest(BaseModel):
+    """Captures to delete in the background"""
+    filenames: List[str] = Field(..., min_length=1, description="Capture file names")
@@ -27,7 +27,8 @@ class LCDMessage(BaseModel):
     """LCD display message"""
     text: str = Field(..., max_length=80)
     line: int = Field(1, ge=1, le=4, description="LCD line number (1-4)")
-    duration_seconds: Optional[int] = Field(None, description="Display duration (None = permanent)")
+    duration_seconds: Optional[int] = Field(None, ge=1, description="Display duration (None = permanent)")
+    display_id: str = Field("lcd_screen_1", description="Target display")
 
 
 class SensorStatus(BaseModel):
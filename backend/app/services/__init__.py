@@ -0,0 +1 @@
+"""Stateful services shared by API endpoints"""
@@ -0,0 +1,182 @@
+"""
+Upstream admission control
+Caps the calls in flight to an upstream that cannot take many at once (the
+ESP32 serves one or two requests at a time). Callers beyond the cap queue in
+arrival order for up to a deadline; when the queue is full, or the deadline
+passes, the call is refused with AdmissionRejected instead of piling more
+load onto the device. Endpoints answer those with 503 and Retry-After.
+
+    async with admission.slot("esp32"):
+        response = await client.get(...)
+
+A slot that must outlive the current block (e.g. one held by a streaming
+response) is taken with hold(); its release() may be called more than once.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """No slot for an upstream call; ``status_code`` is the HTTP status to answer with"""
+
+    def __init__(self, upstream: str, detail: str, retry_after: float, status_code: int = 503):
+        super().__init__(detail)
+        self.upstream = upstream
+        self.detail = detail
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class Gate:
+    """At most ``limit`` holders; up to ``max_waiting`` callers queue FIFO for ``timeout`` seconds"""
+
+    def __init__(self, name: str, limit: int, max_waiting: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "deadline": 0}
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._in_flight = metrics.UPSTREAM_IN_FLIGHT.labels(name)
+        self._waiting = metrics.UPSTREAM_WAITING.labels(name)
+        self._wait_time = metrics.UPSTREAM_ADMISSION_WAIT.labels(name)
+
+    def _reject(self, reason: str, detail: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        metrics.UPSTREAM_REJECTED.labels(self.name, reason).inc()
+        logger.warning(f"Upstream {self.name}: call refused ({detail})")
+        return AdmissionRejected(self.name, detail, retry_after=max(self.timeout, 1.0))
+
+    def _admit(self):
+        self.active += 1
+        self.admitted += 1
+        self._in_flight.set(self.active)
+
+    async def acquire(self, timeout: Optional[float] = None):
+        """Take a slot, waiting up to ``timeout`` (default: the gate's); raises AdmissionRejected"""
+        if self.active < self.limit and not self._waiters:
+            self._admit()
+            return
+        if len(self._waiters) >= self.max_waiting:
+            raise self._reject("queue_full", f"{self.name} busy: {len(self._waiters)} calls already waiting")
+
+        timeout = self.timeout if timeout is None else timeout
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._waiting.set(len(self._waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            # release() may have handed over the slot just as the deadline passed
+            if not (waiter.done() and not waiter.cancelled()):
+                raise self._reject("deadline", f"{self.name} busy: no slot within {timeout:g}s")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._waiting.set(len(self._waiters))
+            self._wait_time.observe(time.perf_counter() - start)
+        # The slot was handed over by release(), which left ``active`` as it was
+        self.admitted += 1
+
+    def release(self):
+        """Give the slot to the longest waiting caller, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._waiting.set(len(self._waiters))
+                return
+        self.active -= 1
+        self._in_flight.set(self.active)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.active,
+            "waiting": len(self._waiters),
+            "max_waiting": self.max_waiting,
+            "timeout_seconds": self.timeout,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+class Slot:
+    """A slot held on a gate; release() frees it once, however often it is called"""
+    __slots__ = ("gate", "released")
+
+    def __init__(self, gate: Gate):
+        self.gate = gate
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.gate.release()
+
+
+class AdmissionController:
+    """One gate per upstream"""
+
+    def __init__(self):
+        self.gates: Dict[str, Gate] = {}
+
+    def configure(self, name: str, limit: int, max_waiting: int, timeout: float):
+        self.gates[name] = Gate(name, limit, max_waiting, timeout)
+
+    async def acquire(self, name: str, timeout: Optional[float] = None):
+        """Take a slot of upstream ``name``; pair with release(), or use slot()"""
+        await self.gates[name].acquire(timeout)
+
+    def release(self, name: str):
+        self.gates[name].release()
+
+    async def hold(self, name: str, timeout: Optional[float] = None) -> Slot:
+        """Take a slot of upstream ``name`` as a Slot object, for holders that outlive a block"""
+        await self.acquire(name, timeout)
+        return Slot(self.gates[name])
+
+    @asynccontextmanager
+    async def slot(self, name: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold a slot of upstream ``name`` for the duration of the block"""
+        await self.acquire(name, timeout)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def stats(self) -> dict:
+        return {name: gate.stats() for name, gate in self.gates.items()}
+
+
+admission = AdmissionController()
+admission.configure(
+    "esp32",
+    limit=settings.ESP32_MAX_CONCURRENT,
+    max_waiting=settings.ESP32_MAX_WAITING,
+    timeout=settings.ESP32_QUEUE_TIMEOUT_SECONDS,
+)
+# Live streams hold their slot for the whole transfer, so they get their own
+# gate and never occupy the slots captures and status calls queue for
+admission.configure(
+    "esp32_stream",
+    limit=settings.ESP32_MAX_STREAMS,
+    max_waiting=0,
+    timeout=settings.ESP32_QUEUE_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,196 @@
+"""
+Streaming anomaly detection
+Scores every ingested reading against per-sensor rolling statistics and
+records readings that deviate too far as anomaly events.
+
+Two methods:
+- ``ewma``: exponentially weighted mean and variance, updated in O(1) per
+  reading; the score is the z-score against the state before the reading.
+- ``mad``: robust z-score against the median and MAD of the sensor's recent
+  raw readings, recomputed from the ring buffer every tenth of the window.
+
+Anomalies are kept in a bounded log, pushed to live subscribers and can
+trigger an n8n webhook through the outbox (at most once per sensor per
+cooldown).
+"""
+import logging
+import math
+import time
+from array import array
+from collections import deque
+from datetime import datetime
+from statistics import median
+from typing import Dict, List, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.sensor_hub import hub
+from app.services.sensor_store import store
+from app.services.webhook_outbox import outbox
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("ewma", "mad")
+# Scale factor making the MAD a consistent estimator of the standard deviation
+MAD_SCALE = 1.4826
+# Avoids infinite scores for a perfectly flat signal
+MIN_DEVIATION = 1e-9
+
+
+class AnomalyDetector:
+    """Per-sensor online scoring of readings"""
+
+    def __init__(
+        self,
+        method: str,
+        threshold: float,
+        alpha: float,
+        warmup: int,
+        mad_window: int,
+        capacity: int,
+    ):
+        if method not in METHODS:
+            raise ValueError(f"Unknown anomaly method {method!r}; use one of {', '.join(METHODS)}")
+        self.method = method
+        self.threshold = threshold
+        self.alpha = alpha
+        self.warmup = warmup
+        self.mad_window = mad_window
+        # ewma: [count, mean, variance]; mad: [baseline size, median, scaled MAD, readings until refresh]
+        self._state: Dict[str, list] = {}
+        self.anomalies: deque = deque(maxlen=capacity)
+        self.total = 0
+        self._last_webhook: Dict[str, float] = {}
+
+    def observe(self, sensor_id: str, sensor_type: str, unit: str, timestamps: array, values: array) -> List[dict]:
+        """Score a batch of readings already appended to the store; returns new anomalies"""
+        if self.method == "ewma":
+            found = self._score_ewma(sensor_id, timestamps, values)
+        else:
+            found = self._score_mad(sensor_id, timestamps, values)
+        if not found:
+            return []
+
+        events = []
+        for timestamp, value, score, baseline in found:
+            event = {
+                "sensor_id": sensor_id,
+                "sensor_type": sensor_type,
+                "value": value,
+                "unit": unit,
+                "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+                "score": round(score, 3),
+                "baseline": baseline,
+                "method": self.method,
+            }
+            self.anomalies.append(event)
+            hub.publish_anomaly(event)
+            events.append(event)
+        self.total += len(events)
+        metrics.SENSOR_ANOMALIES.labels(sensor_type).inc(len(events))
+        logger.warning(
+            f"{len(events)} anomalous reading(s) from {sensor_id}: latest {events[-1]['value']} {unit} "
+            f"(score {events[-1]['score']})"
+        )
+        self._notify(sensor_id, events[-1], len(events))
+        return events
+
+    def _score_ewma(self, sensor_id: str, timestamps: array, values: array) -> list:
+        state = self._state.get(sensor_id)
+        if state is None:
+            state = self._state[sensor_id] = [0, values[0], 0.0]
+        count, mean, var = state
+        alpha, threshold, warmup = self.alpha, self.threshold, self.warmup
+        found = []
+        # Local variables only: this loop runs once per ingested reading
+        for i, x in enumerate(values):
+            diff = x - mean
+            if count >= warmup:
+                score = diff / max(math.sqrt(var), MIN_DEVIATION)
+                if score > threshold or score < -threshold:
+                    found.append((timestamps[i], x, score, mean))
+            incr = alpha * diff
+            mean += incr
+            var = (1 - alpha) * (var + diff * incr)
+            count += 1
+        state[0], state[1], state[2] = count, mean, var
+        return found
+
+    def _score_mad(self, sensor_id: str, timestamps: array, values: array) -> list:
+        state = self._state.get(sensor_id)
+        if state is None:
+            state = self._state[sensor_id] = [0, 0.0, 0.0, 0]
+        found = []
+        n = len(values)
+        series = store.series.get(sensor_id)
+        # Position of values[0] in the series (the batch is already stored)
+        first = series.total - n if series is not None else 0
+        for i, x in enumerate(values):
+            if state[3] <= 0:
+                self._refresh_baseline(state, series, first + i)
+            size, med, mad = state[0], state[1], state[2]
+            if size >= self.warmup:
+                score = (x - med) / max(mad, MIN_DEVIATION)
+                if abs(score) > self.threshold:
+                    found.append((timestamps[i], x, score, med))
+            state[3] -= 1
+        return found
+
+    def _refresh_baseline(self, state: list, series, end_seq: int):
+        """Median and scaled MAD of the readings before ``end_seq``"""
+        state[3] = max(1, self.mad_window // 10)
+        if series is None:
+            return
+        window = [row[2] for row in series.read_range(end_seq - self.mad_window, end_seq)]
+        state[0] = len(window)
+        if not window:
+            return
+        med = median(window)
+        state[1] = med
+        state[2] = median([abs(v - med) for v in window]) * MAD_SCALE
+
+    def _notify(self, sensor_id: str, event: dict, count: int):
+        """Queue the n8n webhook, at most once per sensor per cooldown"""
+        if not settings.ANOMALY_WEBHOOK:
+            return
+        now = time.monotonic()
+        last = self._last_webhook.get(sensor_id)
+        if last is not None and now - last < settings.ANOMALY_WEBHOOK_COOLDOWN_SECONDS:
+            return
+        self._last_webhook[sensor_id] = now
+        payload = {"event": "sensor_anomaly", "anomaly_count": count, **event}
+        outbox.submit(settings.ANOMALY_WEBHOOK, payload)
+
+    def recent(self, sensor_id: Optional[str] = None, limit: int = 50) -> List[dict]:
+        """Most recent anomalies, oldest first"""
+        if limit <= 0:
+            return []
+        if sensor_id is None:
+            return list(self.anomalies)[-limit:]
+        return [a for a in self.anomalies if a["sensor_id"] == sensor_id][-limit:]
+
+    def reset(self, sensor_id: Optional[str] = None):
+        """Forget learned statistics (e.g. after recalibrating a sensor)"""
+        if sensor_id is None:
+            self._state.clear()
+        else:
+            self._state.pop(sensor_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.ANOMALY_DETECTION_ENABLED,
+            "method": self.method,
+            "threshold": self.threshold,
+            "sensors_tracked": len(self._state),
+            "anomalies_total": self.total,
+        }
+
+
+detector = AnomalyDetector(
+    method=settings.ANOMALY_METHOD,
+    threshold=settings.ANOMALY_THRESHOLD,
+    alpha=settings.ANOMALY_EWMA_ALPHA,
+    warmup=settings.ANOMALY_WARMUP,
+    mad_window=settings.ANOMALY_MAD_WINDOW,
+    capacity=settings.ANOMALY_LOG_CAPACITY,
+)
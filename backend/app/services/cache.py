@@ -0,0 +1,101 @@
+"""
+Async TTL cache
+Caches results of upstream calls with a freshness TTL, a stale-while-
+revalidate window and request coalescing.
+
+- Younger than ``ttl``: served from the cache.
+- Between ``ttl`` and ``ttl + stale``: served from the cache while one
+  background refresh runs.
+- Older, or missing: callers wait for a fetch. Concurrent callers for the
+  same key share one upstream call.
+
+Loaders receive the cached value (or None) so they can make a conditional
+request and return it unchanged when the upstream reports no change.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[Optional[Any]], Awaitable[Any]]
+
+
+class AsyncTTLCache:
+    """Bounded LRU of (value, fetched_at) with single-flight loading"""
+
+    def __init__(self, name: str, ttl: float, stale: float, max_entries: int = 256):
+        self.name = name
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # Bumped by invalidate() so fetches started earlier do not store their result
+        self._generation = 0
+        self._tasks: set = set()
+
+    async def get(self, key: Hashable, loader: Loader) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl + self.stale:
+                self._entries.move_to_end(key)
+                metrics.record_cache(self.name, True)
+                if age >= self.ttl:
+                    self._refresh(key, loader, value)
+                return value
+        metrics.record_cache(self.name, False)
+        # shield: a caller going away must not cancel the fetch other callers share
+        return await asyncio.shield(self._refresh(key, loader, entry[0] if entry else None))
+
+    def _refresh(self, key: Hashable, loader: Loader, current: Optional[Any]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._load(key, loader, current))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            # Background refreshes nobody awaits must not log "exception never retrieved"
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _load(self, key: Hashable, loader: Loader, current: Optional[Any]) -> Any:
+        generation = self._generation
+        try:
+            value = await loader(current)
+        except Exception as e:
+            logger.warning(f"Cache {self.name}: refresh of {key!r} failed: {str(e)}")
+            raise
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+        if generation == self._generation:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, *keys: Hashable):
+        """Drop the given keys, or everything when called without keys"""
+        self._generation += 1
+        if not keys:
+            self._entries.clear()
+            self._inflight.clear()
+            return
+        for key in keys:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "refreshing": len(self._inflight),
+            "ttl_seconds": self.ttl,
+            "stale_seconds": self.stale,
+        }
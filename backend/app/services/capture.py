@@ -0,0 +1,64 @@
+"""
+Camera capture
+Fetches a still image from the ESP32 and saves it to CAPTURE_DIR. Shared by
+the capture endpoint and the motion capture pipeline stage.
+"""
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import track_upstream, CAPTURE_BYTES_WRITTEN, CAPTURES_SAVED
+from app.services.admission import admission
+
+
+class CaptureError(Exception):
+    """The ESP32 did not return an image"""
+
+
+async def fetch_image() -> bytes:
+    """JPEG bytes of a new capture; httpx errors (including timeouts) and AdmissionRejected propagate"""
+    async with admission.slot("esp32"), httpx.AsyncClient(timeout=settings.ESP32_TIMEOUT) as client:
+        with track_upstream("esp32", "capture"):
+            response = await client.get(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/capture")
+    if response.status_code != 200:
+        raise CaptureError(f"ESP32 returned {response.status_code}")
+    return response.content
+
+
+def save_image(image_data: bytes, timestamp: str, label: Optional[str] = None) -> Tuple[str, str]:
+    """Write a capture and return (filename, filepath); blocking, run it in a thread"""
+    if label:
+        filename = f"capture_{timestamp}_{label}.jpg"
+    else:
+        filename = f"capture_{timestamp}.jpg"
+    filepath = os.path.join(settings.CAPTURE_DIR, filename)
+
+    os.makedirs(settings.CAPTURE_DIR, exist_ok=True)
+    with open(filepath, 'wb') as f:
+        f.write(image_data)
+    CAPTURES_SAVED.inc()
+    CAPTURE_BYTES_WRITTEN.inc(len(image_data))
+    return filename, filepath
+
+
+def capture_timestamp() -> str:
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def relabel_image(filename: str, new_label: str) -> str:
+    """Rename a capture to carry ``new_label``, keeping its timestamp; returns the new filename"""
+    old_filepath = os.path.join(settings.CAPTURE_DIR, filename)
+    # Extract timestamp from original filename
+    parts = filename.split('_')
+    if len(parts) >= 3:
+        timestamp = f"{parts[1]}_{parts[2].split('.')[0]}"
+        new_filename = f"capture_{timestamp}_{new_label}.jpg"
+    else:
+        new_filename = f"{new_label}.jpg"
+
+    new_filepath = os.path.join(settings.CAPTURE_DIR, new_filename)
+    os.rename(old_filepath, new_filepath)
+    return new_filename
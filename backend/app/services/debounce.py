@@ -0,0 +1,162 @@
+"""
+Event debouncing
+Collapses bursts of events with the same key (e.g. sensor and event type)
+into a few emitted events, each carrying an aggregate of what it stands for.
+
+A burst is a run of events less than ``window`` seconds apart. Modes:
+- ``leading``: emit the first event of a burst, suppress the rest.
+- ``trailing``: emit one aggregate when the burst goes quiet.
+- ``both``: emit the first event, then an aggregate of the suppressed
+  events when the burst goes quiet (if there were any).
+- ``off``: emit every event.
+
+A burst that keeps going is flushed every ``max_wait`` seconds in every mode,
+so continuous activity still produces an event at a bounded rate.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("leading", "trailing", "both", "off")
+
+
+class Burst:
+    """Aggregate of the events seen for one key since the last emit"""
+    __slots__ = (
+        "count", "first_at", "last_at", "max_value", "sum_value", "metadata",
+        "started", "last_seen", "deadline", "timer",
+    )
+
+    def __init__(self, now: float):
+        self.started = self.last_seen = now
+        self.deadline = 0.0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.first_at = self.last_at = 0.0
+        self.max_value = self.sum_value = 0.0
+        self.metadata: Optional[dict] = None
+
+    def add(self, timestamp: float, value: float, metadata: Optional[dict]):
+        if self.count == 0:
+            self.first_at = timestamp
+            self.max_value = value
+        elif value > self.max_value:
+            self.max_value = value
+        self.count += 1
+        self.last_at = timestamp
+        self.sum_value += value
+        if metadata:
+            self.metadata = metadata
+
+    def summary(self, edge: str) -> Dict[str, Any]:
+        return {
+            "edge": edge,
+            "count": self.count,
+            "first_at": datetime.fromtimestamp(self.first_at).isoformat(),
+            "last_at": datetime.fromtimestamp(self.last_at).isoformat(),
+            "max_value": self.max_value,
+            "mean_value": self.sum_value / self.count,
+            "metadata": self.metadata or {},
+        }
+
+
+class Debouncer:
+    """Per-key bursts with one lazily re-armed timer each"""
+
+    def __init__(self, mode: str, window: float, max_wait: float, emit: Callable[[Hashable, Dict[str, Any]], None]):
+        if mode not in MODES:
+            raise ValueError(f"Unknown debounce mode {mode!r}; use one of {', '.join(MODES)}")
+        self.mode = mode
+        self.window = window
+        self.max_wait = max(max_wait, window)
+        self.emit = emit
+        self._bursts: Dict[Hashable, Burst] = {}
+        self.received = 0
+        self.emitted = 0
+
+    def submit(self, key: Hashable, value: float = 1.0, metadata: Optional[dict] = None, timestamp: Optional[float] = None):
+        """Offer one event; it is emitted now, later as part of an aggregate, or folded into one"""
+        timestamp = time.time() if timestamp is None else timestamp
+        self.received += 1
+        if self.mode == "off":
+            burst = Burst(0.0)
+            burst.add(timestamp, value, metadata)
+            self._emit(key, burst, "leading")
+            return
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        burst = self._bursts.get(key)
+        if burst is None:
+            burst = self._bursts[key] = Burst(now)
+            burst.add(timestamp, value, metadata)
+            if self.mode in ("leading", "both"):
+                self._emit(key, burst, "leading")
+            burst.deadline = now + self.window
+            burst.timer = loop.call_at(burst.deadline, self._expire, key)
+            return
+
+        burst.add(timestamp, value, metadata)
+        burst.last_seen = now
+        # Push the quiet deadline out; the armed timer re-arms itself when it fires early
+        burst.deadline = min(now + self.window, burst.started + self.max_wait)
+
+    def _expire(self, key: Hashable):
+        burst = self._bursts.get(key)
+        if burst is None:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if now < burst.deadline:
+            burst.timer = loop.call_at(burst.deadline, self._expire, key)
+            return
+
+        if now - burst.last_seen >= self.window:
+            del self._bursts[key]
+            if burst.count and self.mode in ("trailing", "both"):
+                self._emit(key, burst, "trailing")
+            return
+
+        # Still active after max_wait: flush what has accumulated and start a new period
+        if burst.count:
+            self._emit(key, burst, "max_wait")
+        burst.reset()
+        burst.started = now
+        burst.deadline = now + self.window
+        burst.timer = loop.call_at(burst.deadline, self._expire, key)
+
+    def _emit(self, key: Hashable, burst: Burst, edge: str):
+        self.emitted += 1
+        try:
+            self.emit(key, burst.summary(edge))
+        except Exception as e:
+            logger.error(f"Debounced emit for {key!r} failed: {str(e)}")
+        burst.reset()
+
+    def flush(self):
+        """Emit pending aggregates now (e.g. at shutdown)"""
+        for key, burst in list(self._bursts.items()):
+            if burst.timer:
+                burst.timer.cancel()
+            if burst.count and self.mode in ("trailing", "both"):
+                self._emit(key, burst, "trailing")
+        self._bursts.clear()
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "window_seconds": self.window,
+            "max_wait_seconds": self.max_wait,
+            "active_bursts": len(self._bursts),
+            "received": self.received,
+            "emitted": self.emitted,
+            # Events that did not cause a downstream call of their own
+            "suppressed": self.received - self.emitted,
+        }
@@ -0,0 +1,62 @@
+"""
+ESP32 hardware diagnostics
+The checks behind POST /esp32/test, shared with the esp32_diagnostics job.
+"""
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import track_upstream
+from app.services.admission import admission
+
+Progress = Callable[[float, str], Awaitable[None]]
+
+
+async def hardware_test(results: Dict[str, bool], progress: Optional[Progress] = None) -> Dict[str, bool]:
+    """
+    Test camera, LED, memory, and connectivity, filling in ``results``
+
+    ``results`` is updated as each test finishes, so callers still have the
+    partial outcome when a later test raises.
+    """
+    # Test 1: Connectivity
+    if progress:
+        await progress(0.0, "connectivity")
+    async with admission.slot("esp32"), httpx.AsyncClient(timeout=5.0) as client:
+        with track_upstream("esp32", "test_connectivity"):
+            response = await client.get(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/")
+        results["connectivity"] = response.status_code == 200
+
+    # Test 2: Camera
+    if progress:
+        await progress(0.5, "camera")
+    async with admission.slot("esp32"), httpx.AsyncClient(timeout=10.0) as client:
+        with track_upstream("esp32", "test_camera"):
+            response = await client.get(f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}/capture")
+        results["camera"] = response.status_code == 200 and len(response.content) > 1000
+
+    # Test 3: LED (would need ESP32 endpoint)
+    results["led"] = True  # Assume working if device is online
+
+    # Test 4: Memory (would need ESP32 endpoint)
+    results["memory"] = True  # Assume working if device is online
+
+    # Overall result
+    results["overall"] = all([
+        results["connectivity"],
+        results["camera"],
+        results["led"],
+        results["memory"]
+    ])
+    return results
+
+
+def empty_results() -> Dict[str, bool]:
+    return {
+        "connectivity": False,
+        "camera": False,
+        "led": False,
+        "memory": False,
+        "overall": False
+    }
@@ -0,0 +1,307 @@
+"""
+In-process event bus
+Typed events published by one subsystem and handled by others, so capture,
+sensors, AI analysis and n8n notifications are connected through events
+instead of calling each other directly.
+
+Every subscriber has its own bounded queue and worker tasks, so a slow or
+failing handler only affects itself: its queue fills up and its backpressure
+policy decides what happens to further events.
+
+- ``block``: ``await publish()`` waits for room (up to ``put_timeout``);
+  ``publish_nowait()`` rejects the event for this subscriber.
+- ``drop_oldest``: the oldest queued event is discarded to make room.
+- ``drop_newest``: the new event is discarded.
+
+Handler exceptions and timeouts are logged and counted, never propagated to
+the publisher.
+"""
+import asyncio
+import logging
+import time
+from array import array
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, ClassVar, Dict, List, Optional, Sequence
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+@dataclass(frozen=True)
+class Event:
+    """Base class; subclasses set ``topic``"""
+    topic: ClassVar[str] = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"topic": self.topic, **asdict(self)}
+
+
+@dataclass(frozen=True)
+class CaptureSaved(Event):
+    """An image was written to CAPTURE_DIR"""
+    topic: ClassVar[str] = "capture.saved"
+    filename: str
+    filepath: str
+    size_bytes: int
+    trigger: str  # "api", "motion", "job" or "n8n"
+    sensor_id: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class MotionDetected(Event):
+    """A debounced burst of motion events from one sensor"""
+    topic: ClassVar[str] = "motion.detected"
+    sensor_id: str
+    confidence: float  # burst maximum
+    metadata: Dict[str, Any]
+    debounce: Dict[str, Any]
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class SensorReading(Event):
+    """Readings of one sensor/type/unit group just appended to the store"""
+    topic: ClassVar[str] = "sensor.reading"
+    sensor_id: str
+    sensor_type: str
+    unit: str
+    timestamps: array
+    values: array
+
+
+@dataclass(frozen=True)
+class AnalysisDone(Event):
+    """AI analysis of a captured image finished"""
+    topic: ClassVar[str] = "analysis.done"
+    filename: str
+    analysis: Dict[str, Any]
+    prompt: str
+    model: str
+    trigger: str
+    sensor_id: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+Handler = Callable[[Any], Awaitable[None]]
+
+
+class Subscriber:
+    """One named consumer: topics, a bounded queue, worker tasks and counters"""
+
+    def __init__(
+        self,
+        name: str,
+        topics: Sequence[str],
+        handler: Handler,
+        queue_size: int,
+        policy: str,
+        concurrency: int,
+        timeout: Optional[float],
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy {policy!r}; use one of {', '.join(POLICIES)}")
+        self.name = name
+        self.topics = tuple(topics)
+        self.handler = handler
+        self.policy = policy
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.workers: List[asyncio.Task] = []
+        self.received = 0
+        self.handled = 0
+        self.failed = 0
+        self.shed: Dict[str, int] = {}
+
+    def _shed(self, reason: str):
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        metrics.EVENTS_SHED.labels(self.name, reason).inc()
+
+    def offer(self, event: Event) -> bool:
+        """Queue without waiting, applying the policy when full"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if self.policy == "drop_oldest":
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.queue.put_nowait(event)
+                self._shed("dropped_oldest")
+            else:
+                self._shed("dropped_newest" if self.policy == "drop_newest" else "rejected")
+                return False
+        self.received += 1
+        return True
+
+    async def put(self, event: Event, timeout: float) -> bool:
+        """Queue, waiting up to ``timeout`` for room when the policy is ``block``"""
+        if self.policy != "block" or not self.queue.full():
+            return self.offer(event)
+        try:
+            await asyncio.wait_for(self.queue.put(event), timeout)
+        except asyncio.TimeoutError:
+            self._shed("timeout")
+            return False
+        self.received += 1
+        return True
+
+    async def _work(self):
+        while True:
+            event = await self.queue.get()
+            start = time.perf_counter()
+            result = "ok"
+            try:
+                if self.timeout:
+                    await asyncio.wait_for(self.handler(event), self.timeout)
+                else:
+                    await self.handler(event)
+                self.handled += 1
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                result = "timeout"
+                self.failed += 1
+                logger.error(f"Event subscriber {self.name} timed out handling {event.topic}")
+            except Exception as e:
+                result = "error"
+                self.failed += 1
+                logger.error(f"Event subscriber {self.name} failed handling {event.topic}: {str(e)}")
+            finally:
+                self.queue.task_done()
+                metrics.EVENT_HANDLER_DURATION.labels(self.name, result).observe(time.perf_counter() - start)
+
+    def start(self):
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "topics": list(self.topics),
+            "policy": self.policy,
+            "concurrency": self.concurrency,
+            "queue_size": self.queue.maxsize,
+            "queued": self.queue.qsize(),
+            "received": self.received,
+            "handled": self.handled,
+            "failed": self.failed,
+            "shed": dict(self.shed),
+        }
+
+
+class EventBus:
+    """Routes published events to the subscribers of their topic"""
+
+    def __init__(self, queue_size: int, put_timeout: float):
+        self.queue_size = queue_size
+        self.put_timeout = put_timeout
+        self.subscribers: Dict[str, Subscriber] = {}
+        self._by_topic: Dict[str, List[Subscriber]] = {}
+        self._running = False
+        self.published: Dict[str, int] = {}
+
+    def subscribe(
+        self,
+        name: str,
+        events: Sequence[type],
+        handler: Handler,
+        queue_size: Optional[int] = None,
+        policy: str = "block",
+        concurrency: int = 1,
+        timeout: Optional[float] = None,
+    ) -> Subscriber:
+        """Register ``handler`` for the given Event subclasses under a unique name"""
+        if name in self.subscribers:
+            raise ValueError(f"Event subscriber {name} already registered")
+        subscriber = Subscriber(
+            name,
+            [event_type.topic for event_type in events],
+            handler,
+            queue_size or self.queue_size,
+            policy,
+            concurrency,
+            timeout,
+        )
+        self.subscribers[name] = subscriber
+        for topic in subscriber.topics:
+            self._by_topic.setdefault(topic, []).append(subscriber)
+        if self._running:
+            subscriber.start()
+        return subscriber
+
+    async def unsubscribe(self, name: str):
+        subscriber = self.subscribers.pop(name, None)
+        if subscriber is None:
+            return
+        for topic in subscriber.topics:
+            self._by_topic[topic].remove(subscriber)
+            if not self._by_topic[topic]:
+                del self._by_topic[topic]
+        await subscriber.stop()
+
+    def has_subscribers(self, event_type: type) -> bool:
+        """Cheap check so hot paths can skip building events nobody handles"""
+        return event_type.topic in self._by_topic
+
+    def _count(self, event: Event) -> List[Subscriber]:
+        self.published[event.topic] = self.published.get(event.topic, 0) + 1
+        metrics.EVENTS_PUBLISHED.labels(event.topic).inc()
+        return self._by_topic.get(event.topic, [])
+
+    def publish_nowait(self, event: Event) -> int:
+        """Queue ``event`` for every subscriber without waiting; returns how many took it"""
+        return sum(subscriber.offer(event) for subscriber in self._count(event))
+
+    async def publish(self, event: Event) -> int:
+        """Queue ``event``, waiting for room at ``block`` subscribers; returns how many took it"""
+        accepted = 0
+        for subscriber in self._count(event):
+            accepted += await subscriber.put(event, self.put_timeout)
+        return accepted
+
+    def start(self):
+        self._running = True
+        for subscriber in self.subscribers.values():
+            subscriber.start()
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Give queued events up to ``drain_timeout`` seconds to be handled, then stop the workers"""
+        self._running = False
+        # Handlers may publish to later stages, so drain in registration order
+        deadline = time.monotonic() + drain_timeout
+        for subscriber in self.subscribers.values():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not subscriber.workers:
+                continue
+            try:
+                await asyncio.wait_for(subscriber.queue.join(), remaining)
+            except asyncio.TimeoutError:
+                break
+        left = sum(subscriber.queue.qsize() for subscriber in self.subscribers.values())
+        if left:
+            logger.warning(f"Event bus stopped with {left} events unhandled")
+        for subscriber in self.subscribers.values():
+            await subscriber.stop()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._running,
+            "published": dict(self.published),
+            "subscribers": [subscriber.stats() for subscriber in self.subscribers.values()],
+        }
+
+
+bus = EventBus(queue_size=settings.EVENT_QUEUE_SIZE, put_timeout=settings.EVENT_PUT_TIMEOUT_SECONDS)
@@ -0,0 +1,157 @@
+"""
+Built-in job types
+Handlers for the background jobs the API and the n8n inbound webhook submit.
+Each takes a JobContext and returns a JSON-serializable result.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services import diagnostics
+from app.services.capture import capture_timestamp, fetch_image, relabel_image, save_image
+from app.services.events import bus, AnalysisDone, CaptureSaved
+from app.services.jobs import jobs, JobContext
+from app.services.sensor_store import store as sensor_store
+from app.services.vision import analyze_image
+
+logger = logging.getLogger(__name__)
+
+# Readings per page written by export jobs
+EXPORT_PAGE_SIZE = 5000
+
+
+def _capture_name(params: Dict[str, Any], field: str) -> str:
+    """A bare file name from ``params``; jobs must not address files outside CAPTURE_DIR"""
+    value = str(params[field])
+    if not value or os.path.basename(value) != value:
+        raise ValueError(f"{field} must be a file name")
+    return value
+
+
+async def capture(ctx: JobContext) -> Dict[str, Any]:
+    label = _capture_name(ctx.params, "label") if ctx.params.get("label") else None
+    image_data = await fetch_image()
+    filename, filepath = await asyncio.to_thread(save_image, image_data, capture_timestamp(), label)
+    await bus.publish(CaptureSaved(
+        filename=filename, filepath=filepath, size_bytes=len(image_data), trigger=ctx.params.get("trigger", "job")
+    ))
+    return {"filename": filename, "size_bytes": len(image_data)}
+
+
+async def label_image(ctx: JobContext) -> Dict[str, Any]:
+    filename = _capture_name(ctx.params, "filename")
+    new_filename = await asyncio.to_thread(relabel_image, filename, _capture_name(ctx.params, "label"))
+    return {"old_filename": filename, "new_filename": new_filename}
+
+
+async def analyze(ctx: JobContext) -> Dict[str, Any]:
+    if not settings.OPENAI_API_KEY:
+        raise RuntimeError("AI service not configured. Set OPENAI_API_KEY environment variable.")
+    filename = _capture_name(ctx.params, "filename")
+    prompt = ctx.params.get("prompt") or settings.CAPTURE_ANALYSIS_PROMPT
+
+    def read() -> bytes:
+        with open(os.path.join(settings.CAPTURE_DIR, filename), 'rb') as f:
+            return f.read()
+
+    analysis = await analyze_image(await asyncio.to_thread(read), prompt)
+    await bus.publish(AnalysisDone(
+        filename=filename, analysis=analysis, prompt=prompt, model=settings.AI_MODEL,
+        trigger=ctx.params.get("trigger", "job"),
+    ))
+    return {"filename": filename, "prompt": prompt, "model": settings.AI_MODEL, "analysis": analysis}
+
+
+async def delete_images(ctx: JobContext) -> Dict[str, Any]:
+    filenames = ctx.params["filenames"]
+    if not isinstance(filenames, list):
+        raise ValueError("filenames must be a list")
+    # Validate every name before deleting anything
+    names = [_capture_name({"filename": name}, "filename") for name in filenames]
+    deleted, missing = [], []
+    for i, filename in enumerate(names):
+        try:
+            await asyncio.to_thread(os.remove, os.path.join(settings.CAPTURE_DIR, filename))
+            deleted.append(filename)
+        except FileNotFoundError:
+            missing.append(filename)
+        await ctx.progress((i + 1) / len(names), f"{i + 1} of {len(names)}")
+    logger.info(f"Batch delete removed {len(deleted)} image(s)")
+    return {"deleted": deleted, "missing": missing}
+
+
+def _time(value) -> Optional[float]:
+    """Epoch seconds from a number, a numeric string or an ISO 8601 string"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+async def export_readings(ctx: JobContext) -> Dict[str, Any]:
+    sensor_id = str(ctx.params["sensor_id"])
+    since, until = _time(ctx.params.get("since")), _time(ctx.params.get("until"))
+    series = sensor_store.series.get(sensor_id)
+    total = len(series) if series is not None else 0
+    os.makedirs(settings.JOBS_EXPORT_DIR, exist_ok=True)
+    path = os.path.join(settings.JOBS_EXPORT_DIR, f"job-{ctx.job_id}.ndjson")
+
+    def write(f, rows):
+        f.write("".join(json.dumps(row) + "\n" for row in rows))
+
+    rows_written = 0
+    cursor = None
+    f = await asyncio.to_thread(open, path, "w")
+    try:
+        while True:
+            rows, cursor = sensor_store.page(sensor_id, since, until, cursor, EXPORT_PAGE_SIZE)
+            await asyncio.to_thread(write, f, rows)
+            rows_written += len(rows)
+            if total:
+                await ctx.progress(rows_written / total, f"{rows_written} readings")
+            if cursor is None:
+                break
+    except BaseException:
+        await asyncio.shield(asyncio.to_thread(f.close))
+        await asyncio.shield(asyncio.to_thread(os.remove, path))
+        raise
+    await asyncio.to_thread(f.close)
+    return {"sensor_id": sensor_id, "rows": rows_written, "file": path}
+
+
+async def esp32_diagnostics(ctx: JobContext) -> Dict[str, Any]:
+    # Same outcome as POST /esp32/test: an unreachable device is a failed test, not a failed job
+    results = diagnostics.empty_results()
+    try:
+        await diagnostics.hardware_test(results, ctx.progress)
+    except Exception as e:
+        return {"success": False, "results": results, "message": f"Hardware test failed: {str(e)}"}
+    return {
+        "success": results["overall"],
+        "results": results,
+        "message": "Hardware test completed" if results["overall"] else "Some tests failed"
+    }
+
+
+def register():
+    """Register the built-in job types (call once at startup)"""
+    jobs.register("capture", capture, concurrency=1, timeout=settings.ESP32_TIMEOUT * 2,
+                  description="Capture and save an image (params: label)")
+    jobs.register("label_image", label_image, concurrency=2, required=("filename", "label"),
+                  description="Rename a capture with a new label")
+    jobs.register("analyze_image", analyze, concurrency=2, required=("filename",),
+                  description="AI analysis of a capture (params: filename, prompt)")
+    jobs.register("delete_images", delete_images, concurrency=1, required=("filenames",),
+                  description="Delete a list of captures")
+    jobs.register("export_readings", export_readings, concurrency=1, required=("sensor_id",),
+                  description="Write a sensor's readings to an NDJSON file (params: sensor_id, since, until)")
+    jobs.register("esp32_diagnostics", esp32_diagnostics, concurrency=1, timeout=60,
+                  description="ESP32 hardware test")
@@ -0,0 +1,507 @@
+"""
+Background jobs
+Long-running operations (exports, AI analyses, batch deletes, diagnostics)
+run as jobs stored in SQLite instead of inside request handlers: the request
+returns a job id at once, and the job keeps running if the client goes away.
+
+- Job types are registered with a handler and a per-type concurrency limit;
+  at most JOBS_WORKERS jobs run in total, highest priority first.
+- Handlers report progress through their JobContext; it is visible from
+  GET /jobs/{id} while the job runs.
+- Queued jobs can be cancelled; running jobs are cancelled by cancelling
+  their task.
+- Jobs left running by a previous process are queued again at startup, so
+  handlers should be safe to repeat.
+- A submit with an idempotency key that is already known returns the
+  existing job instead of creating a new one.
+- Finished jobs (and files they produced) are deleted after
+  JOBS_RETENTION_HOURS.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED = ("succeeded", "failed", "cancelled")
+PURGE_INTERVAL_SECONDS = 60.0
+# Progress is written to the database at most this often per job
+PROGRESS_WRITE_SECONDS = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    idempotency_key TEXT UNIQUE,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at);
+"""
+COLUMNS = (
+    "id", "type", "params", "priority", "status", "progress", "message", "result", "error",
+    "idempotency_key", "attempts", "created_at", "started_at", "finished_at", "updated_at",
+)
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are queued; try again later"""
+
+
+def _row_to_dict(row: tuple) -> dict:
+    job = dict(zip(COLUMNS, row))
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
+
+
+class JobContext:
+    """Handed to a job handler: its parameters and progress reporting"""
+
+    def __init__(self, queue: "JobQueue", job_id: int, params: Dict[str, Any]):
+        self.queue = queue
+        self.job_id = job_id
+        self.params = params
+        self.progress_value = 0.0
+        self.message: Optional[str] = None
+        self._written_at = 0.0
+
+    async def progress(self, fraction: float, message: Optional[str] = None):
+        """Report progress between 0 and 1, with an optional status message"""
+        self.progress_value = min(max(fraction, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        now = time.monotonic()
+        if now - self._written_at >= PROGRESS_WRITE_SECONDS:
+            self._written_at = now
+            await asyncio.to_thread(
+                self.queue._execute,
+                "UPDATE jobs SET progress = ?, message = ?, updated_at = ? WHERE id = ?",
+                (self.progress_value, self.message, time.time(), self.job_id),
+            )
+
+
+JobHandler = Callable[[JobContext], Awaitable[Any]]
+
+
+@dataclass
+class JobType:
+    name: str
+    handler: JobHandler
+    concurrency: int
+    timeout: Optional[float]
+    required: Tuple[str, ...]
+    description: str
+
+
+class JobQueue:
+    """Persistent job table, per-type ready heaps and the running job tasks"""
+
+    def __init__(self, path: str, workers: int, max_queued: int, retention: float):
+        self.path = path
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self.types: Dict[str, JobType] = {}
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        # type -> heap of (-priority, id) for queued jobs
+        self._queued: Dict[str, List[Tuple[int, int]]] = {}
+        self._queued_ids: Set[int] = set()
+        # id -> (task, context) of running jobs
+        self._running: Dict[int, Tuple[asyncio.Task, JobContext]] = {}
+        self._running_per_type: Dict[str, int] = {}
+        self._wake = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._tasks: Set[asyncio.Task] = set()
+        self._last_purge = 0.0
+
+    # Registration
+
+    def register(
+        self,
+        name: str,
+        handler: JobHandler,
+        concurrency: int = 1,
+        timeout: Optional[float] = None,
+        required: Sequence[str] = (),
+        description: str = "",
+    ):
+        """Add a job type; ``required`` lists parameters a submit must provide"""
+        if name in self.types:
+            raise ValueError(f"Job type {name} already registered")
+        self.types[name] = JobType(name, handler, concurrency, timeout, tuple(required), description)
+
+    def validate(self, job_type: str, params: Dict[str, Any]):
+        """Raise ValueError unless ``job_type`` exists and ``params`` has its required fields"""
+        registered = self.types.get(job_type)
+        if registered is None:
+            raise ValueError(f"Unknown job type {job_type!r}; use one of {', '.join(sorted(self.types))}")
+        missing = [name for name in registered.required if name not in params]
+        if missing:
+            raise ValueError(f"Job type {job_type} requires params: {', '.join(missing)}")
+
+    # Storage (called from worker threads)
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._db_lock:
+            with self._db:
+                return self._db.execute(sql, params).fetchall()
+
+    def _insert(self, job_type: str, params: str, priority: int, key: Optional[str], now: float) -> Tuple[int, bool]:
+        """(job id, created); an existing job is returned for a known idempotency key"""
+        with self._db_lock:
+            with self._db:
+                cursor = self._db.execute(
+                    "INSERT INTO jobs (type, params, priority, idempotency_key, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (idempotency_key) DO NOTHING",
+                    (job_type, params, priority, key, now, now),
+                )
+                if cursor.rowcount:
+                    return cursor.lastrowid, True
+                row = self._db.execute("SELECT id FROM jobs WHERE idempotency_key = ?", (key,)).fetchone()
+                return row[0], False
+
+    def _open_db(self):
+        """Open (or create) the database and queue unfinished jobs (blocking)"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Jobs not persisted, cannot open {self.path}: {str(e)}")
+            db = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        db.isolation_level = "DEFERRED"
+        self._db = db
+
+        interrupted = self._execute(
+            "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running' RETURNING id", (time.time(),)
+        )
+        if interrupted:
+            logger.warning(f"Jobs: {len(interrupted)} job(s) interrupted by the last shutdown queued again")
+        rows = self._execute("SELECT id, type, priority FROM jobs WHERE status = 'queued' ORDER BY id")
+        for job_id, job_type, priority in rows:
+            self._push(job_type, priority, job_id)
+        if rows:
+            logger.info(f"Jobs: resuming {len(rows)} queued job(s)")
+
+    def _push(self, job_type: str, priority: int, job_id: int):
+        heapq.heappush(self._queued.setdefault(job_type, []), (-priority, job_id))
+        self._queued_ids.add(job_id)
+        metrics.JOBS_QUEUED.set(len(self._queued_ids))
+
+    # Lifecycle
+
+    def start(self):
+        """Open the job table and start running jobs (blocking open, call at startup)"""
+        if self._dispatcher is not None:
+            return
+        if self._db is None:
+            self._open_db()
+        self._stopping = False
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wake.set()
+
+    async def stop(self):
+        """Stop running jobs; they stay marked running and are queued again on the next start"""
+        if self._dispatcher is None:
+            return
+        # wait_for() can swallow a cancellation that races with the wake-up, so also flag it
+        self._stopping = True
+        self._wake.set()
+        self._dispatcher.cancel()
+        tasks = [task for task, _ in self._running.values()] + list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(self._dispatcher, *tasks, return_exceptions=True)
+        self._dispatcher = None
+        with self._db_lock:
+            self._db.close()
+        self._db = None
+        self._queued.clear()
+        self._queued_ids.clear()
+        self._running.clear()
+        self._running_per_type.clear()
+
+    # Public API
+
+    async def submit(
+        self,
+        job_type: str,
+        params: Dict[str, Any],
+        priority: int = 0,
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[dict, bool]:
+        """Queue a job; returns (job, created). Raises ValueError or JobQueueFull"""
+        self.validate(job_type, params)
+        if self._dispatcher is None:
+            self.start()
+        if len(self._queued_ids) >= self.max_queued:
+            raise JobQueueFull(f"{len(self._queued_ids)} jobs queued")
+        now = time.time()
+        job_id, created = await asyncio.to_thread(
+            self._insert, job_type, json.dumps(params), priority, idempotency_key, now
+        )
+        if created:
+            self._push(job_type, priority, job_id)
+            self._wake.set()
+        return await self.get(job_id), created
+
+    async def get(self, job_id: int) -> Optional[dict]:
+        if self._db is None:
+            return None
+        rows = await asyncio.to_thread(
+            self._execute, f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        )
+        if not rows:
+            return None
+        job = _row_to_dict(rows[0])
+        running = self._running.get(job_id)
+        if running is not None:
+            # Newer than the last throttled write
+            job["progress"] = running[1].progress_value
+            job["message"] = running[1].message
+        return job
+
+    async def list(self, status: Optional[str] = None, job_type: Optional[str] = None, limit: int = 50) -> List[dict]:
+        """Most recent jobs first, without results"""
+        if self._db is None:
+            return []
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if job_type:
+            clauses.append("type = ?")
+            params.append(job_type)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"SELECT {', '.join(COLUMNS)} FROM jobs {where}ORDER BY id DESC LIMIT ?",
+            (*params, limit),
+        )
+        jobs = []
+        for row in rows:
+            job = _row_to_dict(row)
+            del job["result"]
+            jobs.append(job)
+        return jobs
+
+    async def cancel(self, job_id: int) -> Optional[str]:
+        """Cancel a queued or running job; returns its status afterwards, or None if unknown"""
+        running = self._running.get(job_id)
+        if running is not None:
+            running[0].cancel()
+            await asyncio.gather(running[0], return_exceptions=True)
+        # Also covers a job whose task was cancelled before it claimed the row
+        now = time.time()
+        rows = await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = 'cancelled', finished_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'queued' RETURNING type",
+            (now, now, job_id),
+        )
+        if rows:
+            # The heap entry is skipped when it comes up
+            self._queued_ids.discard(job_id)
+            metrics.JOBS_QUEUED.set(len(self._queued_ids))
+            metrics.JOBS_FINISHED.labels(rows[0][0], "cancelled").inc()
+        job = await self.get(job_id)
+        return job["status"] if job else None
+
+    async def stats(self) -> dict:
+        counts = dict.fromkeys(STATUSES, 0)
+        if self._db is not None:
+            rows = await asyncio.to_thread(self._execute, "SELECT status, COUNT(*) FROM jobs GROUP BY status")
+            counts.update(dict(rows))
+        return {
+            "running": self._dispatcher is not None,
+            "path": self.path,
+            "counts": counts,
+            "workers": self.workers,
+            "in_flight": len(self._running),
+            "types": {
+                name: {"concurrency": t.concurrency, "running": self._running_per_type.get(name, 0)}
+                for name, t in self.types.items()
+            },
+        }
+
+    # Scheduling
+
+    def _next(self) -> Optional[Tuple[str, int]]:
+        """Highest priority queued job whose type has a free slot"""
+        best = None
+        for name, heap in self._queued.items():
+            job_type = self.types.get(name)
+            if job_type is None or self._running_per_type.get(name, 0) >= job_type.concurrency:
+                continue
+            # Drop cancelled entries
+            while heap and heap[0][1] not in self._queued_ids:
+                heapq.heappop(heap)
+            if heap and (best is None or heap[0] < best[0]):
+                best = (heap[0], name)
+        if best is None:
+            return None
+        (_, job_id), name = best
+        heapq.heappop(self._queued[name])
+        self._queued_ids.discard(job_id)
+        metrics.JOBS_QUEUED.set(len(self._queued_ids))
+        return name, job_id
+
+    async def _dispatch(self):
+        while not self._stopping:
+            while len(self._running) < self.workers:
+                picked = self._next()
+                if picked is None:
+                    break
+                self._start_job(*picked)
+
+            now = time.time()
+            if now - self._last_purge >= PURGE_INTERVAL_SECONDS:
+                self._last_purge = now
+                task = asyncio.create_task(self._purge(now))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=PURGE_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start_job(self, name: str, job_id: int):
+        context = JobContext(self, job_id, {})
+        task = asyncio.create_task(self._run(self.types[name], context))
+        self._running[job_id] = (task, context)
+        self._running_per_type[name] = self._running_per_type.get(name, 0) + 1
+
+        def done(_):
+            self._running.pop(job_id, None)
+            self._running_per_type[name] -= 1
+            self._wake.set()
+
+        task.add_done_callback(done)
+
+    async def _finish(self, job_type: str, job_id: int, status: str, result: Optional[str], error: Optional[str],
+                      progress: float, message: Optional[str]):
+        now = time.time()
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = ?, result = ?, error = ?, progress = ?, message = ?, "
+            "finished_at = ?, updated_at = ? WHERE id = ?",
+            (status, result, error, progress, message, now, now, job_id),
+        )
+        metrics.JOBS_FINISHED.labels(job_type, status).inc()
+
+    async def _cancelled(self, job_type: JobType, context: JobContext, claim: asyncio.Future):
+        """Record a cancellation once the claim on the job's row has settled"""
+        try:
+            claimed = await claim
+        except Exception:
+            claimed = False
+        if claimed:
+            await self._finish(
+                job_type.name, context.job_id, "cancelled", None, None, context.progress_value, context.message
+            )
+            logger.info(f"Job {context.job_id} ({job_type.name}) cancelled")
+
+    async def _run(self, job_type: JobType, context: JobContext):
+        now = time.time()
+        # The claim runs as its own future: cancelling the job while it is in
+        # flight must not leave the row marked running (or queued) in the table
+        claim = asyncio.ensure_future(asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'queued' RETURNING params",
+            (now, now, context.job_id),
+        ))
+        start = None
+        try:
+            rows = await asyncio.shield(claim)
+            if not rows:
+                return
+            context.params = json.loads(rows[0][0])
+            start = time.perf_counter()
+            if job_type.timeout:
+                value = await asyncio.wait_for(job_type.handler(context), job_type.timeout)
+            else:
+                value = await job_type.handler(context)
+            result = json.dumps(value)
+        except asyncio.CancelledError:
+            if not self._stopping:
+                await asyncio.shield(self._cancelled(job_type, context, claim))
+            raise
+        except asyncio.TimeoutError:
+            await self._finish(
+                job_type.name, context.job_id, "failed", None, f"Timed out after {job_type.timeout}s",
+                context.progress_value, context.message,
+            )
+            logger.error(f"Job {context.job_id} ({job_type.name}) timed out")
+            return
+        except Exception as e:
+            await self._finish(
+                job_type.name, context.job_id, "failed", None, f"{type(e).__name__}: {str(e)}",
+                context.progress_value, context.message,
+            )
+            logger.error(f"Job {context.job_id} ({job_type.name}) failed: {str(e)}")
+            return
+        finally:
+            if start is not None:
+                metrics.JOB_DURATION.labels(job_type.name).observe(time.perf_counter() - start)
+        await self._finish(job_type.name, context.job_id, "succeeded", result, None, 1.0, context.message)
+        logger.info(f"Job {context.job_id} ({job_type.name}) succeeded")
+
+    async def _purge(self, now: float):
+        try:
+            rows = await asyncio.to_thread(
+                self._execute,
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed', 'cancelled') AND updated_at < ? "
+                "RETURNING result",
+                (now - self.retention,),
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Job purge failed: {str(e)}")
+            return
+        for (result,) in rows:
+            value = json.loads(result) if result else None
+            path = value.get("file") if isinstance(value, dict) else None
+            if isinstance(path, str):
+                try:
+                    await asyncio.to_thread(os.remove, path)
+                except OSError:
+                    pass
+
+
+jobs = JobQueue(
+    path=settings.JOBS_PATH,
+    workers=settings.JOBS_WORKERS,
+    max_queued=settings.JOBS_MAX_QUEUED,
+    retention=settings.JOBS_RETENTION_HOURS * 3600,
+)
@@ -0,0 +1,277 @@
+"""
+LCD output queue
+Keeps the desired contents of each LCD display server-side and sends whole
+frames to the device from a single writer task.
+
+- Writes are last-write-wins per line: a burst of updates to a line only
+  changes the pending frame, never the number of device calls.
+- The device is sent at most one frame per LCD_FRAME_INTERVAL_MS across all
+  displays, and only when the frame differs from what the display shows.
+- Only the displays listed in LCD_DISPLAYS exist; writes to others are
+  refused with UnknownDisplayError.
+- ``duration_seconds`` expiry is tracked by a hashed timer wheel driven by a
+  single ticker task, so scheduling and cancelling an expiry are O(1).
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.admission import admission
+
+logger = logging.getLogger(__name__)
+
+# Retry delay after a failed device call
+RETRY_SECONDS = 2.0
+
+
+class TimerHandle:
+    """Entry in the timer wheel; cancelling is a flag checked on expiry"""
+    __slots__ = ("callback", "rounds", "cancelled")
+
+    def __init__(self, callback, rounds: int):
+        self.callback = callback
+        self.rounds = rounds
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel with ``slots`` buckets of ``tick`` seconds
+
+    A timer lands in the bucket its deadline falls in and carries the number
+    of full wheel turns left; each tick only visits the current bucket.
+    """
+
+    def __init__(self, tick: float, slots: int):
+        self.tick = tick
+        self.slots = slots
+        self._buckets: List[List[TimerHandle]] = [[] for _ in range(slots)]
+        self._position = 0
+        self._started = time.monotonic()
+        self._ticks = 0
+
+    def schedule(self, delay: float, callback) -> TimerHandle:
+        ticks = max(1, round(delay / self.tick))
+        handle = TimerHandle(callback, (ticks - 1) // self.slots)
+        self._buckets[(self._position + ticks) % self.slots].append(handle)
+        return handle
+
+    def resync(self, now: float):
+        """Continue from ``now`` without firing the ticks missed while stopped"""
+        self._started = now - self._ticks * self.tick
+
+    def advance(self, now: float):
+        """Fire every timer due by ``now``, catching up on missed ticks"""
+        due_ticks = int((now - self._started) / self.tick)
+        while self._ticks < due_ticks:
+            self._ticks += 1
+            self._position = (self._position + 1) % self.slots
+            bucket = self._buckets[self._position]
+            if not bucket:
+                continue
+            waiting = []
+            for handle in bucket:
+                if handle.cancelled:
+                    continue
+                if handle.rounds > 0:
+                    handle.rounds -= 1
+                    waiting.append(handle)
+                    continue
+                try:
+                    handle.callback()
+                except Exception as e:
+                    logger.error(f"Timer callback failed: {str(e)}")
+            self._buckets[self._position] = waiting
+
+    def __len__(self) -> int:
+        return sum(1 for bucket in self._buckets for h in bucket if not h.cancelled)
+
+
+class UnknownDisplayError(ValueError):
+    """The display id is not one of LCD_DISPLAYS"""
+
+
+class LcdDisplay:
+    """Desired and last-sent contents of one display"""
+
+    def __init__(self, display_id: str, lines: int):
+        self.display_id = display_id
+        self.lines: List[str] = [""] * lines
+        self.sent: Optional[Tuple[str, ...]] = None
+        self.expiry: List[Optional[TimerHandle]] = [None] * lines
+        self.stats = {"writes": 0, "frames_sent": 0, "coalesced": 0, "expired": 0, "errors": 0}
+
+    def frame(self) -> Tuple[str, ...]:
+        return tuple(self.lines)
+
+
+class LcdQueue:
+    """
+    The configured displays, the device writer task and the shared expiry wheel
+
+    Every display is driven by the same ESP32, so one writer sends frames
+    for all of them: the device gets at most one call per frame interval
+    however many displays changed, and displays with unsent changes take
+    turns oldest first.
+    """
+
+    def __init__(self, display_ids: List[str], lines: int, frame_interval: float, tick: float = 0.1,
+                 slots: int = 512):
+        self.line_count = lines
+        self.frame_interval = frame_interval
+        self.wheel = TimerWheel(tick, slots)
+        # Fixed set: client-supplied ids never create displays
+        self.displays: Dict[str, LcdDisplay] = {
+            display_id: LcdDisplay(display_id, lines) for display_id in display_ids
+        }
+        # Displays whose frame changed since it was last sent, oldest first
+        self._dirty: Dict[str, None] = {}
+        self._changed = asyncio.Event()
+        self._last_sent_at = 0.0
+        self._writer_task: Optional[asyncio.Task] = None
+        self._ticker: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the expiry ticker and the writer (also started on the first write)"""
+        if self._ticker is None or self._ticker.done():
+            self.wheel.resync(time.monotonic())
+            self._ticker = asyncio.create_task(self._tick())
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        tasks = [task for task in (self._writer_task, self._ticker) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._writer_task = None
+        self._ticker = None
+
+    def _display(self, display_id: str) -> LcdDisplay:
+        display = self.displays.get(display_id)
+        if display is None:
+            raise UnknownDisplayError(
+                f"Unknown display {display_id!r}; use one of {', '.join(sorted(self.displays))}"
+            )
+        self.start()
+        return display
+
+    def _changed_frame(self, display: LcdDisplay):
+        self._dirty[display.display_id] = None
+        self._changed.set()
+
+    def write(self, display_id: str, line: int, text: str, duration_seconds: Optional[float] = None):
+        """Set one line (1-based); with a duration it is cleared again server-side. Raises UnknownDisplayError"""
+        display = self._display(display_id)
+        index = line - 1
+        if display_id in self._dirty:
+            display.stats["coalesced"] += 1
+        display.lines[index] = text
+        display.stats["writes"] += 1
+
+        if display.expiry[index] is not None:
+            display.expiry[index].cancel()
+            display.expiry[index] = None
+        if duration_seconds:
+            def expire():
+                display.expiry[index] = None
+                display.lines[index] = ""
+                display.stats["expired"] += 1
+                self._changed_frame(display)
+            display.expiry[index] = self.wheel.schedule(duration_seconds, expire)
+        self._changed_frame(display)
+
+    def clear(self, display_id: str):
+        """Blank every line of a display. Raises UnknownDisplayError"""
+        display = self._display(display_id)
+        for index, handle in enumerate(display.expiry):
+            if handle is not None:
+                handle.cancel()
+                display.expiry[index] = None
+        display.lines = [""] * self.line_count
+        display.stats["writes"] += 1
+        self._changed_frame(display)
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            self.wheel.advance(time.monotonic())
+
+    async def _writer(self):
+        while True:
+            await self._changed.wait()
+            # Rate limit the device, then send whatever the frame is by then (last write wins)
+            wait = self._last_sent_at + self.frame_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if not self._dirty:
+                self._changed.clear()
+                continue
+            display = self.displays[next(iter(self._dirty))]
+            del self._dirty[display.display_id]
+            if not self._dirty:
+                self._changed.clear()
+            frame = display.frame()
+            if frame == display.sent:
+                continue
+            self._last_sent_at = time.monotonic()
+            if await self._send(display, frame):
+                display.sent = frame
+                display.stats["frames_sent"] += 1
+            else:
+                display.stats["errors"] += 1
+                self._changed_frame(display)
+                await asyncio.sleep(RETRY_SECONDS)
+
+    async def _send(self, display: LcdDisplay, frame: Tuple[str, ...]) -> bool:
+        try:
+            async with admission.slot("esp32"), httpx.AsyncClient(timeout=settings.ESP32_TIMEOUT) as client:
+                with metrics.track_upstream("esp32", "lcd"):
+                    response = await client.post(
+                        f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}{settings.LCD_DEVICE_PATH}",
+                        json={"display_id": display.display_id, "lines": list(frame)}
+                    )
+            if response.status_code != 200:
+                logger.error(f"LCD {display.display_id}: device returned {response.status_code}")
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"LCD {display.display_id}: error sending frame: {str(e)}")
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "displays": len(self.displays),
+            "frame_interval_ms": round(self.frame_interval * 1000),
+            "pending_expiries": len(self.wheel),
+            "pending_displays": len(self._dirty),
+            "frames_sent": sum(d.stats["frames_sent"] for d in self.displays.values()),
+            "coalesced": sum(d.stats["coalesced"] for d in self.displays.values()),
+        }
+
+    def status(self, display_id: str) -> Optional[dict]:
+        display = self.displays.get(display_id)
+        if display is None:
+            return None
+        return {
+            "display_id": display_id,
+            "lines": list(display.lines),
+            "in_sync": display.sent == display.frame(),
+            "pending_expiries": sum(1 for h in display.expiry if h is not None),
+            **display.stats,
+        }
+
+
+lcd_queue = LcdQueue(
+    display_ids=[name.strip() for name in settings.LCD_DISPLAYS.split(",") if name.strip()],
+    lines=settings.LCD_LINES,
+    frame_interval=settings.LCD_FRAME_INTERVAL_MS / 1000,
+)
@@ -0,0 +1,251 @@
+"""
+Motion event log
+Bounded, time-ordered log of motion events with a per-sensor index.
+When full, the oldest event is dropped and counted. A sensor's index (and its
+drop counter) is removed once its last event is dropped, so sensors that stop
+reporting do not keep memory.
+
+Events get increasing sequence numbers and non-decreasing timestamps, so both
+the global log and each sensor's index are sorted and time-window lookups
+are a bisection followed by a slice: O(log n + k).
+"""
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# (seq, timestamp, sensor_id, confidence, metadata)
+Event = Tuple[int, float, str, float, dict]
+
+
+class _SensorIndex:
+    """Sequence numbers and timestamps of one sensor's events, oldest first"""
+    __slots__ = ("seqs", "timestamps", "start", "dropped")
+
+    def __init__(self):
+        self.seqs = array("q")
+        self.timestamps = array("d")
+        # Entries before ``start`` were dropped from the log; compacted lazily
+        self.start = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.seqs) - self.start
+
+    def drop_oldest(self):
+        self.start += 1
+        self.dropped += 1
+        if self.start > 1024 and self.start * 2 > len(self.seqs):
+            del self.seqs[:self.start]
+            del self.timestamps[:self.start]
+            self.start = 0
+
+
+class MotionLog:
+    """Capacity-bounded motion event log with drop-oldest semantics"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        # Ring of events; seq N lives at (N - base) % capacity
+        self._events: List[Event] = []
+        self._base_seq = 0
+        self._timestamps = array("d")
+        self._ts_start = 0
+        self._by_sensor: Dict[str, _SensorIndex] = {}
+        self._next_seq = 0
+        self._last_timestamp = 0.0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(
+        self,
+        sensor_id: str,
+        confidence: float,
+        metadata: Optional[dict] = None,
+        timestamp: Optional[float] = None,
+    ) -> Event:
+        """Record an event and return it"""
+        if self._size >= self.capacity:
+            self._drop_oldest()
+
+        # Clamp so a clock step backwards cannot break the sort order
+        timestamp = max(time.time() if timestamp is None else timestamp, self._last_timestamp)
+        self._last_timestamp = timestamp
+
+        event = (self._next_seq, timestamp, sensor_id, confidence, metadata or {})
+        if len(self._events) < self.capacity:
+            self._events.append(event)
+        else:
+            self._events[(self._next_seq - self._base_seq) % self.capacity] = event
+        self._next_seq += 1
+        self._timestamps.append(timestamp)
+
+        index = self._by_sensor.get(sensor_id)
+        if index is None:
+            index = self._by_sensor[sensor_id] = _SensorIndex()
+        index.seqs.append(event[0])
+        index.timestamps.append(timestamp)
+        return event
+
+    @property
+    def _size(self) -> int:
+        return len(self._timestamps) - self._ts_start
+
+    def _drop_oldest(self):
+        _, _, sensor_id, _, _ = self._event_at(self._next_seq - self._size)
+        self._ts_start += 1
+        if self._ts_start > 1024 and self._ts_start * 2 > len(self._timestamps):
+            del self._timestamps[:self._ts_start]
+            self._ts_start = 0
+        index = self._by_sensor[sensor_id]
+        index.drop_oldest()
+        if not len(index):
+            del self._by_sensor[sensor_id]
+        self.dropped += 1
+
+    def _event_at(self, seq: int) -> Event:
+        return self._events[(seq - self._base_seq) % self.capacity]
+
+    def _window(
+        self,
+        sensor_id: Optional[str],
+        since: Optional[float],
+        until: Optional[float],
+        cursor: Optional[int] = None,
+    ) -> Tuple[int, int, int, Callable[[int], int]]:
+        """
+        Index positions ``(begin, end)`` of events in ``[since, until]``, the
+        position of sequence number ``cursor`` (or ``begin``) and a function
+        mapping positions to sequence numbers
+        """
+        if sensor_id is not None:
+            index = self._by_sensor.get(sensor_id)
+            if index is None:
+                return 0, 0, 0, int
+            timestamps, lo, seqs = index.timestamps, index.start, index.seqs
+            seq_at = seqs.__getitem__
+            cursor_pos = lo if cursor is None else bisect_left(seqs, cursor, lo)
+        else:
+            timestamps, lo = self._timestamps, self._ts_start
+            # Positions in the global timestamp index map to consecutive seqs
+            first_seq = self._next_seq - self._size
+
+            def seq_at(i: int) -> int:
+                return first_seq + i - lo
+            cursor_pos = lo if cursor is None else lo + min(max(cursor - first_seq, 0), self._size)
+
+        hi = len(timestamps)
+        begin = lo if since is None else bisect_left(timestamps, since, lo, hi)
+        end = hi if until is None else bisect_right(timestamps, until, lo, hi)
+        return begin, max(begin, end), max(begin, cursor_pos), seq_at
+
+    def query(
+        self,
+        sensor_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+    ) -> Tuple[int, List[Event]]:
+        """
+        Events in ``[since, until]``, optionally for one sensor
+
+        Returns the number of matching events and the most recent ``limit``
+        of them, oldest first.
+        """
+        begin, end, _, seq_at = self._window(sensor_id, since, until)
+        start = max(begin, end - limit)
+        return end - begin, [self._event_at(seq_at(i)) for i in range(start, end)]
+
+    def page(
+        self,
+        sensor_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        cursor: Optional[int] = None,
+        limit: int = 50,
+    ) -> Tuple[int, List[Event], Optional[int]]:
+        """
+        Keyset page of events in ``[since, until]``, oldest first
+
+        ``cursor`` is the sequence number to resume from (the ``next_cursor``
+        of the previous page). Returns the number of matching events, up to
+        ``limit`` events and the next cursor, or None after the last page.
+        Cursors stay valid while events are appended; if the events they
+        point at were dropped, the page resumes at the oldest one left.
+        """
+        begin, end, start, seq_at = self._window(sensor_id, since, until, cursor)
+        stop = min(end, start + max(limit, 0))
+        events = [self._event_at(seq_at(i)) for i in range(start, stop)]
+        return end - begin, events, seq_at(stop) if stop < end else None
+
+    def count(self, sensor_id: Optional[str] = None) -> int:
+        if sensor_id is None:
+            return self._size
+        index = self._by_sensor.get(sensor_id)
+        return len(index) if index else 0
+
+    def stats(self) -> dict:
+        return {
+            "events": self._size,
+            "capacity": self.capacity,
+            "dropped": self.dropped,
+            "dropped_by_sensor": {
+                sensor_id: index.dropped for sensor_id, index in self._by_sensor.items() if index.dropped
+            },
+        }
+
+    def clear(self) -> int:
+        """Remove all events; the total drop counter is kept. Returns the number removed"""
+        count = self._size
+        self._events = []
+        # Sequence numbers keep increasing across clears
+        self._base_seq = self._next_seq
+        self._timestamps = array("d")
+        self._ts_start = 0
+        self._by_sensor = {}
+        return count
+
+    def snapshot(self) -> dict:
+        """Copy of the log for persistence"""
+        first_seq = self._next_seq - self._size
+        return {
+            "next_seq": self._next_seq,
+            "events": [self._event_at(seq) for seq in range(first_seq, self._next_seq)],
+            "dropped": self.dropped,
+            "dropped_by_sensor": {s: index.dropped for s, index in self._by_sensor.items() if index.dropped},
+        }
+
+    def restore(self, snapshot: dict):
+        """Replace the contents with a snapshot, keeping its sequence numbers"""
+        events = snapshot["events"]
+        self._last_timestamp = 0.0
+        self.clear()
+        self.dropped = 0
+        self._next_seq = self._base_seq = snapshot["next_seq"] - len(events)
+        for _, timestamp, sensor_id, confidence, metadata in events:
+            self.append(sensor_id, confidence, metadata, timestamp)
+        # Events dropped because the capacity shrank are counted on top
+        self.dropped += snapshot["dropped"]
+        for sensor_id, dropped in snapshot["dropped_by_sensor"].items():
+            index = self._by_sensor.get(sensor_id)
+            if index is not None:
+                index.dropped += dropped
+
+
+def event_to_dict(event: Event) -> dict:
+    """Render a logged event in the MotionEvent shape"""
+    _, timestamp, sensor_id, confidence, metadata = event
+    return {
+        "sensor_id": sensor_id,
+        "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+        "confidence": confidence,
+        "metadata": metadata,
+    }
+
+
+motion_log = MotionLog(capacity=settings.MOTION_LOG_CAPACITY)
@@ -0,0 +1,194 @@
+"""
+n8n client
+One connection pool and precomputed request headers for every call to n8n:
+the REST API (workflows, executions, health) and webhook deliveries.
+
+Authentication headers are built once and rebuilt only when credentials
+change:
+- ``X-N8N-API-KEY`` when N8N_API_KEY is set (n8n's public API)
+- HTTP Basic when N8N_BASIC_AUTH_USER is set (instance-level basic auth)
+
+Credentials can be rotated without a restart by pointing
+N8N_CREDENTIALS_FILE at a file of ``KEY=value`` lines (N8N_API_KEY,
+N8N_BASIC_AUTH_USER, N8N_BASIC_AUTH_PASSWORD) that override the
+environment. The file is checked at most every N8N_CREDENTIALS_CHECK_SECONDS
+and re-read when it changes. A 401 from n8n triggers an immediate check,
+and the request is retried once if the credentials changed.
+"""
+import base64
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import track_upstream
+
+logger = logging.getLogger(__name__)
+
+CREDENTIAL_KEYS = ("N8N_API_KEY", "N8N_BASIC_AUTH_USER", "N8N_BASIC_AUTH_PASSWORD")
+WEBHOOK_HEADERS = {"Content-Type": "application/json"}
+
+
+def read_credentials(path: str) -> Dict[str, str]:
+    """``KEY=value`` lines of a credentials file; blank lines and ``#`` comments are skipped"""
+    values = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            key, value = key.strip(), value.strip().strip('"').strip("'")
+            if key in CREDENTIAL_KEYS:
+                values[key] = value
+    return values
+
+
+class N8nClient:
+    """Shared httpx client for n8n with cached auth headers"""
+
+    def __init__(
+        self,
+        url: str,
+        credentials: Dict[str, str],
+        credentials_file: str = "",
+        check_interval: float = 5.0,
+        max_connections: int = 20,
+    ):
+        self.url = url.rstrip("/")
+        self.credentials_file = credentials_file
+        self.check_interval = check_interval
+        self.max_connections = max_connections
+        self.reloads = 0
+        self._defaults = dict(credentials)
+        self._file_mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._client: Optional[httpx.AsyncClient] = None
+        self.headers: Dict[str, str] = {}
+        self.auth = "none"
+        self._apply(self._defaults)
+        self._check_credentials(force=True)
+        self.reloads = 0
+
+    # Credentials
+
+    def _apply(self, credentials: Dict[str, str]):
+        headers = {}
+        modes = []
+        if credentials.get("N8N_API_KEY"):
+            headers["X-N8N-API-KEY"] = credentials["N8N_API_KEY"]
+            modes.append("api_key")
+        if credentials.get("N8N_BASIC_AUTH_USER"):
+            pair = f"{credentials['N8N_BASIC_AUTH_USER']}:{credentials.get('N8N_BASIC_AUTH_PASSWORD', '')}"
+            headers["Authorization"] = f"Basic {base64.b64encode(pair.encode()).decode()}"
+            modes.append("basic")
+        self.headers = headers
+        self.auth = "+".join(modes) or "none"
+
+    def _check_credentials(self, force: bool = False) -> bool:
+        """Re-read the credentials file if it changed; returns True when the headers changed"""
+        if not self.credentials_file:
+            return False
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        try:
+            mtime = os.stat(self.credentials_file).st_mtime
+            if mtime == self._file_mtime:
+                return False
+            credentials = {**self._defaults, **read_credentials(self.credentials_file)}
+        except OSError as e:
+            if self._file_mtime is not None or force:
+                logger.error(f"n8n credentials file {self.credentials_file} unreadable: {str(e)}")
+            return False
+        self._file_mtime = mtime
+        previous = self.headers
+        self._apply(credentials)
+        if self.headers == previous:
+            return False
+        self.reloads += 1
+        logger.info(f"n8n credentials loaded from {self.credentials_file} (auth: {self.auth})")
+        return True
+
+    # Requests
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                timeout=10.0,
+                limits=httpx.Limits(max_connections=self.max_connections),
+            )
+        return self._client
+
+    def _headers(self, extra: Optional[Dict[str, str]]) -> Dict[str, str]:
+        return {**self.headers, **extra} if extra else self.headers
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        operation: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """Authenticated call to ``path`` (e.g. ``/api/v1/workflows``), timed as ``operation``"""
+        self._check_credentials()
+        kwargs: Dict[str, Any] = {"params": params, "json": json}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        with track_upstream("n8n", operation):
+            response = await self.client.request(method, path, headers=self._headers(headers), **kwargs)
+        if response.status_code == 401 and self._check_credentials(force=True):
+            with track_upstream("n8n", operation):
+                response = await self.client.request(method, path, headers=self._headers(headers), **kwargs)
+        return response
+
+    async def stream(self, method: str, path: str, operation: str, *, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """Like request(), with the body left unread; the caller must ``aclose()`` the response"""
+        self._check_credentials()
+        with track_upstream("n8n", operation):
+            return await self.client.send(
+                self.client.build_request(method, path, headers=self.headers, params=params),
+                stream=True
+            )
+
+    async def webhook(self, name: str, body: str, timeout: Optional[float] = None) -> httpx.Response:
+        """POST an already-serialized JSON body to the production webhook ``name``"""
+        kwargs: Dict[str, Any] = {"timeout": timeout} if timeout is not None else {}
+        with track_upstream("n8n", "webhook"):
+            return await self.client.post(f"/webhook/{name}", content=body, headers=WEBHOOK_HEADERS, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "auth": self.auth,
+            "credentials_file": self.credentials_file or None,
+            "credential_reloads": self.reloads,
+        }
+
+
+n8n = N8nClient(
+    url=settings.N8N_URL,
+    credentials={
+        "N8N_API_KEY": settings.N8N_API_KEY,
+        "N8N_BASIC_AUTH_USER": settings.N8N_BASIC_AUTH_USER,
+        "N8N_BASIC_AUTH_PASSWORD": settings.N8N_BASIC_AUTH_PASSWORD,
+    },
+    credentials_file=settings.N8N_CREDENTIALS_FILE,
+    check_interval=settings.N8N_CREDENTIALS_CHECK_SECONDS,
+    max_connections=settings.N8N_MAX_CONNECTIONS,
+)
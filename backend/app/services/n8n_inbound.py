@@ -0,0 +1,115 @@
+"""
+Inbound n8n webhooks
+Callbacks from n8n workflows ("capture now", "label image", ...) posted as a
+WebhookPayload. Requests are authenticated and acknowledged immediately; the
+work runs afterwards as a background job of the type named by ``event``.
+
+Authentication: n8n signs ``<timestamp>.<raw body>`` with HMAC-SHA256 using
+N8N_INBOUND_SECRET and sends
+
+    X-N8N-Timestamp: <epoch seconds>
+    X-N8N-Signature: sha256=<hex digest>
+
+Requests older than N8N_INBOUND_TOLERANCE_SECONDS are rejected so captured
+requests cannot be replayed later.
+
+Idempotency: a request carrying an ``Idempotency-Key`` header (or
+``metadata.idempotency_key``) that was already accepted is answered with the
+original job instead of being queued again, so n8n retries do not repeat
+work. Keys are stored with the jobs and kept as long as they are.
+"""
+import hashlib
+import hmac
+import logging
+import time
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.models.n8n import WebhookPayload
+from app.services.jobs import jobs, JobQueueFull
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_PREFIX = "sha256="
+# Job types n8n may start through the inbound webhook
+COMMANDS = ("capture", "label_image", "analyze_image")
+
+
+class InboundRejected(Exception):
+    """Request not accepted; ``status_code`` is the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class InboundReceiver:
+    """Signature checks and submission of commands as jobs"""
+
+    def __init__(self, secret: str, tolerance: float):
+        self.secret = secret.encode()
+        self.tolerance = tolerance
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.secret)
+
+    def _reject(self, status_code: int, detail: str) -> InboundRejected:
+        self.rejected += 1
+        return InboundRejected(status_code, detail)
+
+    def verify(self, body: bytes, timestamp: Optional[str], signature: Optional[str], now: Optional[float] = None):
+        """Raise InboundRejected unless ``signature`` is valid for ``timestamp`` and ``body``"""
+        if not timestamp or not signature:
+            raise self._reject(401, "Missing X-N8N-Timestamp or X-N8N-Signature header")
+        try:
+            sent_at = float(timestamp)
+        except ValueError:
+            raise self._reject(401, "Invalid X-N8N-Timestamp header")
+        now = time.time() if now is None else now
+        if abs(now - sent_at) > self.tolerance:
+            raise self._reject(401, "Request timestamp outside the allowed window")
+        expected = hmac.new(self.secret, timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+        if signature.startswith(SIGNATURE_PREFIX):
+            signature = signature[len(SIGNATURE_PREFIX):]
+        if not hmac.compare_digest(expected, signature.lower()):
+            raise self._reject(401, "Invalid signature")
+
+    async def accept(self, payload: WebhookPayload, idempotency_key: Optional[str]) -> Tuple[dict, bool]:
+        """Queue the command as a job; returns (job, whether it is a duplicate)"""
+        if payload.event not in COMMANDS:
+            raise self._reject(400, f"Unknown event {payload.event!r}; use one of {', '.join(COMMANDS)}")
+        try:
+            job, created = await jobs.submit(
+                payload.event,
+                {**payload.data, "trigger": "n8n"},
+                idempotency_key=f"n8n:{idempotency_key}" if idempotency_key else None,
+            )
+        except ValueError as e:
+            raise self._reject(400, str(e))
+        except JobQueueFull:
+            raise self._reject(503, "Job queue is full, retry later")
+        if created:
+            self.accepted += 1
+        else:
+            self.duplicates += 1
+        return job, not created
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "commands": list(COMMANDS),
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+        }
+
+
+receiver = InboundReceiver(
+    secret=settings.N8N_INBOUND_SECRET,
+    tolerance=settings.N8N_INBOUND_TOLERANCE_SECONDS,
+)
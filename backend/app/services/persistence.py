@@ -0,0 +1,263 @@
+"""
+Sensor data persistence
+Journals sensor readings and motion events to the write-ahead log, writes
+periodic snapshots and restores both in-memory stores on startup.
+
+Changes are applied in memory first and journaled without waiting for the
+disk; they become durable at the next WAL group commit (every
+WAL_FLUSH_INTERVAL_MS). Startup loads the newest snapshot and replays only
+the segments written after it.
+"""
+import asyncio
+import json
+import logging
+import os
+import pickle
+import re
+import struct
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from app.services.motion_log import motion_log, Event
+from app.services.sensor_store import store, SensorStoreFullError
+from app.services.wal import WriteAheadLog, fsync_directory
+
+logger = logging.getLogger(__name__)
+
+RECORD_READINGS = b"R"
+RECORD_MOTION = b"M"
+RECORD_MOTION_CLEAR = b"C"
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PATTERN = re.compile(r"^snapshot-(\d{8})\.pickle$")
+HEADER = struct.Struct("<I")
+
+
+def snapshot_name(segment_id: int) -> str:
+    return f"snapshot-{segment_id:08d}.pickle"
+
+
+def encode_readings(
+    sensor_id: str,
+    sensor_type: str,
+    unit: str,
+    timestamps: array,
+    values: array,
+    metadata: Optional[Dict[int, dict]] = None,
+) -> bytes:
+    """A readings batch: small JSON header followed by the raw float columns"""
+    head = json.dumps(
+        [sensor_id, sensor_type, unit, len(timestamps), list(metadata.items()) if metadata else None],
+        separators=(",", ":"),
+    ).encode()
+    return b"".join((RECORD_READINGS, HEADER.pack(len(head)), head, timestamps.tobytes(), values.tobytes()))
+
+
+def snapshot_ids(directory: str) -> List[int]:
+    """Segment ids of the snapshots in ``directory``, oldest first"""
+    return sorted(int(m.group(1)) for m in map(SNAPSHOT_PATTERN.match, os.listdir(directory)) if m)
+
+
+def apply_record(payload: bytes):
+    """Replay one journaled change into the in-memory stores"""
+    kind = payload[:1]
+    if kind == RECORD_READINGS:
+        (size,) = HEADER.unpack_from(payload, 1)
+        start = 1 + HEADER.size
+        sensor_id, sensor_type, unit, n, metadata = json.loads(payload[start:start + size])
+        columns = start + size
+        timestamps = array("d")
+        timestamps.frombytes(payload[columns:columns + n * 8])
+        values = array("d")
+        values.frombytes(payload[columns + n * 8:columns + n * 16])
+        try:
+            store.extend(sensor_id, sensor_type, unit, timestamps, values, dict(metadata) if metadata else None)
+        except SensorStoreFullError:
+            pass
+    elif kind == RECORD_MOTION:
+        _, timestamp, sensor_id, confidence, metadata = json.loads(payload[1:])
+        motion_log.append(sensor_id, confidence, metadata, timestamp)
+    elif kind == RECORD_MOTION_CLEAR:
+        motion_log.clear()
+    else:
+        raise ValueError(f"Unknown WAL record type {kind!r}")
+
+
+class Journal:
+    """Owns the WAL and snapshots for the sensor store and motion log"""
+
+    def __init__(self):
+        self.wal: Optional[WriteAheadLog] = None
+        self.directory: Optional[str] = None
+        self.records_since_snapshot = 0
+        self.last_snapshot: Optional[float] = None
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.wal is not None
+
+    def open(self, directory: str, segment_bytes: int, flush_interval: float):
+        """Restore the stores from disk and start journaling (blocking, call at startup)"""
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            logger.error(f"Persistence disabled, cannot create {directory}: {str(e)}")
+            return
+
+        start = time.perf_counter()
+        wal = WriteAheadLog(directory, segment_bytes, flush_interval)
+        snapshots = snapshot_ids(directory)
+        from_segment = self._load_snapshot(directory, snapshots)
+        replayed = 0
+        for payload in wal.replay(from_segment):
+            try:
+                apply_record(payload)
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable WAL record: {str(e)}")
+                continue
+            replayed += 1
+        # Number new segments after every snapshot on disk, even one that
+        # could not be loaded, so later snapshots and replay see them
+        wal.start(first_segment=snapshots[-1] if snapshots else 1)
+
+        self.wal = wal
+        self.directory = directory
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"Restored {sum(len(s) for s in store.series.values())} readings and {len(motion_log)} "
+            f"motion events ({replayed} WAL records replayed) in {elapsed_ms:.0f}ms"
+        )
+
+    def _load_snapshot(self, directory: str, snapshots: List[int]) -> int:
+        """Restore the newest snapshot; returns the first segment not covered by it"""
+        if not snapshots:
+            return 0
+        segment_id = snapshots[-1]
+        try:
+            with open(os.path.join(directory, snapshot_name(segment_id)), "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"unsupported version {state.get('version')}")
+        except Exception as e:
+            logger.error(f"Ignoring snapshot {snapshot_name(segment_id)}: {str(e)}")
+            return 0
+
+        skipped = store.restore(state["sensors"])
+        if skipped:
+            logger.warning(f"Sensor store budget exceeded, {skipped} sensors not restored")
+        motion_log.restore(state["motion"])
+        self.last_snapshot = state["created_at"]
+        return segment_id
+
+    def log_readings(
+        self,
+        sensor_id: str,
+        sensor_type: str,
+        unit: str,
+        timestamps: array,
+        values: array,
+        metadata: Optional[Dict[int, dict]] = None,
+    ):
+        if self.wal is not None:
+            self.wal.append(encode_readings(sensor_id, sensor_type, unit, timestamps, values, metadata))
+            self.records_since_snapshot += 1
+
+    def log_motion(self, event: Event):
+        if self.wal is not None:
+            self.wal.append(RECORD_MOTION + json.dumps(event, separators=(",", ":")).encode())
+            self.records_since_snapshot += 1
+
+    def log_motion_clear(self):
+        if self.wal is not None:
+            self.wal.append(RECORD_MOTION_CLEAR)
+            self.records_since_snapshot += 1
+
+    def _capture(self):
+        """Mark a segment boundary and copy the stores at exactly that point"""
+        segment_id = self.wal.rotate()
+        self.records_since_snapshot = 0
+        state = {
+            "version": SNAPSHOT_VERSION,
+            "created_at": time.time(),
+            "sensors": store.snapshot(),
+            "motion": motion_log.snapshot(),
+        }
+        return segment_id, state
+
+    def _write_snapshot(self, segment_id: int, state: dict):
+        """Persist a captured snapshot and drop the WAL segments it covers (blocking)"""
+        with self._snapshot_lock:
+            # Closes the segments before the boundary so they can be removed
+            self.wal.flush()
+            path = os.path.join(self.directory, snapshot_name(segment_id))
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            fsync_directory(self.directory)
+
+            for name in os.listdir(self.directory):
+                match = SNAPSHOT_PATTERN.match(name)
+                if match and int(match.group(1)) < segment_id:
+                    os.remove(os.path.join(self.directory, name))
+            removed = self.wal.remove_segments_before(segment_id)
+            self.last_snapshot = state["created_at"]
+        logger.info(f"Snapshot {snapshot_name(segment_id)} written, {removed} WAL segments removed")
+
+    async def snapshot(self):
+        """Take a snapshot without blocking the event loop on disk writes"""
+        if self.wal is None:
+            return
+        segment_id, state = self._capture()
+        await asyncio.to_thread(self._write_snapshot, segment_id, state)
+
+    def start_snapshots(self, interval: float):
+        """Snapshot every ``interval`` seconds while there are new records"""
+        if self.wal is None:
+            return
+
+        async def run():
+            while True:
+                await asyncio.sleep(interval)
+                if not self.records_since_snapshot:
+                    continue
+                try:
+                    await self.snapshot()
+                except OSError as e:
+                    logger.error(f"Snapshot failed: {str(e)}")
+
+        self._snapshot_task = asyncio.create_task(run())
+
+    def close(self):
+        """Write a final snapshot and flush the WAL (blocking, call at shutdown)"""
+        if self.wal is None:
+            return
+        if self._snapshot_task:
+            self._snapshot_task.cancel()
+        try:
+            if self.records_since_snapshot:
+                self._write_snapshot(*self._capture())
+        except OSError as e:
+            logger.error(f"Final snapshot failed: {str(e)}")
+        self.wal.close()
+        self.wal = None
+
+    def stats(self) -> dict:
+        if self.wal is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "directory": self.directory,
+            "segments": len(self.wal.segments()),
+            "records_since_snapshot": self.records_since_snapshot,
+            "last_snapshot": self.last_snapshot,
+        }
+
+
+journal = Journal()
@@ -0,0 +1,106 @@
+"""
+Event pipelines
+Stages subscribed to the event bus, each enabled by its own setting:
+
+    motion.detected --(MOTION_WORKFLOW_ENABLED)--> n8n motion-detected webhook
+    motion.detected --(MOTION_CAPTURE_ENABLED)---> capture --> capture.saved
+    capture.saved ---(CAPTURE_ANALYSIS_ENABLED)--> AI analysis --> analysis.done
+    analysis.done ---(ANALYSIS_WEBHOOK)----------> n8n webhook
+
+Stages run concurrently with their own queues. Capture keeps only the newest
+motion events when the camera falls behind; analysis blocks the capture stage
+when it falls behind, so captures are not taken faster than they can be
+analyzed.
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+from app.core.config import settings
+from app.services.capture import capture_timestamp, fetch_image, save_image
+from app.services.events import bus, AnalysisDone, CaptureSaved, MotionDetected
+from app.services.vision import analyze_image
+from app.services.webhook_outbox import outbox
+
+logger = logging.getLogger(__name__)
+
+# Motion events waiting for the camera; older ones are dropped when it falls behind
+CAPTURE_QUEUE_SIZE = 4
+# Captures waiting for analysis before the capture stage is held back
+ANALYSIS_QUEUE_SIZE = 8
+
+
+async def notify_motion(event: MotionDetected):
+    await outbox.enqueue("motion-detected", {
+        "event": "motion_detected",
+        "timestamp": datetime.fromtimestamp(event.timestamp).isoformat(),
+        "sensor_id": event.sensor_id,
+        "confidence": event.confidence,
+        "metadata": event.metadata,
+        "debounce": event.debounce,
+    })
+
+
+async def capture_on_motion(event: MotionDetected):
+    image_data = await fetch_image()
+    filename, filepath = await asyncio.to_thread(
+        save_image, image_data, capture_timestamp(), f"motion_{event.sensor_id}"
+    )
+    logger.info(f"Motion capture saved: {filename}")
+    await bus.publish(CaptureSaved(
+        filename=filename,
+        filepath=filepath,
+        size_bytes=len(image_data),
+        trigger="motion",
+        sensor_id=event.sensor_id,
+    ))
+
+
+def _read(filepath: str) -> bytes:
+    with open(filepath, 'rb') as f:
+        return f.read()
+
+
+async def analyze_capture(event: CaptureSaved):
+    image_data = await asyncio.to_thread(_read, event.filepath)
+    prompt = settings.CAPTURE_ANALYSIS_PROMPT
+    analysis = await analyze_image(image_data, prompt)
+    await bus.publish(AnalysisDone(
+        filename=event.filename,
+        analysis=analysis,
+        prompt=prompt,
+        model=settings.AI_MODEL,
+        trigger=event.trigger,
+        sensor_id=event.sensor_id,
+    ))
+
+
+async def notify_analysis(event: AnalysisDone):
+    await outbox.enqueue(settings.ANALYSIS_WEBHOOK, {
+        "event": "analysis_done",
+        "timestamp": datetime.fromtimestamp(event.timestamp).isoformat(),
+        "filename": event.filename,
+        "trigger": event.trigger,
+        "sensor_id": event.sensor_id,
+        "model": event.model,
+        "prompt": event.prompt,
+        "analysis": event.analysis,
+    })
+
+
+def setup():
+    """Subscribe the enabled stages (call once at startup, before bus.start())"""
+    if settings.MOTION_WORKFLOW_ENABLED:
+        bus.subscribe("n8n-motion", [MotionDetected], notify_motion)
+    if settings.MOTION_CAPTURE_ENABLED:
+        bus.subscribe(
+            "motion-capture", [MotionDetected], capture_on_motion,
+            queue_size=CAPTURE_QUEUE_SIZE, policy="drop_oldest", timeout=settings.ESP32_TIMEOUT * 2,
+        )
+    if settings.CAPTURE_ANALYSIS_ENABLED:
+        if settings.OPENAI_API_KEY:
+            bus.subscribe("capture-analysis", [CaptureSaved], analyze_capture, queue_size=ANALYSIS_QUEUE_SIZE)
+        else:
+            logger.warning("CAPTURE_ANALYSIS_ENABLED is set but OPENAI_API_KEY is not; captures will not be analyzed")
+    if settings.ANALYSIS_WEBHOOK:
+        bus.subscribe("n8n-analysis", [AnalysisDone], notify_analysis)
@@ -0,0 +1,192 @@
+"""
+Sensor rollups
+Per-sensor 1m/1h/1d aggregates (count, sum, min, max, last) maintained on
+ingest, and bucketed downsampling over either the rollups or raw readings.
+
+Aggregation works on runs of readings that fall in the same bucket: when
+timestamps are sorted, each run is found by bisection and reduced with the
+C-level ``sum``/``min``/``max`` over an array slice, so the per-reading cost
+stays out of the Python interpreter.
+"""
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# (bucket start, count, sum, min, max, last value, timestamp of last value)
+Aggregate = Tuple[float, int, float, float, float, float, float]
+
+# (bucket width in seconds, buckets retained): 1 day of minutes, 30 days of hours, 1 year of days
+ROLLUP_LEVELS = ((60, 1440), (3600, 720), (86400, 365))
+ROLLUP_BYTES = sum(slots for _, slots in ROLLUP_LEVELS) * 7 * 8
+
+AGGREGATES = ("min", "max", "mean", "last", "count")
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+BUCKET_PATTERN = re.compile(r"^(\d+)([smhd]?)$")
+
+
+def parse_bucket(value: str) -> int:
+    """Bucket width in seconds from ``"90"``, ``"30s"``, ``"5m"``, ``"1h"`` or ``"1d"``"""
+    match = BUCKET_PATTERN.match(value.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid bucket {value!r}; use e.g. 30s, 5m, 1h or 1d")
+    return int(match.group(1)) * UNITS[match.group(2) or "s"]
+
+
+def format_bucket(seconds: int) -> str:
+    """Shortest unit label for a bucket width, e.g. 3600 -> ``"1h"``"""
+    for unit in ("d", "h", "m"):
+        if seconds % UNITS[unit] == 0:
+            return f"{seconds // UNITS[unit]}{unit}"
+    return f"{seconds}s"
+
+
+def aggregate(timestamps: Sequence[float], values: Sequence[float], width: float) -> List[Aggregate]:
+    """Reduce readings to one aggregate per ``width``-second bucket, oldest first"""
+    n = len(timestamps)
+    if n == 0:
+        return []
+    if n == 1 or array("d", sorted(timestamps)) == array("d", timestamps):
+        out = []
+        i = 0
+        while i < n:
+            start = timestamps[i] // width * width
+            # At least one reading per run, even where ``start + width`` rounds back to ``start``
+            j = max(bisect_left(timestamps, start + width, i), i + 1)
+            run = values[i:j]
+            out.append((start, j - i, sum(run), min(run), max(run), run[-1], timestamps[j - 1]))
+            i = j
+        return out
+
+    # Out of order: accumulate per bucket
+    buckets: Dict[float, list] = {}
+    for timestamp, value in zip(timestamps, values):
+        start = timestamp // width * width
+        agg = buckets.get(start)
+        if agg is None:
+            buckets[start] = [start, 1, value, value, value, value, timestamp]
+            continue
+        agg[1] += 1
+        agg[2] += value
+        if value < agg[3]:
+            agg[3] = value
+        if value > agg[4]:
+            agg[4] = value
+        if timestamp >= agg[6]:
+            agg[5], agg[6] = value, timestamp
+    return [tuple(buckets[start]) for start in sorted(buckets)]
+
+
+def combine(aggregates: Sequence[Aggregate], width: float) -> List[Aggregate]:
+    """Merge finer aggregates (in time order) into ``width``-second buckets"""
+    out: List[list] = []
+    for start, count, total, lo, hi, last, last_ts in aggregates:
+        bucket = start // width * width
+        if out and out[-1][0] == bucket:
+            agg = out[-1]
+            agg[1] += count
+            agg[2] += total
+            agg[3] = min(agg[3], lo)
+            agg[4] = max(agg[4], hi)
+            if last_ts >= agg[6]:
+                agg[5], agg[6] = last, last_ts
+        else:
+            out.append([bucket, count, total, lo, hi, last, last_ts])
+    return [tuple(agg) for agg in out]
+
+
+class Rollup:
+    """
+    Ring of fixed-width buckets for one sensor
+
+    Bucket ``k`` (covering ``[k * width, (k + 1) * width)``) lives in slot
+    ``k % slots``; a slot is reused once a newer bucket maps to it, and
+    readings older than the retained window are ignored.
+    """
+    __slots__ = ("width", "slots", "starts", "counts", "sums", "mins", "maxs", "lasts", "last_ts")
+
+    def __init__(self, width: int, slots: int):
+        self.width = width
+        self.slots = slots
+        self.starts = array("d", [-1.0]) * slots
+        self.counts = array("d", [0.0]) * slots
+        self.sums = array("d", [0.0]) * slots
+        self.mins = array("d", [0.0]) * slots
+        self.maxs = array("d", [0.0]) * slots
+        self.lasts = array("d", [0.0]) * slots
+        self.last_ts = array("d", [0.0]) * slots
+
+    def merge(self, agg: Aggregate):
+        start, count, total, lo, hi, last, last_ts = agg
+        slot = int(start // self.width) % self.slots
+        current = self.starts[slot]
+        if current != start:
+            if current > start:
+                return
+            self.starts[slot] = start
+            self.counts[slot] = count
+            self.sums[slot] = total
+            self.mins[slot] = lo
+            self.maxs[slot] = hi
+            self.lasts[slot] = last
+            self.last_ts[slot] = last_ts
+            return
+        self.counts[slot] += count
+        self.sums[slot] += total
+        if lo < self.mins[slot]:
+            self.mins[slot] = lo
+        if hi > self.maxs[slot]:
+            self.maxs[slot] = hi
+        if last_ts >= self.last_ts[slot]:
+            self.lasts[slot] = last
+            self.last_ts[slot] = last_ts
+
+    def add(self, timestamp: float, value: float):
+        self.merge((timestamp // self.width * self.width, 1, value, value, value, value, timestamp))
+
+    def range(self, since: float, until: float) -> List[Aggregate]:
+        """Retained buckets starting in ``[since, until]``, oldest first"""
+        found = [
+            (start, int(self.counts[i]), self.sums[i], self.mins[i], self.maxs[i], self.lasts[i], self.last_ts[i])
+            for i, start in enumerate(self.starts)
+            if start >= 0 and since <= start <= until
+        ]
+        found.sort()
+        return found
+
+    def copy(self) -> "Rollup":
+        other = Rollup.__new__(Rollup)
+        other.width, other.slots = self.width, self.slots
+        for name in ("starts", "counts", "sums", "mins", "maxs", "lasts", "last_ts"):
+            setattr(other, name, getattr(self, name)[:])
+        return other
+
+
+def new_rollups() -> Tuple[Rollup, ...]:
+    return tuple(Rollup(width, slots) for width, slots in ROLLUP_LEVELS)
+
+
+def update_rollups(rollups: Sequence[Rollup], timestamps: Sequence[float], values: Sequence[float]):
+    """Fold a batch into every level, touching each reading only for the finest one"""
+    aggs = aggregate(timestamps, values, rollups[0].width)
+    for agg in aggs:
+        rollups[0].merge(agg)
+    for rollup in rollups[1:]:
+        for agg in combine(aggs, rollup.width):
+            rollup.merge(agg)
+
+
+def rollup_for(rollups: Sequence[Rollup], width: int) -> Optional[Rollup]:
+    """The coarsest rollup whose buckets evenly divide ``width``, if any"""
+    best = None
+    for rollup in rollups:
+        if width % rollup.width == 0:
+            best = rollup
+    return best
+
+
+def render(agg: Aggregate, fields: Sequence[str]) -> dict:
+    """Selected aggregate values for one bucket"""
+    _, count, total, lo, hi, last, _ = agg
+    values = {"min": lo, "max": hi, "mean": total / count, "last": last, "count": count}
+    return {field: values[field] for field in fields}
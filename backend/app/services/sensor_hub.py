@@ -0,0 +1,157 @@
+"""
+Sensor push hub
+In-process pub/sub for new sensor readings, motion events and anomalies, consumed by
+the WebSocket and Server-Sent Events endpoints.
+
+Each message is serialized to JSON once, at publish time, and only if some
+subscriber wants it; subscribers receive the shared text. Every subscriber
+has a bounded queue. When a consumer falls behind and its queue is full,
+readings are coalesced to the newest message per sensor and motion events
+beyond the queue are dropped and counted, so a slow dashboard never grows
+memory or slows down ingest.
+"""
+import asyncio
+import json
+from array import array
+from collections import deque
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+KINDS = ("readings", "motion", "anomalies")
+
+
+class Subscription:
+    """One connected consumer: filters, a bounded queue and coalesced overflow"""
+
+    def __init__(
+        self,
+        queue_size: int,
+        sensor_ids: Optional[Set[str]] = None,
+        sensor_types: Optional[Set[str]] = None,
+        kinds: Collection[str] = KINDS,
+    ):
+        self.queue_size = queue_size
+        self.sensor_ids = sensor_ids
+        self.sensor_types = sensor_types
+        self.kinds = set(kinds)
+        self.queue: deque = deque()
+        # Overflow: newest undelivered message per key, in arrival order
+        self.overflow: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self.coalesced = 0
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def matches(self, kind: str, sensor_id: str, sensor_type: str) -> bool:
+        return (
+            kind in self.kinds
+            and (self.sensor_ids is None or sensor_id in self.sensor_ids)
+            and (self.sensor_types is None or sensor_type in self.sensor_types)
+        )
+
+    def offer(self, kind: str, sensor_id: str, text: str):
+        if len(self.queue) < self.queue_size and not self.overflow:
+            self.queue.append((kind, text))
+        elif kind == "readings":
+            key = (kind, sensor_id)
+            if key in self.overflow:
+                self.coalesced += 1
+                metrics.PUSH_MESSAGES_SHED.labels("coalesced").inc()
+            elif len(self.overflow) >= self.queue_size:
+                self.dropped += 1
+                metrics.PUSH_MESSAGES_SHED.labels("dropped").inc()
+                return
+            self.overflow[key] = (kind, text)
+        else:
+            self.dropped += 1
+            metrics.PUSH_MESSAGES_SHED.labels("dropped").inc()
+            return
+        self._ready.set()
+
+    async def get(self) -> List[Tuple[str, str]]:
+        """Wait for messages and take everything pending as (kind, JSON text), oldest first"""
+        while not self.queue and not self.overflow:
+            self._ready.clear()
+            await self._ready.wait()
+        messages = list(self.queue)
+        messages.extend(self.overflow.values())
+        self.queue.clear()
+        self.overflow.clear()
+        return messages
+
+
+class SensorHub:
+    """Fans out sensor readings and motion events to subscriptions"""
+
+    def __init__(self, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscriptions: Set[Subscription] = set()
+        self.published = 0
+
+    def subscribe(
+        self,
+        sensor_ids: Optional[Set[str]] = None,
+        sensor_types: Optional[Set[str]] = None,
+        kinds: Collection[str] = KINDS,
+    ) -> Optional[Subscription]:
+        """New subscription, or None when the subscriber limit is reached"""
+        if len(self.subscriptions) >= self.max_subscribers:
+            return None
+        subscription = Subscription(self.queue_size, sensor_ids, sensor_types, kinds)
+        self.subscriptions.add(subscription)
+        metrics.PUSH_SUBSCRIBERS.set(len(self.subscriptions))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+        metrics.PUSH_SUBSCRIBERS.set(len(self.subscriptions))
+
+    def _publish(self, kind: str, sensor_id: str, sensor_type: str, build):
+        if not self.subscriptions:
+            return
+        targets = [s for s in self.subscriptions if s.matches(kind, sensor_id, sensor_type)]
+        if not targets:
+            return
+        text = json.dumps(build())
+        self.published += 1
+        for subscription in targets:
+            subscription.offer(kind, sensor_id, text)
+
+    def publish_readings(
+        self,
+        sensor_id: str,
+        sensor_type: str,
+        unit: str,
+        timestamps: array,
+        values: array,
+    ):
+        """One message per ingested group: ``points`` are ``[epoch seconds, value]`` pairs"""
+        self._publish("readings", sensor_id, sensor_type, lambda: {
+            "type": "readings",
+            "sensor_id": sensor_id,
+            "sensor_type": sensor_type,
+            "unit": unit,
+            "points": [list(point) for point in zip(timestamps, values)],
+        })
+
+    def publish_motion(self, event: dict):
+        """``event`` in the MotionEvent shape"""
+        self._publish("motion", event["sensor_id"], "motion", lambda: {"type": "motion", **event})
+
+    def publish_anomaly(self, anomaly: dict):
+        self._publish("anomalies", anomaly["sensor_id"], anomaly["sensor_type"], lambda: {"type": "anomaly", **anomaly})
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscriptions),
+            "max_subscribers": self.max_subscribers,
+            "queue_size": self.queue_size,
+            "published": self.published,
+            "coalesced": sum(s.coalesced for s in self.subscriptions),
+            "dropped": sum(s.dropped for s in self.subscriptions),
+        }
+
+
+hub = SensorHub(queue_size=settings.PUSH_QUEUE_SIZE, max_subscribers=settings.PUSH_MAX_SUBSCRIBERS)
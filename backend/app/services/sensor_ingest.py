@@ -0,0 +1,289 @@
+"""
+Sensor reading ingest
+Single-reading and bulk paths into the sensor store. Bulk input is validated
+with plain type checks (no per-reading Pydantic model) and grouped per
+sensor/type/unit so each group is appended to its ring buffer in one call.
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.anomaly import detector
+from app.services.debounce import Debouncer
+from app.services.events import bus, MotionDetected, SensorReading
+from app.services.motion_log import motion_log, event_to_dict
+from app.services.persistence import journal
+from app.services.sensor_hub import hub
+from app.services.sensor_registry import registry
+from app.services.sensor_store import store, SensorStoreFullError
+
+logger = logging.getLogger(__name__)
+
+MAX_ERRORS_REPORTED = 20
+# Readings validated and stored between event loop yields
+INGEST_SLICE = 5000
+
+# Placeholder for NDJSON lines that were already rejected as invalid JSON
+SKIP = object()
+_decode = json.JSONDecoder().decode
+
+# Epoch seconds datetime.fromtimestamp() can render, with a day of margin for the local time zone
+MIN_TIMESTAMP = datetime(1, 1, 2).timestamp()
+MAX_TIMESTAMP = datetime(9999, 12, 30).timestamp()
+
+# (timestamps, values, metadata by offset)
+_Group = Tuple[array, array, Dict[int, dict]]
+
+
+class InvalidBatchError(ValueError):
+    """The request body as a whole is not a batch of readings"""
+
+
+@dataclass
+class IngestResult:
+    """Per-batch accept/reject accounting"""
+    accepted: int = 0
+    rejected: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def reject(self, index: int, reason: str, count: int = 1):
+        self.rejected += count
+        if len(self.errors) < MAX_ERRORS_REPORTED:
+            self.errors.append({"index": index, "error": reason})
+
+
+def _on_stored(
+    sensor_id: str,
+    sensor_type: str,
+    unit: str,
+    timestamps: array,
+    values: array,
+    metadata: Optional[Dict[int, dict]] = None,
+):
+    """Journal, register, publish and score readings just appended to the store"""
+    journal.log_readings(sensor_id, sensor_type, unit, timestamps, values, metadata)
+    registry.observe(sensor_id, sensor_type, unit, timestamps[-1], values[-1], len(store.series[sensor_id]))
+    hub.publish_readings(sensor_id, sensor_type, unit, timestamps, values)
+    if bus.has_subscribers(SensorReading):
+        bus.publish_nowait(SensorReading(sensor_id, sensor_type, unit, timestamps, values))
+    if settings.ANOMALY_DETECTION_ENABLED:
+        detector.observe(sensor_id, sensor_type, unit, timestamps, values)
+
+
+def record_reading(
+    sensor_id: str,
+    sensor_type: str,
+    value: float,
+    unit: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    timestamp: Optional[float] = None,
+) -> dict:
+    """Store one reading and return it in the SensorReading shape"""
+    timestamp = time.time() if timestamp is None else timestamp
+    seq = store.append(sensor_id, sensor_type, value, unit, timestamp, metadata)
+    _on_stored(
+        sensor_id, sensor_type, unit, array("d", [timestamp]), array("d", [value]), {0: metadata} if metadata else None
+    )
+    series = store.series[sensor_id]
+    return store.to_dict(series, series.read_range(seq, seq + 1)[0])
+
+
+def _publish_motion(key: Tuple[str, str], summary: Dict[str, Any]):
+    """Publish a debounced burst as one motion.detected event"""
+    sensor_id, _ = key
+    bus.publish_nowait(MotionDetected(
+        sensor_id=sensor_id,
+        confidence=summary["max_value"],
+        metadata=summary["metadata"],
+        debounce={
+            "edge": summary["edge"],
+            "count": summary["count"],
+            "first_at": summary["first_at"],
+            "last_at": summary["last_at"],
+            "mean_confidence": summary["mean_value"],
+        },
+    ))
+
+
+# Keyed by (sensor_id, event type) so a chattering PIR starts one pipeline run per burst
+motion_debouncer = Debouncer(
+    mode=settings.MOTION_DEBOUNCE_MODE,
+    window=settings.MOTION_DEBOUNCE_SECONDS,
+    max_wait=settings.MOTION_DEBOUNCE_MAX_WAIT_SECONDS,
+    emit=_publish_motion,
+)
+
+
+def record_motion(sensor_id: str, confidence: float, metadata: Optional[Dict[str, Any]] = None) -> dict:
+    """Log one motion event and return it in the MotionEvent shape"""
+    event = motion_log.append(sensor_id, confidence, metadata)
+    journal.log_motion(event)
+    event_dict = event_to_dict(event)
+    hub.publish_motion(event_dict)
+    if bus.has_subscribers(MotionDetected):
+        motion_debouncer.submit((sensor_id, "motion"), confidence, metadata)
+    return event_dict
+
+
+def _parse_timestamp(raw, received_at: float) -> float:
+    if raw is None:
+        return received_at
+    if type(raw) is float or type(raw) is int:
+        timestamp = float(raw)
+    elif type(raw) is str:
+        timestamp = datetime.fromisoformat(raw).timestamp()
+    else:
+        raise ValueError("timestamp must be epoch seconds or an ISO 8601 string")
+    if not math.isfinite(timestamp) or not MIN_TIMESTAMP <= timestamp <= MAX_TIMESTAMP:
+        raise ValueError("timestamp is out of range")
+    return timestamp
+
+
+def ingest_items(items: List[Any], result: IngestResult, offset: int = 0, received_at: Optional[float] = None):
+    """
+    Validate ``items`` and append the valid ones to the store
+
+    ``offset`` is the position of ``items[0]`` in the whole request so
+    reported error indexes refer to the caller's input. Every item is
+    validated before the store is touched; exceptions raised after that are
+    internal errors, not a problem with the input.
+    """
+    received_at = time.time() if received_at is None else received_at
+    groups: Dict[Tuple[str, str, str], _Group] = {}
+    first_index: Dict[Tuple[str, str, str], int] = {}
+
+    for i, item in enumerate(items, offset):
+        if item is SKIP:
+            continue
+        try:
+            sensor_id = item["sensor_id"]
+            sensor_type = item["sensor_type"]
+            unit = item["unit"]
+            value = item["value"]
+        except (KeyError, TypeError):
+            result.reject(i, "sensor_id, sensor_type, value and unit are required")
+            continue
+        if type(sensor_id) is not str or type(sensor_type) is not str or type(unit) is not str or not sensor_id:
+            result.reject(i, "sensor_id, sensor_type and unit must be non-empty strings")
+            continue
+        # bool is a subclass of int, so compare exact types
+        try:
+            valid = (type(value) is float or type(value) is int) and math.isfinite(value)
+        except OverflowError:
+            valid = False
+        if not valid:
+            result.reject(i, "value must be a finite number")
+            continue
+        metadata = item.get("metadata")
+        if metadata is not None and type(metadata) is not dict:
+            result.reject(i, "metadata must be an object")
+            continue
+        try:
+            timestamp = _parse_timestamp(item.get("timestamp"), received_at)
+        except OverflowError:
+            result.reject(i, "timestamp is out of range")
+            continue
+        except ValueError as e:
+            result.reject(i, str(e))
+            continue
+
+        key = (sensor_id, sensor_type, unit)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = (array("d"), array("d"), {})
+            first_index[key] = i
+        timestamps, values, metas = group
+        if metadata:
+            metas[len(timestamps)] = metadata
+        timestamps.append(timestamp)
+        values.append(value)
+
+    for key, (timestamps, values, metas) in groups.items():
+        sensor_id, sensor_type, unit = key
+        try:
+            store.extend(sensor_id, sensor_type, unit, timestamps, values, metas)
+        except SensorStoreFullError as e:
+            result.reject(first_index[key], str(e), count=len(timestamps))
+            continue
+        _on_stored(sensor_id, sensor_type, unit, timestamps, values, metas)
+        result.accepted += len(timestamps)
+
+
+async def ingest_json_array(body: bytes) -> IngestResult:
+    """Ingest a JSON array of readings (or an object with a ``readings`` array)"""
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise InvalidBatchError(f"Body is not valid JSON: {str(e)}")
+    if isinstance(data, dict):
+        data = data.get("readings")
+    if not isinstance(data, list):
+        raise InvalidBatchError("Body must be a JSON array of readings")
+    result = IngestResult()
+    received_at = time.time()
+    for offset in range(0, len(data), INGEST_SLICE):
+        ingest_items(data[offset:offset + INGEST_SLICE], result, offset, received_at)
+        # Let other requests run between slices of a large batch
+        await asyncio.sleep(0)
+    return result
+
+
+def _parse_lines(lines: List[bytes], result: IngestResult, offset: int) -> List[Any]:
+    """
+    Parse NDJSON lines one by one
+
+    Lines are not joined into one array for a single json.loads call:
+    malformed lines can combine into valid JSON that way (e.g. an object
+    split over two lines), which stores garbage and shifts error indexes.
+    A reused decoder on str keeps the per-line cost low.
+    """
+    items = []
+    for i, line in enumerate(lines, offset):
+        try:
+            # UnicodeDecodeError is a ValueError too
+            items.append(_decode(line.decode()))
+        except ValueError:
+            result.reject(i, "invalid JSON")
+            # Keep positions aligned with the input for error reporting
+            items.append(SKIP)
+    return items
+
+
+async def ingest_ndjson(chunks: AsyncIterator[bytes]) -> IngestResult:
+    """
+    Ingest a streamed NDJSON body incrementally, a few thousand lines at a time
+
+    Blank lines are ignored; error indexes count non-blank lines.
+    """
+    result = IngestResult()
+    buffer = b""
+    pending: List[bytes] = []
+    offset = 0
+    received_at = time.time()
+
+    async def flush(lines: List[bytes]):
+        nonlocal offset
+        ingest_items(_parse_lines(lines, result, offset), result, offset, received_at)
+        offset += len(lines)
+        await asyncio.sleep(0)
+
+    async for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        pending.extend(line for line in lines if line.strip())
+        while len(pending) >= INGEST_SLICE:
+            await flush(pending[:INGEST_SLICE])
+            del pending[:INGEST_SLICE]
+    if buffer.strip():
+        pending.append(buffer)
+    for start in range(0, len(pending), INGEST_SLICE):
+        await flush(pending[start:start + INGEST_SLICE])
+    return result
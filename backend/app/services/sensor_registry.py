@@ -0,0 +1,239 @@
+"""
+Sensor registry
+Per-sensor metadata, configuration and latest value, kept up to date by the
+ingest path so listing sensors is a walk over ready-made entries.
+
+Configuration changes are saved to DATA_DIR (when persistence is enabled)
+and pushed to the ESP32 in batches: changes made within
+SENSOR_CONFIG_PUSH_DELAY_MS of each other go out in one device call, and a
+sensor reconfigured before its push only sends its newest config.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.admission import admission
+from app.services.wal import fsync_directory
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = "sensor_config.json"
+# Retry delay after a failed device call
+RETRY_SECONDS = 2.0
+
+
+class SensorRegistry:
+    """Registered sensors keyed by id; entries are the dicts served by the list endpoint"""
+
+    def __init__(self, push_delay: float, batch_max: int):
+        self.push_delay = push_delay
+        self.batch_max = batch_max
+        self.entries: Dict[str, dict] = {}
+        self.path: Optional[str] = None
+        # sensor_id -> config version waiting to be pushed
+        self._pending: Dict[str, int] = {}
+        self._changed = asyncio.Event()
+        self._pusher: Optional[asyncio.Task] = None
+        self._save_lock = asyncio.Lock()
+        self.pushes = 0
+        self.push_errors = 0
+
+    def _entry(self, sensor_id: str, sensor_type: str) -> dict:
+        entry = self.entries.get(sensor_id)
+        if entry is None:
+            entry = self.entries[sensor_id] = {
+                "id": sensor_id,
+                "type": sensor_type,
+                "status": "configured",
+                "unit": None,
+                "readings_count": 0,
+                "latest_value": None,
+                "last_seen": None,
+                "config": {},
+                "config_version": 0,
+                "config_synced": True,
+            }
+        return entry
+
+    def observe(self, sensor_id: str, sensor_type: str, unit: str, timestamp: float, value: float, retained: int):
+        """Record the newest reading of an ingested batch"""
+        entry = self._entry(sensor_id, sensor_type)
+        entry["type"] = sensor_type
+        entry["status"] = "active"
+        entry["unit"] = unit
+        entry["readings_count"] = retained
+        entry["latest_value"] = f"{value} {unit}"
+        entry["last_seen"] = datetime.fromtimestamp(timestamp).isoformat()
+
+    def rebuild(self, store):
+        """Seed reading fields from the sensor store (after restoring it at startup)"""
+        for sensor_id, series in store.series.items():
+            latest = series.latest()
+            if latest:
+                _, timestamp, value, type_id, unit_id = latest
+                self.observe(
+                    sensor_id,
+                    store.strings.values[type_id],
+                    store.strings.values[unit_id],
+                    timestamp,
+                    value,
+                    len(series),
+                )
+
+    def list(self) -> List[dict]:
+        return list(self.entries.values())
+
+    def get(self, sensor_id: str) -> Optional[dict]:
+        return self.entries.get(sensor_id)
+
+    async def configure(self, sensor_id: str, sensor_type: str, config: Dict[str, Any]) -> dict:
+        """Merge ``config`` into the sensor's configuration, save it and queue a device push"""
+        entry = self._entry(sensor_id, sensor_type)
+        entry["config"] = {**entry["config"], **config}
+        entry["config_version"] += 1
+        entry["config_synced"] = False
+        self._pending[sensor_id] = entry["config_version"]
+        await self._save()
+        self._start_pusher()
+        self._changed.set()
+        return entry
+
+    # Persistence
+
+    def open(self, directory: str):
+        """Load saved configuration (blocking, call at startup)"""
+        path = os.path.join(directory, CONFIG_FILE)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if os.path.exists(path):
+                with open(path) as f:
+                    saved = json.load(f)
+                for sensor_id, item in saved.items():
+                    entry = self._entry(sensor_id, item["type"])
+                    entry["config"] = item["config"]
+                    entry["config_version"] = item["version"]
+                    entry["config_synced"] = item["synced"]
+                    if not item["synced"]:
+                        self._pending[sensor_id] = item["version"]
+                logger.info(f"Loaded configuration for {len(saved)} sensors")
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Sensor configuration not loaded from {path}: {str(e)}")
+        self.path = path
+
+    def _write(self, saved: dict):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(saved, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        fsync_directory(os.path.dirname(self.path))
+
+    async def _save(self):
+        if self.path is None:
+            return
+        async with self._save_lock:
+            saved = {
+                sensor_id: {
+                    "type": entry["type"],
+                    "config": entry["config"],
+                    "version": entry["config_version"],
+                    "synced": entry["config_synced"],
+                }
+                for sensor_id, entry in self.entries.items()
+                if entry["config_version"]
+            }
+            try:
+                await asyncio.to_thread(self._write, saved)
+            except OSError as e:
+                logger.error(f"Error saving sensor configuration: {str(e)}")
+
+    # Device push
+
+    def _start_pusher(self):
+        if self._pusher is None or self._pusher.done():
+            self._pusher = asyncio.create_task(self._push_loop())
+
+    def start(self):
+        """Push configuration left unsynced by a previous run"""
+        if self._pending:
+            self._start_pusher()
+            self._changed.set()
+
+    async def stop(self):
+        if self._pusher is not None:
+            self._pusher.cancel()
+            await asyncio.gather(self._pusher, return_exceptions=True)
+            self._pusher = None
+
+    async def _push_loop(self):
+        while True:
+            await self._changed.wait()
+            # Let a burst of changes accumulate into one batch
+            await asyncio.sleep(self.push_delay)
+            self._changed.clear()
+            if not self._pending:
+                continue
+            batch = list(self._pending.items())[:self.batch_max]
+            if await self._send(batch):
+                self.pushes += 1
+                for sensor_id, version in batch:
+                    entry = self.entries[sensor_id]
+                    # A newer change made during the call stays pending
+                    if self._pending.get(sensor_id) == version:
+                        del self._pending[sensor_id]
+                        entry["config_synced"] = True
+                await self._save()
+            else:
+                self.push_errors += 1
+                await asyncio.sleep(RETRY_SECONDS)
+            if self._pending:
+                self._changed.set()
+
+    async def _send(self, batch: list) -> bool:
+        payload = {
+            "sensors": [
+                {
+                    "sensor_id": sensor_id,
+                    "sensor_type": self.entries[sensor_id]["type"],
+                    "config": self.entries[sensor_id]["config"],
+                }
+                for sensor_id, _ in batch
+            ]
+        }
+        try:
+            async with admission.slot("esp32"), httpx.AsyncClient(timeout=settings.ESP32_TIMEOUT) as client:
+                with metrics.track_upstream("esp32", "sensor_config"):
+                    response = await client.post(
+                        f"http://{settings.ESP32_IP}:{settings.ESP32_PORT}{settings.SENSOR_CONFIG_DEVICE_PATH}",
+                        json=payload
+                    )
+            if response.status_code != 200:
+                logger.error(f"Sensor config push returned {response.status_code}")
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"Error pushing sensor configuration: {str(e)}")
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "sensors": len(self.entries),
+            "config_pending": len(self._pending),
+            "config_pushes": self.pushes,
+            "config_push_errors": self.push_errors,
+            "persisted": self.path is not None,
+        }
+
+
+registry = SensorRegistry(
+    push_delay=settings.SENSOR_CONFIG_PUSH_DELAY_MS / 1000,
+    batch_max=settings.SENSOR_CONFIG_BATCH_MAX,
+)
@@ -0,0 +1,461 @@
+"""
+Sensor time-series store
+Fixed-capacity ring buffers per sensor, stored column-wise in ``array``
+objects: 8-byte timestamp, 8-byte value and 2-byte interned type/unit ids
+per reading instead of one Pydantic object each. Each series also keeps
+1m/1h/1d rollups (see ``app.services.rollups``) for long-range queries.
+"""
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.rollups import (
+    ROLLUP_BYTES, Aggregate, aggregate, combine, format_bucket, new_rollups, rollup_for, update_rollups
+)
+
+# Bytes reserved per reading: timestamp (d) + value (d) + type id (H) + unit id (H)
+BYTES_PER_READING = 8 + 8 + 2 + 2
+
+
+class SensorStoreFullError(Exception):
+    """Raised when a new sensor would exceed the store's memory budget"""
+
+
+def last_disorder(timestamps: array) -> Optional[int]:
+    """Index of the last timestamp older than the one before it, or None when sorted"""
+    # sorted() is linear on already sorted input, so the common case stays in C
+    if array("d", sorted(timestamps)) == timestamps:
+        return None
+    for i in range(len(timestamps) - 1, 0, -1):
+        if timestamps[i] < timestamps[i - 1]:
+            return i
+    return None
+
+
+class Interner:
+    """Maps repeated strings (units, sensor types) to small integer ids"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def intern(self, value: str) -> int:
+        found = self._ids.get(value)
+        if found is None:
+            if len(self.values) >= 0xFFFF:
+                raise SensorStoreFullError("Too many distinct units/sensor types")
+            found = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return found
+
+
+class SensorSeries:
+    """
+    Ring buffer of readings for one sensor
+
+    Every reading gets an absolute sequence number (``seq``); the buffer holds
+    sequence numbers ``total - len(self)`` up to ``total - 1``.
+
+    ``disorder`` is the newest seq whose timestamp is older than its
+    predecessor's. Once that reading's predecessor has been overwritten, the
+    buffer is in timestamp order again and range lookups can bisect it.
+    """
+    __slots__ = (
+        "sensor_id", "capacity", "timestamps", "values", "types", "units", "metadata", "total", "rollups", "disorder"
+    )
+
+    def __init__(self, sensor_id: str, capacity: int):
+        self.sensor_id = sensor_id
+        self.capacity = capacity
+        self.timestamps = array("d")
+        self.values = array("d")
+        self.types = array("H")
+        self.units = array("H")
+        # Sparse: only readings that carried metadata, keyed by seq
+        self.metadata: Dict[int, dict] = {}
+        self.total = 0
+        self.rollups = new_rollups()
+        self.disorder = 0
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def first_seq(self) -> int:
+        return self.total - len(self.timestamps)
+
+    @property
+    def in_order(self) -> bool:
+        """True when the buffered readings are sorted by timestamp"""
+        return self.disorder <= self.first_seq
+
+    def _last_timestamp(self) -> Optional[float]:
+        return self.timestamps[self._position(self.total - 1)] if self.timestamps else None
+
+    def append(self, timestamp: float, value: float, type_id: int, unit_id: int, metadata: Optional[dict] = None):
+        seq = self.total
+        previous = self._last_timestamp()
+        if previous is not None and timestamp < previous:
+            self.disorder = seq
+        if len(self.timestamps) < self.capacity:
+            # Still filling: arrays grow geometrically up to capacity
+            self.timestamps.append(timestamp)
+            self.values.append(value)
+            self.types.append(type_id)
+            self.units.append(unit_id)
+        else:
+            pos = seq % self.capacity
+            self.timestamps[pos] = timestamp
+            self.values[pos] = value
+            self.types[pos] = type_id
+            self.units[pos] = unit_id
+            if self.metadata:
+                self.metadata.pop(seq - self.capacity, None)
+        if metadata:
+            self.metadata[seq] = metadata
+        self.total = seq + 1
+        for rollup in self.rollups:
+            rollup.add(timestamp, value)
+
+    def extend(
+        self,
+        timestamps: array,
+        values: array,
+        type_id: int,
+        unit_id: int,
+        metadata: Optional[Dict[int, dict]] = None,
+    ):
+        """
+        Append many readings of one type/unit at once
+
+        ``timestamps`` and ``values`` are ``array("d")`` columns; ``metadata``
+        maps offsets within the batch to metadata dicts. Columns are copied
+        with slice operations rather than per-reading appends.
+        """
+        n = len(timestamps)
+        base = self.total
+        if n:
+            previous = self._last_timestamp()
+            if previous is not None and timestamps[0] < previous:
+                self.disorder = base
+            disorder = last_disorder(timestamps)
+            if disorder is not None:
+                self.disorder = base + disorder
+        i = 0
+        room = self.capacity - len(self.timestamps)
+        if room > 0:
+            take = min(room, n)
+            self.timestamps.extend(timestamps[:take])
+            self.values.extend(values[:take])
+            self.types.extend(array("H", [type_id]) * take)
+            self.units.extend(array("H", [unit_id]) * take)
+            i = take
+        while i < n:
+            # Overwrite the oldest slots, one contiguous run up to the wrap point
+            pos = (base + i) % self.capacity
+            chunk = min(n - i, self.capacity - pos)
+            self.timestamps[pos:pos + chunk] = timestamps[i:i + chunk]
+            self.values[pos:pos + chunk] = values[i:i + chunk]
+            self.types[pos:pos + chunk] = array("H", [type_id]) * chunk
+            self.units[pos:pos + chunk] = array("H", [unit_id]) * chunk
+            i += chunk
+        self.total = base + n
+        update_rollups(self.rollups, timestamps, values)
+
+        if self.metadata and self.total > self.capacity:
+            first = self.first_seq
+            for seq in [seq for seq in self.metadata if seq < first]:
+                del self.metadata[seq]
+        if metadata:
+            first = self.first_seq
+            for offset, meta in metadata.items():
+                if base + offset >= first:
+                    self.metadata[base + offset] = meta
+
+    def _position(self, seq: int) -> int:
+        return seq % self.capacity if len(self.timestamps) == self.capacity else seq
+
+    def segments(self, start_seq: int, end_seq: int) -> List[Tuple[int, int, int]]:
+        """
+        Physical slices covering ``[start_seq, end_seq)`` as (seq, begin, end)
+
+        At most two slices are needed because the ring wraps once. Callers
+        index the column arrays (or memoryviews of them) directly, so reads
+        never copy the buffers.
+        """
+        start_seq = max(start_seq, self.first_seq)
+        end_seq = min(end_seq, self.total)
+        if start_seq >= end_seq:
+            return []
+        begin = self._position(start_seq)
+        count = end_seq - start_seq
+        if begin + count <= len(self.timestamps):
+            return [(start_seq, begin, begin + count)]
+        first = len(self.timestamps) - begin
+        return [(start_seq, begin, len(self.timestamps)), (start_seq + first, 0, count - first)]
+
+    def read_range(self, start_seq: int, end_seq: int) -> List[Tuple[int, float, float, int, int]]:
+        """
+        (seq, timestamp, value, type_id, unit_id) rows in sequence order
+
+        Columns are read through memoryview slices, so only the result rows
+        are allocated. The views are released before returning because an
+        exported array cannot grow.
+        """
+        rows = []
+        with memoryview(self.timestamps) as ts, memoryview(self.values) as vals, \
+                memoryview(self.types) as types, memoryview(self.units) as units:
+            for seq, begin, end in self.segments(start_seq, end_seq):
+                rows.extend(zip(range(seq, seq + end - begin), ts[begin:end], vals[begin:end],
+                                types[begin:end], units[begin:end]))
+        return rows
+
+    def columns(self, start_seq: Optional[int] = None, end_seq: Optional[int] = None) -> Tuple[array, array]:
+        """Copies of the timestamp and value columns in sequence order (of ``[start_seq, end_seq)``)"""
+        start_seq = self.first_seq if start_seq is None else start_seq
+        end_seq = self.total if end_seq is None else end_seq
+        timestamps, values = array("d"), array("d")
+        with memoryview(self.timestamps) as ts, memoryview(self.values) as vals:
+            for _, begin, end in self.segments(start_seq, end_seq):
+                timestamps.frombytes(ts[begin:end].cast("B"))
+                values.frombytes(vals[begin:end].cast("B"))
+        return timestamps, values
+
+    def bisect(self, timestamp: float, right: bool = False) -> int:
+        """
+        Seq of the first reading at or after ``timestamp`` (after it, with ``right``)
+
+        Only meaningful while ``in_order``. Bisects the physical slices in
+        place, so the cost is logarithmic and nothing is copied.
+        """
+        find = bisect_right if right else bisect_left
+        for seq, begin, end in self.segments(self.first_seq, self.total):
+            last = self.timestamps[end - 1]
+            if last > timestamp or (not right and last == timestamp):
+                return seq + find(self.timestamps, timestamp, begin, end) - begin
+        return self.total
+
+    def resync_order(self):
+        """Recompute ``disorder`` from the buffered readings (after adopting restored columns)"""
+        disorder = last_disorder(self.columns()[0])
+        self.disorder = 0 if disorder is None else self.first_seq + disorder
+
+    def latest(self) -> Optional[Tuple[int, float, float, int, int]]:
+        if not self.timestamps:
+            return None
+        seq = self.total - 1
+        pos = self._position(seq)
+        return seq, self.timestamps[pos], self.values[pos], self.types[pos], self.units[pos]
+
+
+class SensorStore:
+    """All sensor series, bounded by a per-sensor capacity and a memory budget"""
+
+    def __init__(self, capacity: int, memory_budget_bytes: int):
+        self.capacity = capacity
+        self.memory_budget_bytes = memory_budget_bytes
+        self.series: Dict[str, SensorSeries] = {}
+        self.strings = Interner()
+
+    @property
+    def max_sensors(self) -> int:
+        return max(1, self.memory_budget_bytes // (self.capacity * BYTES_PER_READING + ROLLUP_BYTES))
+
+    def _series_for(self, sensor_id: str) -> SensorSeries:
+        series = self.series.get(sensor_id)
+        if series is None:
+            if len(self.series) >= self.max_sensors:
+                raise SensorStoreFullError(
+                    f"Sensor store is full ({len(self.series)} sensors x {self.capacity} readings)"
+                )
+            series = self.series[sensor_id] = SensorSeries(sensor_id, self.capacity)
+        return series
+
+    def append(
+        self,
+        sensor_id: str,
+        sensor_type: str,
+        value: float,
+        unit: str,
+        timestamp: Optional[float] = None,
+        metadata: Optional[dict] = None,
+    ) -> int:
+        """Record one reading and return its sequence number"""
+        type_id, unit_id = self.strings.intern(sensor_type), self.strings.intern(unit)
+        series = self._series_for(sensor_id)
+        series.append(time.time() if timestamp is None else timestamp, value, type_id, unit_id, metadata)
+        return series.total - 1
+
+    def extend(
+        self,
+        sensor_id: str,
+        sensor_type: str,
+        unit: str,
+        timestamps: array,
+        values: array,
+        metadata: Optional[Dict[int, dict]] = None,
+    ) -> int:
+        """Record a batch of readings for one sensor; returns the first sequence number"""
+        type_id, unit_id = self.strings.intern(sensor_type), self.strings.intern(unit)
+        series = self._series_for(sensor_id)
+        first = series.total
+        series.extend(timestamps, values, type_id, unit_id, metadata)
+        return first
+
+    def to_dict(self, series: SensorSeries, row: Tuple[int, float, float, int, int]) -> dict:
+        """Render a stored reading in the SensorReading shape"""
+        seq, timestamp, value, type_id, unit_id = row
+        return {
+            "sensor_id": series.sensor_id,
+            "sensor_type": self.strings.values[type_id],
+            "value": value,
+            "unit": self.strings.values[unit_id],
+            "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+            "metadata": series.metadata.get(seq, {}),
+        }
+
+    def recent(self, sensor_id: str, limit: int) -> List[dict]:
+        """Most recent ``limit`` readings, oldest first"""
+        series = self.series.get(sensor_id)
+        if series is None or limit <= 0:
+            return []
+        rows = series.read_range(series.total - limit, series.total)
+        return [self.to_dict(series, row) for row in rows]
+
+    def downsample(self, sensor_id: str, width: int, since: float, until: float) -> Tuple[str, List[Aggregate]]:
+        """
+        ``width``-second aggregates of readings in ``[since, until]``
+
+        Served from the coarsest rollup that divides ``width`` (reaching back
+        beyond the raw ring), otherwise computed over the raw readings.
+        Returns the source used and the aggregates, oldest first.
+        """
+        series = self.series.get(sensor_id)
+        if series is None:
+            return "raw", []
+        # Whole buckets: start from the bucket containing ``since``
+        since = since // width * width
+        rollup = rollup_for(series.rollups, width)
+        if rollup is not None:
+            return f"rollup_{format_bucket(rollup.width)}", combine(rollup.range(since, until), width)
+
+        if series.in_order:
+            timestamps, values = series.columns(series.bisect(since), series.bisect(until, right=True))
+        else:
+            timestamps, values = series.columns()
+            rows = [(t, v) for t, v in zip(timestamps, values) if since <= t <= until]
+            timestamps, values = array("d", [t for t, _ in rows]), array("d", [v for _, v in rows])
+        return "raw", aggregate(timestamps, values, width)
+
+    def page(
+        self,
+        sensor_id: str,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        cursor: Optional[int] = None,
+        limit: int = 100,
+    ) -> Tuple[List[dict], Optional[int]]:
+        """
+        Keyset page of readings in ``[since, until]``, in sequence order
+
+        ``cursor`` is the sequence number to resume from (the ``next_cursor``
+        of the previous page). Returns up to ``limit`` readings and the next
+        cursor, or None after the last page. Cursors stay valid while readings
+        are appended; if the readings they point at were overwritten, the page
+        resumes at the oldest one left.
+        """
+        series = self.series.get(sensor_id)
+        if series is None or limit <= 0:
+            return [], None
+        lo = series.first_seq if cursor is None else min(max(cursor, series.first_seq), series.total)
+
+        if series.in_order:
+            if since is not None:
+                lo = max(lo, series.bisect(since))
+            hi = series.total if until is None else series.bisect(until, right=True)
+            end = min(hi, lo + limit)
+            rows = series.read_range(lo, end) if lo < end else []
+            next_cursor = end if end < hi else None
+        else:
+            # Backfilled out-of-order readings: scan from the cursor
+            matches = []
+            for seq in range(lo, series.total):
+                t = series.timestamps[series._position(seq)]
+                if (since is None or t >= since) and (until is None or t <= until):
+                    matches.append(seq)
+                    if len(matches) > limit:
+                        break
+            next_cursor = matches[limit] if len(matches) > limit else None
+            rows = [series.read_range(seq, seq + 1)[0] for seq in matches[:limit]]
+        return [self.to_dict(series, row) for row in rows], next_cursor
+
+    def memory_usage(self) -> dict:
+        used = sum(
+            s.timestamps.buffer_info()[1] * 16 + s.types.buffer_info()[1] * 4 + ROLLUP_BYTES
+            for s in self.series.values()
+        )
+        return {
+            "sensors": len(self.series),
+            "max_sensors": self.max_sensors,
+            "capacity_per_sensor": self.capacity,
+            "column_bytes": used,
+            "budget_bytes": self.memory_budget_bytes,
+        }
+
+    def clear(self):
+        self.series.clear()
+
+    def snapshot(self) -> dict:
+        """Copy of the store for persistence; column copies are plain memcpy"""
+        return {
+            "capacity": self.capacity,
+            "strings": list(self.strings.values),
+            "series": [
+                (s.sensor_id, s.total, s.timestamps[:], s.values[:], s.types[:], s.units[:], dict(s.metadata),
+                 tuple(rollup.copy() for rollup in s.rollups))
+                for s in self.series.values()
+            ],
+        }
+
+    def restore(self, snapshot: dict) -> int:
+        """
+        Replace the contents with a snapshot; returns the number of sensors skipped
+
+        Series are adopted as-is when the capacity is unchanged. Otherwise the
+        newest readings are re-appended and sequence numbers restart at zero.
+        Rollups are restored as saved. Sensors beyond the current memory
+        budget are skipped.
+        """
+        self.series.clear()
+        self.strings = Interner()
+        for value in snapshot["strings"]:
+            self.strings.intern(value)
+
+        skipped = 0
+        for sensor_id, total, timestamps, values, types, units, metadata, *rollups in snapshot["series"]:
+            try:
+                series = self._series_for(sensor_id)
+            except SensorStoreFullError:
+                skipped += 1
+                continue
+            old = SensorSeries(sensor_id, snapshot["capacity"])
+            old.timestamps, old.values, old.types, old.units = timestamps, values, types, units
+            old.metadata, old.total = metadata, total
+            if old.capacity == self.capacity:
+                old.resync_order()
+                series = self.series[sensor_id] = old
+            else:
+                for seq, timestamp, value, type_id, unit_id in old.read_range(old.total - self.capacity, old.total):
+                    series.append(timestamp, value, type_id, unit_id, old.metadata.get(seq))
+            if rollups:
+                series.rollups = rollups[0]
+        return skipped
+
+
+store = SensorStore(
+    capacity=settings.SENSOR_SERIES_CAPACITY,
+    memory_budget_bytes=settings.SENSOR_STORE_MEMORY_MB * 1024 * 1024,
+)
@@ -0,0 +1,32 @@
+"""
+AI vision analysis
+Image analysis shared by the AI endpoints and the capture analysis pipeline
+stage.
+"""
+import base64
+import logging
+from typing import Any, Dict
+
+from app.core.metrics import track_upstream
+
+logger = logging.getLogger(__name__)
+
+
+async def analyze_image(image_data: bytes, prompt: str) -> Dict[str, Any]:
+    """Analysis of one image; requires OPENAI_API_KEY (checked by callers)"""
+    # Encode image to base64
+    image_base64 = base64.b64encode(image_data).decode('utf-8')
+
+    # Call OpenAI Vision API (placeholder - implement actual API call)
+    # This would use the OpenAI Python SDK
+    logger.info(f"Analyzing image with prompt: {prompt}")
+
+    # Placeholder response (the API call goes inside the timed block)
+    with track_upstream("ai", "analyze_image"):
+        analysis = {
+            "description": "This is a placeholder response. Implement OpenAI Vision API integration.",
+            "objects_detected": ["camera", "device"],
+            "confidence": 0.85,
+            "tags": ["technology", "electronics"]
+        }
+    return analysis
@@ -0,0 +1,216 @@
+"""
+Write-ahead log
+Append-only, segment-rotated log of opaque records with group commit.
+
+Records are appended to an in-memory buffer on the event loop thread and a
+writer thread writes and fsyncs everything buffered once per flush interval,
+so appends never wait for the disk and one fsync covers many records.
+
+Each record is framed as ``<length:u32><crc32:u32><payload>``. A torn or
+corrupt frame ends replay of its segment; earlier records are kept.
+"""
+import logging
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Iterator, List, Optional, Union
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+FRAME = struct.Struct("<II")
+SEGMENT_PATTERN = re.compile(r"^wal-(\d{8})\.log$")
+
+
+def segment_name(segment_id: int) -> str:
+    return f"wal-{segment_id:08d}.log"
+
+
+def fsync_directory(path: str):
+    """Persist renames and new files in ``path`` (no-op where unsupported)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _Rotate:
+    """Marker in the write buffer: start segment ``segment_id`` here"""
+    __slots__ = ("segment_id",)
+
+    def __init__(self, segment_id: int):
+        self.segment_id = segment_id
+
+
+class WriteAheadLog:
+    """
+    Segment files ``wal-00000001.log``, ``wal-00000002.log``, ... in ``directory``
+
+    Segment ids are assigned on the appending thread, in stream order, so a
+    rotation marks an exact position in the log: everything appended before
+    ``rotate()`` returns ``n`` lives in segments older than ``n``.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, flush_interval: float):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self._buffer: List[Union[bytes, _Rotate]] = []
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._file = None
+        self._segment_id = 0
+        self._stopped = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self.bytes_since_rotate = 0
+
+    def segments(self) -> List[int]:
+        """Ids of the segment files on disk, oldest first"""
+        ids = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                ids.append(int(match.group(1)))
+        return sorted(ids)
+
+    def replay(self, from_segment: int = 0) -> Iterator[bytes]:
+        """Payloads of every intact record in segments ``>= from_segment``"""
+        for segment_id in self.segments():
+            if segment_id < from_segment:
+                continue
+            path = os.path.join(self.directory, segment_name(segment_id))
+            with open(path, "rb") as f:
+                data = f.read()
+            offset = 0
+            while offset + FRAME.size <= len(data):
+                length, crc = FRAME.unpack_from(data, offset)
+                start = offset + FRAME.size
+                payload = data[start:start + length]
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                yield payload
+                offset = start + length
+            if offset < len(data):
+                logger.warning(
+                    f"WAL segment {segment_name(segment_id)}: ignoring {len(data) - offset} bytes "
+                    f"after the last intact record"
+                )
+
+    def start(self, first_segment: int = 1):
+        """
+        Open a fresh segment after the existing ones and start the writer thread
+
+        ``first_segment`` is the lowest id the new segment may take. Callers
+        pass the boundary of their newest snapshot: its segment may have been
+        removed (e.g. because it was empty), and numbering must not restart
+        below a snapshot that replay starts from.
+        """
+        existing = self.segments()
+        # Never append to an old segment: its tail may be torn
+        self._segment_id = max((existing[-1] if existing else 0) + 1, first_segment)
+        self._open_segment(self._segment_id)
+        self._stopped.clear()
+        self._writer = threading.Thread(target=self._run, name="wal-writer", daemon=True)
+        self._writer.start()
+
+    def append(self, payload: bytes):
+        """Buffer one record; it is durable after the next group commit"""
+        frame = FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._buffer_lock:
+            self._buffer.append(frame)
+        self.bytes_since_rotate += len(frame)
+        if self.bytes_since_rotate >= self.segment_bytes:
+            self.rotate()
+
+    def rotate(self) -> int:
+        """Start a new segment at this point in the log and return its id"""
+        with self._buffer_lock:
+            self._segment_id += 1
+            segment_id = self._segment_id
+            self._buffer.append(_Rotate(segment_id))
+        self.bytes_since_rotate = 0
+        return segment_id
+
+    def flush(self):
+        """Write and fsync everything buffered so far (blocking)"""
+        with self._write_lock:
+            with self._buffer_lock:
+                pending, self._buffer = self._buffer, []
+            if not pending or self._file is None:
+                return
+            start = time.perf_counter()
+            run: List[bytes] = []
+            written = 0
+            for item in pending:
+                if isinstance(item, _Rotate):
+                    written += self._write(run)
+                    run = []
+                    self._sync_and_close()
+                    self._open_segment(item.segment_id)
+                else:
+                    run.append(item)
+            written += self._write(run)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            metrics.WAL_BYTES_WRITTEN.inc(written)
+            metrics.WAL_COMMIT_DURATION.observe(time.perf_counter() - start)
+
+    def remove_segments_before(self, segment_id: int) -> int:
+        """Delete segments fully covered by a snapshot; returns how many were removed"""
+        removed = 0
+        with self._write_lock:
+            for old_id in self.segments():
+                if old_id >= segment_id:
+                    break
+                os.remove(os.path.join(self.directory, segment_name(old_id)))
+                removed += 1
+        return removed
+
+    def close(self):
+        """Stop the writer and flush the remaining records"""
+        self._stopped.set()
+        if self._writer:
+            self._writer.join()
+            self._writer = None
+        self.flush()
+        with self._write_lock:
+            path = self._file.name if self._file else None
+            self._sync_and_close()
+            if path and os.path.getsize(path) == 0:
+                os.remove(path)
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error(f"WAL write failed: {str(e)}")
+
+    def _write(self, frames: List[bytes]) -> int:
+        if not frames:
+            return 0
+        data = b"".join(frames)
+        self._file.write(data)
+        return len(data)
+
+    def _open_segment(self, segment_id: int):
+        self._file = open(os.path.join(self.directory, segment_name(segment_id)), "ab")
+        fsync_directory(self.directory)
+
+    def _sync_and_close(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
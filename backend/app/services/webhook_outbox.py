@@ -0,0 +1,500 @@
+"""
+n8n webhook outbox
+Webhook calls to n8n are written to a SQLite outbox and delivered in the
+background, so callers never wait on n8n and events survive n8n downtime
+and backend restarts.
+
+- Delivery runs on at most N8N_OUTBOX_WORKERS concurrent calls, with at most
+  N8N_OUTBOX_PER_WEBHOOK in flight per webhook.
+- A webhook with N8N_OUTBOX_MAX_PENDING undelivered entries refuses new ones
+  (OutboxFull, answered with 503) until n8n catches up.
+- Failures are retried with exponential backoff and jitter until
+  N8N_OUTBOX_MAX_ATTEMPTS; client errors (4xx other than 408/429) fail
+  immediately.
+- Webhooks listed in N8N_OUTBOX_BATCH_WEBHOOKS are micro-batched: events
+  queued within N8N_OUTBOX_BATCH_WINDOW_MS are sent as one POST of
+  ``{"event": "batch", "count": n, "events": [...]}``.
+
+Scheduling state lives in memory; the database is only touched to persist
+new entries and delivery outcomes.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.admission import AdmissionRejected
+from app.services.n8n_client import n8n
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("pending", "delivered", "failed")
+# Client errors worth retrying; any other 4xx is permanent
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+PURGE_INTERVAL_SECONDS = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    webhook TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    next_attempt_at REAL,
+    last_status_code INTEGER,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, updated_at);
+"""
+COLUMNS = (
+    "id", "webhook", "payload", "status", "attempts", "created_at", "updated_at",
+    "next_attempt_at", "last_status_code", "last_error",
+)
+
+
+class OutboxFull(AdmissionRejected):
+    """Too many undelivered entries for a webhook"""
+
+    def __init__(self, webhook: str, pending: int):
+        super().__init__(
+            "n8n_webhook", f"Webhook {webhook} has {pending} undelivered events, retry later", retry_after=5.0
+        )
+
+
+def _row_to_dict(row: tuple) -> dict:
+    entry = dict(zip(COLUMNS, row))
+    entry["payload"] = json.loads(entry["payload"])
+    return entry
+
+
+class WebhookOutbox:
+    """Persistent queue of n8n webhook calls and the tasks delivering them"""
+
+    def __init__(
+        self,
+        path: str,
+        workers: int,
+        per_webhook: int,
+        max_pending: int,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        batch_webhooks: Set[str],
+        batch_max: int,
+        batch_window: float,
+        retention: float,
+    ):
+        self.path = path
+        self.workers = workers
+        self.per_webhook = per_webhook
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.batch_webhooks = batch_webhooks
+        self.batch_max = batch_max
+        self.batch_window = batch_window
+        self.retention = retention
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        # webhook -> ids ready to send, oldest first, with their enqueue times
+        self._ready: Dict[str, Deque[Tuple[int, float]]] = {}
+        # (due time, id, webhook) for entries waiting to be retried
+        self._retries: List[Tuple[float, int, str]] = []
+        self._attempts: Dict[int, int] = {}
+        # webhook -> undelivered entries (ready, in flight or waiting to be retried)
+        self._pending: Dict[str, int] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._in_flight_total = 0
+        self._wake = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._tasks: Set[asyncio.Task] = set()
+        self._submits: Set[asyncio.Task] = set()
+        self._last_purge = 0.0
+
+    # Storage (called from worker threads)
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._db_lock:
+            with self._db:
+                return self._db.execute(sql, params).fetchall()
+
+    def _executemany(self, sql: str, rows: List[tuple]):
+        with self._db_lock:
+            with self._db:
+                self._db.executemany(sql, rows)
+
+    def _insert(self, webhook: str, payload: str, now: float) -> int:
+        with self._db_lock:
+            with self._db:
+                cursor = self._db.execute(
+                    "INSERT INTO outbox (webhook, payload, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (webhook, payload, now, now),
+                )
+                return cursor.lastrowid
+
+    def _open_db(self):
+        """Open (or create) the database and load undelivered entries (blocking)"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Webhook outbox not persisted, cannot open {self.path}: {str(e)}")
+            db = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        db.isolation_level = "DEFERRED"
+        self._db = db
+
+        now = time.time()
+        rows = self._execute(
+            "SELECT id, webhook, attempts, created_at, next_attempt_at FROM outbox "
+            "WHERE status = 'pending' ORDER BY id"
+        )
+        for entry_id, webhook, attempts, created_at, next_attempt_at in rows:
+            self._attempts[entry_id] = attempts
+            self._pending[webhook] = self._pending.get(webhook, 0) + 1
+            if next_attempt_at and next_attempt_at > now:
+                heapq.heappush(self._retries, (next_attempt_at, entry_id, webhook))
+            else:
+                self._ready.setdefault(webhook, deque()).append((entry_id, created_at))
+        if rows:
+            logger.info(f"Webhook outbox: resuming {len(rows)} undelivered entries")
+        metrics.OUTBOX_PENDING.set(len(self._attempts))
+
+    # Lifecycle
+
+    def start(self):
+        """Open the outbox and start delivering (blocking open, call at startup)"""
+        if self._dispatcher is not None:
+            return
+        if self._db is None:
+            self._open_db()
+        self._stopping = False
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wake.set()
+
+    async def stop(self):
+        """Stop delivering; entries in flight stay pending and are resent on the next start"""
+        if self._submits:
+            # Let fire-and-forget enqueues reach the database first
+            await asyncio.gather(*self._submits, return_exceptions=True)
+        if self._dispatcher is None:
+            return
+        # wait_for() can swallow a cancellation that races with the wake-up, so also flag it
+        self._stopping = True
+        self._wake.set()
+        self._dispatcher.cancel()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(self._dispatcher, *tasks, return_exceptions=True)
+        self._dispatcher = None
+        with self._db_lock:
+            self._db.close()
+        self._db = None
+        self._ready.clear()
+        self._retries.clear()
+        self._attempts.clear()
+        self._pending.clear()
+        self._in_flight.clear()
+        self._in_flight_total = 0
+
+    # Public API
+
+    def _admit(self, webhook: str):
+        pending = self._pending.get(webhook, 0)
+        if pending >= self.max_pending:
+            metrics.UPSTREAM_REJECTED.labels("n8n_webhook", "queue_full").inc()
+            raise OutboxFull(webhook, pending)
+        self._pending[webhook] = pending + 1
+
+    def _settled(self, webhook: str, count: int):
+        self._pending[webhook] = self._pending.get(webhook, 0) - count
+        if self._pending[webhook] <= 0:
+            del self._pending[webhook]
+
+    async def enqueue(self, webhook: str, payload: Dict[str, Any]) -> int:
+        """Persist a webhook call and return its outbox id; delivery happens later. Raises OutboxFull"""
+        if self._dispatcher is None:
+            self.start()
+        self._admit(webhook)
+        now = time.time()
+        try:
+            entry_id = await asyncio.to_thread(self._insert, webhook, json.dumps(payload), now)
+        except BaseException:
+            self._settled(webhook, 1)
+            raise
+        self._attempts[entry_id] = 0
+        self._ready.setdefault(webhook, deque()).append((entry_id, now))
+        metrics.OUTBOX_PENDING.set(len(self._attempts))
+        self._wake.set()
+        return entry_id
+
+    def submit(self, webhook: str, payload: Dict[str, Any]):
+        """Fire-and-forget enqueue for synchronous callers inside the event loop"""
+        if self._pending.get(webhook, 0) >= self.max_pending:
+            metrics.UPSTREAM_REJECTED.labels("n8n_webhook", "queue_full").inc()
+            logger.warning(f"Webhook {webhook}: outbox full, event dropped")
+            return
+        task = asyncio.get_running_loop().create_task(self.enqueue(webhook, payload))
+        self._submits.add(task)
+        task.add_done_callback(self._submits.discard)
+
+    async def get(self, entry_id: int) -> Optional[dict]:
+        if self._db is None:
+            return None
+        rows = await asyncio.to_thread(
+            self._execute, f"SELECT {', '.join(COLUMNS)} FROM outbox WHERE id = ?", (entry_id,)
+        )
+        return _row_to_dict(rows[0]) if rows else None
+
+    async def list(
+        self,
+        status: Optional[str] = None,
+        webhook: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[dict]:
+        """Most recent entries first"""
+        if self._db is None:
+            return []
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if webhook:
+            clauses.append("webhook = ?")
+            params.append(webhook)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"SELECT {', '.join(COLUMNS)} FROM outbox {where}ORDER BY id DESC LIMIT ?",
+            (*params, limit),
+        )
+        return [_row_to_dict(row) for row in rows]
+
+    async def retry(self, entry_id: int) -> bool:
+        """Queue a failed entry for delivery again; False if it is not failed. Raises OutboxFull"""
+        if self._dispatcher is None:
+            self.start()
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT webhook FROM outbox WHERE id = ? AND status = 'failed'", (entry_id,)
+        )
+        if not rows:
+            return False
+        webhook = rows[0][0]
+        self._admit(webhook)
+        try:
+            rows = await asyncio.to_thread(
+                self._execute,
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'failed' RETURNING created_at",
+                (time.time(), entry_id),
+            )
+        except BaseException:
+            self._settled(webhook, 1)
+            raise
+        if not rows:
+            # Retried concurrently by another caller
+            self._settled(webhook, 1)
+            return False
+        self._attempts[entry_id] = 0
+        self._ready.setdefault(webhook, deque()).append((entry_id, rows[0][0]))
+        metrics.OUTBOX_PENDING.set(len(self._attempts))
+        self._wake.set()
+        return True
+
+    async def stats(self) -> dict:
+        counts = dict.fromkeys(STATUSES, 0)
+        if self._db is not None:
+            rows = await asyncio.to_thread(self._execute, "SELECT status, COUNT(*) FROM outbox GROUP BY status")
+            counts.update(dict(rows))
+        return {
+            "running": self._dispatcher is not None,
+            "path": self.path,
+            "counts": counts,
+            "ready": sum(len(q) for q in self._ready.values()),
+            "waiting_retry": len(self._retries),
+            "in_flight": self._in_flight_total,
+            "workers": self.workers,
+            "per_webhook": self.per_webhook,
+            "max_pending": self.max_pending,
+            "pending_per_webhook": dict(self._pending),
+            "batch_webhooks": sorted(self.batch_webhooks),
+        }
+
+    # Scheduling
+
+    async def _dispatch(self):
+        while not self._stopping:
+            now = time.time()
+            while self._retries and self._retries[0][0] <= now:
+                _, entry_id, webhook = heapq.heappop(self._retries)
+                self._ready.setdefault(webhook, deque()).append((entry_id, now))
+
+            next_check = self._retries[0][0] - now if self._retries else None
+            for webhook, queue in self._ready.items():
+                while queue and self._in_flight_total < self.workers and self._in_flight.get(webhook, 0) < self.per_webhook:
+                    if webhook in self.batch_webhooks:
+                        # Hold a partial batch until its oldest entry has waited a full window
+                        wait = queue[0][1] + self.batch_window - now
+                        if len(queue) < self.batch_max and wait > 0:
+                            next_check = wait if next_check is None else min(next_check, wait)
+                            break
+                        ids = [queue.popleft()[0] for _ in range(min(self.batch_max, len(queue)))]
+                    else:
+                        ids = [queue.popleft()[0]]
+                    self._start_delivery(webhook, ids)
+
+            if now - self._last_purge >= PURGE_INTERVAL_SECONDS:
+                self._last_purge = now
+                self._spawn(self._purge(now))
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=next_check if next_check is not None else PURGE_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _start_delivery(self, webhook: str, ids: List[int]):
+        self._in_flight[webhook] = self._in_flight.get(webhook, 0) + 1
+        self._in_flight_total += 1
+
+        def done(_):
+            self._in_flight[webhook] -= 1
+            self._in_flight_total -= 1
+            self._wake.set()
+
+        self._spawn(self._deliver(webhook, ids)).add_done_callback(done)
+
+    async def _purge(self, now: float):
+        try:
+            await asyncio.to_thread(
+                self._execute,
+                "DELETE FROM outbox WHERE status IN ('delivered', 'failed') AND updated_at < ?",
+                (now - self.retention,),
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Webhook outbox purge failed: {str(e)}")
+
+    # Delivery
+
+    async def _deliver(self, webhook: str, ids: List[int]):
+        placeholders = ", ".join("?" * len(ids))
+        rows = await asyncio.to_thread(
+            self._execute, f"SELECT id, payload FROM outbox WHERE id IN ({placeholders}) ORDER BY id", tuple(ids)
+        )
+        if len(rows) < len(ids):
+            # Purged or deleted meanwhile: nothing to send, but they no longer count as pending
+            found = {row[0] for row in rows}
+            missing = [entry_id for entry_id in ids if entry_id not in found]
+            for entry_id in missing:
+                self._attempts.pop(entry_id, None)
+            self._settled(webhook, len(missing))
+            metrics.OUTBOX_PENDING.set(len(self._attempts))
+            ids = [entry_id for entry_id in ids if entry_id in found]
+            if not ids:
+                return
+        if webhook in self.batch_webhooks:
+            events = [json.loads(row[1]) for row in rows]
+            body = json.dumps({"event": "batch", "count": len(events), "events": events})
+        else:
+            body = rows[0][1]
+
+        status_code, error = None, None
+        try:
+            response = await n8n.webhook(webhook, body, timeout=settings.N8N_OUTBOX_TIMEOUT_SECONDS)
+            status_code = response.status_code
+            if 200 <= status_code < 300:
+                await self._record_delivered(webhook, ids, status_code)
+                return
+            error = f"HTTP {status_code}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+        await self._record_failure(webhook, ids, status_code, error)
+
+    async def _record_delivered(self, webhook: str, ids: List[int], status_code: int):
+        now = time.time()
+        await asyncio.to_thread(
+            self._executemany,
+            "UPDATE outbox SET status = 'delivered', attempts = attempts + 1, updated_at = ?, "
+            "next_attempt_at = NULL, last_status_code = ?, last_error = NULL WHERE id = ?",
+            [(now, status_code, entry_id) for entry_id in ids],
+        )
+        for entry_id in ids:
+            self._attempts.pop(entry_id, None)
+        self._settled(webhook, len(ids))
+        metrics.WEBHOOK_DELIVERIES.labels(webhook, "delivered").inc(len(ids))
+        metrics.OUTBOX_PENDING.set(len(self._attempts))
+
+    async def _record_failure(self, webhook: str, ids: List[int], status_code: Optional[int], error: str):
+        now = time.time()
+        attempts = max(self._attempts.get(entry_id, 0) for entry_id in ids) + 1
+        permanent = (
+            status_code is not None and 400 <= status_code < 500 and status_code not in RETRYABLE_CLIENT_ERRORS
+        )
+        if permanent or attempts >= self.max_attempts:
+            await asyncio.to_thread(
+                self._executemany,
+                "UPDATE outbox SET status = 'failed', attempts = ?, updated_at = ?, next_attempt_at = NULL, "
+                "last_status_code = ?, last_error = ? WHERE id = ?",
+                [(attempts, now, status_code, error, entry_id) for entry_id in ids],
+            )
+            for entry_id in ids:
+                self._attempts.pop(entry_id, None)
+            self._settled(webhook, len(ids))
+            metrics.WEBHOOK_DELIVERIES.labels(webhook, "failed").inc(len(ids))
+            metrics.OUTBOX_PENDING.set(len(self._attempts))
+            logger.error(f"Webhook {webhook}: giving up on {len(ids)} event(s) after {attempts} attempt(s): {error}")
+            return
+
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+        due = now + delay
+        await asyncio.to_thread(
+            self._executemany,
+            "UPDATE outbox SET attempts = ?, updated_at = ?, next_attempt_at = ?, last_status_code = ?, "
+            "last_error = ? WHERE id = ?",
+            [(attempts, now, due, status_code, error, entry_id) for entry_id in ids],
+        )
+        for entry_id in ids:
+            self._attempts[entry_id] = attempts
+            heapq.heappush(self._retries, (due, entry_id, webhook))
+        metrics.WEBHOOK_DELIVERIES.labels(webhook, "retry").inc(len(ids))
+        logger.warning(f"Webhook {webhook}: attempt {attempts} failed ({error}), retrying in {delay:.1f}s")
+
+
+outbox = WebhookOutbox(
+    path=settings.N8N_OUTBOX_PATH,
+    workers=settings.N8N_OUTBOX_WORKERS,
+    per_webhook=settings.N8N_OUTBOX_PER_WEBHOOK,
+    max_pending=settings.N8N_OUTBOX_MAX_PENDING,
+    max_attempts=settings.N8N_OUTBOX_MAX_ATTEMPTS,
+    backoff_base=settings.N8N_OUTBOX_BACKOFF_SECONDS,
+    backoff_max=settings.N8N_OUTBOX_BACKOFF_MAX_SECONDS,
+    batch_webhooks={name.strip() for name in settings.N8N_OUTBOX_BATCH_WEBHOOKS.split(",") if name.strip()},
+    batch_max=settings.N8N_OUTBOX_BATCH_MAX,
+    batch_window=settings.N8N_OUTBOX_BATCH_WINDOW_MS / 1000,
+    retention=settings.N8N_OUTBOX_RETENTION_HOURS * 3600,
+)
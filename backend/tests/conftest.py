@@ -0,0 +1,20 @@
+"""
+Shared test setup
+
+Settings are read from the environment when ``app.core.config`` is first
+imported, so data paths are pointed at a scratch directory before any test
+module imports the app.
+"""
+import os
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("DATA_DIR", _scratch)
+os.environ.setdefault("CAPTURE_DIR", os.path.join(_scratch, "captures"))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
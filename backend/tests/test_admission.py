@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+pytestmark = pytest.mark.anyio
+
+
+def make_controller(limit=1, max_waiting=2, timeout=1.0) -> AdmissionController:
+    controller = AdmissionController()
+    controller.configure("device", limit=limit, max_waiting=max_waiting, timeout=timeout)
+    return controller
+
+
+async def test_waiters_are_admitted_in_arrival_order():
+    controller = make_controller(limit=1, max_waiting=3)
+    gate = controller.gates["device"]
+    order = []
+
+    async def call(n):
+        async with controller.slot("device"):
+            order.append(n)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(call(n) for n in range(4)))
+    assert order == [0, 1, 2, 3]
+    assert (gate.active, gate.admitted, len(gate._waiters)) == (0, 4, 0)
+
+
+async def test_full_queue_is_refused_immediately():
+    controller = make_controller(limit=1, max_waiting=1)
+    await controller.acquire("device")
+    waiter = asyncio.create_task(controller.acquire("device"))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as refused:
+        await controller.acquire("device")
+    assert refused.value.status_code == 503
+    assert controller.gates["device"].rejected["queue_full"] == 1
+    controller.release("device")
+    await waiter
+    controller.release("device")
+    assert controller.gates["device"].active == 0
+
+
+async def test_waiting_past_the_deadline_is_refused():
+    controller = make_controller(limit=1, timeout=0.05)
+    await controller.acquire("device")
+    with pytest.raises(AdmissionRejected):
+        await controller.acquire("device")
+    gate = controller.gates["device"]
+    assert (gate.rejected["deadline"], len(gate._waiters), gate.active) == (1, 0, 1)
+    # The refused caller's place is not handed a slot later
+    controller.release("device")
+    assert gate.active == 0
+
+
+async def test_cancelled_waiter_gives_up_its_place():
+    controller = make_controller(limit=1)
+    await controller.acquire("device")
+    waiter = asyncio.create_task(controller.acquire("device"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    controller.release("device")
+    assert controller.gates["device"].active == 0
+
+
+async def test_slot_handed_to_a_waiter_that_was_just_cancelled_is_released():
+    controller = make_controller(limit=1)
+    await controller.acquire("device")
+    waiter = asyncio.create_task(controller.acquire("device"))
+    await asyncio.sleep(0)
+    controller.release("device")  # hands the slot over...
+    waiter.cancel()  # ...to a caller that no longer wants it
+    [outcome] = await asyncio.gather(waiter, return_exceptions=True)
+    if not isinstance(outcome, asyncio.CancelledError):
+        # Before Python 3.12, wait_for() returns the result instead of the cancellation
+        controller.release("device")
+    assert controller.gates["device"].active == 0
+
+
+async def test_held_slot_is_released_once():
+    controller = make_controller(limit=1)
+    slot = await controller.hold("device")
+    waiter = asyncio.create_task(controller.hold("device"))
+    await asyncio.sleep(0)
+    slot.release()
+    # A second release must not free the slot just handed to the waiter
+    slot.release()
+    other = await waiter
+    assert controller.gates["device"].active == 1
+    other.release()
+    assert controller.gates["device"].active == 0
+
+
+async def test_gates_are_independent():
+    controller = make_controller(limit=1, max_waiting=0)
+    controller.configure("stream", limit=1, max_waiting=0, timeout=1.0)
+    stream = await controller.hold("stream")
+    async with controller.slot("device"):
+        with pytest.raises(AdmissionRejected):
+            await controller.hold("stream")
+    stream.release()
+    assert controller.stats()["stream"]["in_flight"] == 0
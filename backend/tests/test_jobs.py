@@ -0,0 +1,186 @@
+import asyncio
+
+import pytest
+
+from app.services.jobs import JobContext, JobQueue, JobQueueFull
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def make_queue(tmp_path):
+    queues = []
+
+    def make(**overrides) -> JobQueue:
+        options = dict(path=str(tmp_path / "jobs.sqlite3"), workers=4, max_queued=100, retention=3600)
+        options.update(overrides)
+        queue = JobQueue(**options)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        await queue.stop()
+
+
+async def finished(queue: JobQueue, job_id: int, timeout: float = 5.0) -> dict:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await queue.get(job_id)
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            return job
+        assert asyncio.get_running_loop().time() < deadline, f"job {job_id} still {job['status']}"
+        await asyncio.sleep(0.01)
+
+
+async def test_job_runs_with_its_params_and_records_the_result(make_queue):
+    queue = make_queue()
+
+    async def add(context: JobContext):
+        await context.progress(0.5, "halfway")
+        return context.params["a"] + context.params["b"]
+
+    queue.register("add", add, required=("a", "b"))
+    job, created = await queue.submit("add", {"a": 2, "b": 3})
+    assert created and job["status"] == "queued"
+    job = await finished(queue, job["id"])
+    assert (job["status"], job["result"], job["progress"], job["message"], job["attempts"]) == (
+        "succeeded", 5, 1.0, "halfway", 1
+    )
+
+
+async def test_submit_validates_type_and_params(make_queue):
+    queue = make_queue()
+    queue.register("add", lambda context: None, required=("a",))
+    with pytest.raises(ValueError):
+        await queue.submit("nope", {})
+    with pytest.raises(ValueError):
+        await queue.submit("add", {"b": 1})
+
+
+async def test_idempotency_key_returns_the_existing_job(make_queue):
+    queue = make_queue()
+    gate = asyncio.Event()
+
+    async def wait(context):
+        await gate.wait()
+
+    queue.register("wait", wait)
+    first, created = await queue.submit("wait", {}, idempotency_key="k")
+    again, created_again = await queue.submit("wait", {}, idempotency_key="k")
+    assert created and not created_again and again["id"] == first["id"]
+    gate.set()
+
+
+async def test_failures_and_timeouts_are_recorded(make_queue):
+    queue = make_queue()
+
+    async def boom(context):
+        raise RuntimeError("bad input")
+
+    async def slow(context):
+        await asyncio.sleep(10)
+
+    queue.register("boom", boom)
+    queue.register("slow", slow, timeout=0.05)
+    failed = await finished(queue, (await queue.submit("boom", {}))[0]["id"])
+    timed_out = await finished(queue, (await queue.submit("slow", {}))[0]["id"])
+    assert (failed["status"], failed["error"]) == ("failed", "RuntimeError: bad input")
+    assert timed_out["status"] == "failed" and "Timed out" in timed_out["error"]
+
+
+async def test_higher_priority_jobs_run_first(make_queue):
+    queue = make_queue(workers=1)
+    order, gate = [], asyncio.Event()
+
+    async def record(context):
+        await gate.wait()
+        order.append(context.params["n"])
+
+    queue.register("record", record)
+    blocker = (await queue.submit("record", {"n": "blocker"}))[0]
+    ids = [(await queue.submit("record", {"n": n}, priority=p))[0]["id"] for n, p in (("low", 0), ("high", 5), ("mid", 1))]
+    gate.set()
+    for job_id in [blocker["id"]] + ids:
+        await finished(queue, job_id)
+    assert order == ["blocker", "high", "mid", "low"]
+
+
+async def test_queue_cap(make_queue):
+    queue = make_queue(workers=1, max_queued=2)
+    gate = asyncio.Event()
+
+    async def wait(context):
+        await gate.wait()
+
+    queue.register("wait", wait)
+    running = (await queue.submit("wait", {}))[0]
+    await asyncio.sleep(0.05)  # picked up by the only worker
+    await queue.submit("wait", {})
+    await queue.submit("wait", {})
+    with pytest.raises(JobQueueFull):
+        await queue.submit("wait", {})
+    gate.set()
+    await finished(queue, running["id"])
+
+
+async def test_cancel_a_queued_and_a_running_job(make_queue):
+    queue = make_queue(workers=1)
+    started = asyncio.Event()
+
+    async def forever(context):
+        started.set()
+        await asyncio.sleep(60)
+
+    queue.register("forever", forever)
+    running = (await queue.submit("forever", {}))[0]
+    queued = (await queue.submit("forever", {}))[0]
+    await started.wait()
+    assert await queue.cancel(queued["id"]) == "cancelled"
+    assert await queue.cancel(running["id"]) == "cancelled"
+    assert await queue.cancel(12345) is None
+    assert (await queue.stats())["counts"]["cancelled"] == 2
+
+
+@pytest.mark.parametrize("yields", [0, 1])
+async def test_cancel_before_the_job_is_marked_running(make_queue, yields):
+    """A job picked by the dispatcher but not yet claimed in the table still ends up cancelled"""
+    # No workers: the dispatcher never starts jobs itself
+    queue = make_queue(workers=0)
+    ran = []
+
+    async def handler(context):
+        ran.append(context.job_id)
+
+    queue.register("job", handler)
+    job = (await queue.submit("job", {}))[0]
+    # Start the job the way the dispatcher does, then cancel before
+    # (yields=0) or while (yields=1) its row is claimed
+    queue._next()
+    queue._start_job("job", job["id"])
+    for _ in range(yields):
+        await asyncio.sleep(0)
+    assert await queue.cancel(job["id"]) == "cancelled"
+    await asyncio.sleep(0.05)
+    assert ran == []
+    assert (await queue.get(job["id"]))["status"] == "cancelled"
+
+
+async def test_interrupted_jobs_run_again_after_a_restart(make_queue):
+    queue = make_queue()
+    started = asyncio.Event()
+
+    async def slow(context):
+        started.set()
+        await asyncio.sleep(60)
+
+    queue.register("job", slow)
+    job = (await queue.submit("job", {}))[0]
+    await started.wait()
+    await queue.stop()
+
+    restarted = make_queue()
+    restarted.register("job", lambda context: asyncio.sleep(0, "done"))
+    restarted.start()
+    job = await finished(restarted, job["id"])
+    assert (job["status"], job["result"], job["attempts"]) == ("succeeded", "done", 2)
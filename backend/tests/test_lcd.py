@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.lcd import LcdQueue, UnknownDisplayError
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingQueue(LcdQueue):
+    """Records device calls instead of posting to the ESP32"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+        self.fail = 0
+
+    async def _send(self, display, frame):
+        self.calls.append((time.monotonic(), display.display_id, frame))
+        if self.fail:
+            self.fail -= 1
+            return False
+        return True
+
+
+@pytest.fixture
+async def make_queue():
+    queues = []
+
+    def make(displays=("a", "b", "c"), interval=0.05) -> RecordingQueue:
+        queue = RecordingQueue(list(displays), lines=2, frame_interval=interval, tick=0.01)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        await queue.stop()
+
+
+async def test_one_device_call_per_interval_across_displays(make_queue):
+    queue = make_queue(interval=0.05)
+    for display_id in ("a", "b", "c"):
+        queue.write(display_id, 1, f"hello {display_id}")
+    await asyncio.sleep(0.3)
+    assert sorted(display for _, display, _ in queue.calls) == ["a", "b", "c"]
+    times = [at for at, _, _ in queue.calls]
+    assert all(later - earlier >= 0.045 for earlier, later in zip(times, times[1:]))
+
+
+async def test_bursts_to_a_display_are_coalesced(make_queue):
+    queue = make_queue(interval=0.1)
+    for i in range(50):
+        queue.write("a", 1, f"tick {i}")
+        queue.write("a", 2, "second")
+    await asyncio.sleep(0.25)
+    assert [frame for _, _, frame in queue.calls] == [("tick 49", "second")]
+    assert queue.status("a")["coalesced"] == 99
+    assert queue.status("a")["in_sync"]
+
+
+async def test_unchanged_frames_are_not_resent(make_queue):
+    queue = make_queue(interval=0.01)
+    queue.write("a", 1, "same")
+    await asyncio.sleep(0.05)
+    queue.write("a", 1, "same")
+    await asyncio.sleep(0.05)
+    assert len(queue.calls) == 1
+
+
+async def test_unknown_displays_are_refused(make_queue):
+    queue = make_queue(displays=("a",))
+    with pytest.raises(UnknownDisplayError):
+        queue.write("other", 1, "x")
+    with pytest.raises(UnknownDisplayError):
+        queue.clear("other")
+    assert queue.status("other") is None
+    assert list(queue.displays) == ["a"]
+
+
+async def test_lines_with_a_duration_are_cleared(make_queue):
+    queue = make_queue(interval=0.01)
+    queue.write("a", 1, "brief", duration_seconds=0.05)
+    await asyncio.sleep(0.2)
+    assert [frame for _, _, frame in queue.calls] == [("brief", ""), ("", "")]
+    assert queue.status("a")["expired"] == 1
+
+
+async def test_failed_frames_are_retried(make_queue, monkeypatch):
+    monkeypatch.setattr("app.services.lcd.RETRY_SECONDS", 0.01)
+    queue = make_queue(interval=0.01)
+    queue.fail = 1
+    queue.write("a", 1, "x")
+    await asyncio.sleep(0.1)
+    assert len(queue.calls) == 2
+    assert queue.status("a")["errors"] == 1 and queue.status("a")["in_sync"]
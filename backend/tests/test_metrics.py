@@ -0,0 +1,28 @@
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.core import metrics
+from app.core.metrics import MetricsMiddleware, UNMATCHED_ROUTE
+
+
+async def ok(request):
+    return PlainTextResponse("ok")
+
+
+@pytest.mark.anyio
+async def test_unknown_methods_share_one_label():
+    inner = Starlette(routes=[Route("/metrics-probe/{item_id}", ok)])
+    app = MetricsMiddleware(inner, router=inner.router)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/metrics-probe/1")).status_code == 200
+        for i in range(20):
+            await client.request(f"X{i}", "/metrics-probe/1")
+            await client.request(f"Y{i}", f"/nowhere/{i}")
+
+    labels = {values[:2] for values in metrics.HTTP_REQUESTS._children if values[1] in ("/metrics-probe/{item_id}", UNMATCHED_ROUTE)}
+    assert {method for method, _ in labels} <= {"GET", metrics.OTHER_METHOD}
+    assert ("GET", "/metrics-probe/{item_id}") in labels
+    assert (metrics.OTHER_METHOD, UNMATCHED_ROUTE) in labels
@@ -0,0 +1,34 @@
+from app.services.motion_log import MotionLog
+
+
+def test_sensors_whose_events_were_all_dropped_are_forgotten():
+    log = MotionLog(capacity=10)
+    for i in range(1000):
+        log.append(f"sensor-{i}", 0.9, timestamp=float(i))
+    assert len(log._by_sensor) == 10
+    assert log.dropped == 990
+    assert log.count("sensor-0") == 0
+    assert log.query("sensor-0") == (0, [])
+    assert log.count("sensor-999") == 1
+
+
+def test_drop_counts_are_kept_while_a_sensor_has_events():
+    log = MotionLog(capacity=4)
+    for i in range(6):
+        log.append("busy", 0.5, timestamp=float(i))
+    assert log.stats()["dropped_by_sensor"] == {"busy": 2}
+
+    restored = MotionLog(capacity=4)
+    restored.restore(log.snapshot())
+    assert restored.stats()["dropped_by_sensor"] == {"busy": 2}
+    assert [event[0] for event in restored.query("busy")[1]] == [2, 3, 4, 5]
+
+
+def test_clear_forgets_every_sensor():
+    log = MotionLog(capacity=4)
+    log.append("a", 0.5)
+    log.append("b", 0.5)
+    assert log.clear() == 2
+    assert log._by_sensor == {}
+    event = log.append("a", 0.5)
+    assert log.page("a") == (1, [event], None)
@@ -0,0 +1,98 @@
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter, RateLimitMiddleware, parse_routes
+
+
+def test_parse_routes_skips_malformed_rules():
+    routes = parse_routes("POST /api/v1/camera/capture=1:5, get /items/{id}=0.5:2, broken, GET /x=fast:1")
+    assert routes == {("POST", "/api/v1/camera/capture"): (1.0, 5), ("GET", "/items/{id}"): (0.5, 2)}
+
+
+def test_defaults_only_limit_the_expensive_routes():
+    limiter = RateLimiter(
+        rate=settings.RATE_LIMIT_PER_SECOND,
+        burst=settings.RATE_LIMIT_BURST,
+        routes=parse_routes(settings.RATE_LIMIT_ROUTES),
+        max_buckets=100,
+    )
+    # One ESP32 posting readings for many sensors, or dashboards behind one proxy
+    assert all(limiter.take("10.0.0.1", "POST", "/api/v1/sensors/reading", now=0.0) == 0.0 for _ in range(500))
+    assert all(limiter.take("10.0.0.1", "GET", "/api/v1/camera/stream", now=0.0) == 0.0 for _ in range(500))
+    waits = [limiter.take("10.0.0.1", "POST", "/api/v1/camera/capture", now=0.0) for _ in range(6)]
+    assert waits[:5] == [0.0] * 5 and waits[5] > 0
+
+
+def test_bucket_allows_a_burst_then_refills_at_the_rate():
+    limiter = RateLimiter(rate=2.0, burst=3, routes={}, max_buckets=10)
+    assert [limiter.take("a", "GET", "/r", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.take("a", "GET", "/r", now=0.0) == pytest.approx(0.5)
+    assert limiter.take("a", "GET", "/r", now=0.5) == 0.0
+    # Refill is capped at the burst size
+    assert [limiter.take("a", "GET", "/r", now=100.0) for _ in range(4)][-1] > 0
+    assert limiter.rejected == 2
+
+
+def test_buckets_are_per_client_and_route():
+    limiter = RateLimiter(rate=1.0, burst=1, routes={("POST", "/slow"): (0.1, 1)}, max_buckets=10)
+    assert limiter.take("a", "POST", "/slow", now=0.0) == 0.0
+    assert limiter.take("a", "POST", "/slow", now=0.0) == pytest.approx(10.0)
+    assert limiter.take("b", "POST", "/slow", now=0.0) == 0.0
+    assert limiter.take("a", "GET", "/slow", now=0.0) == 0.0
+
+
+def test_zero_rate_disables_limiting_for_a_route():
+    limiter = RateLimiter(rate=1.0, burst=1, routes={("GET", "/free"): (0.0, 0)}, max_buckets=10)
+    assert all(limiter.take("a", "GET", "/free") == 0.0 for _ in range(10))
+
+
+def test_least_recently_used_buckets_are_dropped():
+    limiter = RateLimiter(rate=1.0, burst=1, routes={}, max_buckets=2)
+    limiter.take("a", "GET", "/r", now=0.0)
+    limiter.take("b", "GET", "/r", now=0.0)
+    limiter.take("a", "GET", "/r", now=0.0)  # "a" is now the most recent
+    limiter.take("c", "GET", "/r", now=0.0)  # evicts "b"
+    assert limiter.stats()["buckets"] == 2
+    assert limiter.take("b", "GET", "/r", now=0.0) == 0.0  # fresh bucket
+
+
+async def ok(request):
+    return PlainTextResponse("ok")
+
+
+def make_client(peer: str, **options) -> httpx.AsyncClient:
+    routes = [Route("/items/{item_id}", ok), Route("/health", ok)]
+    inner = Starlette(routes=routes)
+    limiter = RateLimiter(rate=0.001, burst=1, routes={}, max_buckets=100)
+    app = RateLimitMiddleware(inner, router=inner.router, limiter=limiter, **options)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(peer, 1234)), base_url="http://test")
+
+
+@pytest.mark.anyio
+async def test_middleware_limits_per_route_template():
+    async with make_client("10.0.0.1") as client:
+        assert (await client.get("/items/1")).status_code == 200
+        limited = await client.get("/items/2")  # same route template, same bucket
+        assert limited.status_code == 429
+        assert int(limited.headers["retry-after"]) >= 1
+        for _ in range(3):
+            assert (await client.get("/health")).status_code == 200
+
+
+@pytest.mark.anyio
+async def test_client_header_is_ignored_unless_set_by_a_trusted_proxy():
+    header = {"client_header": "X-Forwarded-For"}
+    # Untrusted peer: a fresh header value per request does not get a fresh bucket
+    async with make_client("10.0.0.1", **header, trusted_proxies="10.0.0.9") as client:
+        assert (await client.get("/items/1", headers={"X-Forwarded-For": "1.1.1.1"})).status_code == 200
+        assert (await client.get("/items/1", headers={"X-Forwarded-For": "2.2.2.2"})).status_code == 429
+
+    # Trusted proxy: clients are told apart by the last address it appended
+    async with make_client("10.0.0.9", **header, trusted_proxies="10.0.0.9") as client:
+        assert (await client.get("/items/1", headers={"X-Forwarded-For": "6.6.6.6, 1.1.1.1"})).status_code == 200
+        assert (await client.get("/items/1", headers={"X-Forwarded-For": "1.1.1.1"})).status_code == 429
+        assert (await client.get("/items/1", headers={"X-Forwarded-For": "1.1.1.1, 2.2.2.2"})).status_code == 200
@@ -0,0 +1,99 @@
+import random
+from array import array
+
+import pytest
+
+from app.services.rollups import (
+    Rollup, aggregate, combine, format_bucket, new_rollups, parse_bucket, render, rollup_for, update_rollups
+)
+
+
+@pytest.mark.parametrize("text, seconds", [("90", 90), ("30s", 30), ("5m", 300), ("1H", 3600), (" 2d ", 172800)])
+def test_parse_bucket(text, seconds):
+    assert parse_bucket(text) == seconds
+
+
+@pytest.mark.parametrize("text", ["", "0", "0m", "5w", "-1m", "1.5h"])
+def test_parse_bucket_rejects(text):
+    with pytest.raises(ValueError):
+        parse_bucket(text)
+
+
+@pytest.mark.parametrize("seconds, label", [(45, "45s"), (120, "2m"), (7200, "2h"), (86400, "1d"), (90, "90s")])
+def test_format_bucket(seconds, label):
+    assert format_bucket(seconds) == label
+
+
+def brute_force(timestamps, values, width):
+    buckets = {}
+    for t, v in zip(timestamps, values):
+        buckets.setdefault(t // width * width, []).append((t, v))
+    out = []
+    for start in sorted(buckets):
+        rows = buckets[start]
+        vals = [v for _, v in rows]
+        last_t, last_v = max(rows, key=lambda row: row[0])
+        out.append((start, len(rows), sum(vals), min(vals), max(vals), last_v, last_t))
+    return out
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_aggregate_matches_brute_force(shuffle):
+    rng = random.Random(11)
+    timestamps = sorted(rng.uniform(0, 1000) for _ in range(500))
+    if shuffle:
+        rng.shuffle(timestamps)
+    values = [rng.uniform(-5, 5) for _ in timestamps]
+    got = aggregate(array("d", timestamps), array("d", values), 60)
+    expected = brute_force(timestamps, values, 60)
+    assert [g[:2] + g[3:] for g in got] == [e[:2] + e[3:] for e in expected]
+    assert [g[2] for g in got] == pytest.approx([e[2] for e in expected])
+
+
+def test_aggregate_terminates_where_bucket_ends_round_to_their_start():
+    # At 1e17 one second is below the float spacing: start + width == start
+    timestamps = array("d", [1e17, 1e17, 1e17 + 16, 1e17 + 32])
+    values = array("d", [1.0, 2.0, 3.0, 4.0])
+    buckets = aggregate(timestamps, values, 1)
+    assert sum(b[1] for b in buckets) == 4
+    assert [b[0] for b in buckets] == sorted(b[0] for b in buckets)
+
+
+def test_combine_merges_finer_buckets():
+    minutes = aggregate(array("d", range(0, 7200, 10)), array("d", [1.0] * 720), 60)
+    hours = combine(minutes, 3600)
+    assert [(h[0], h[1], h[2]) for h in hours] == [(0.0, 360, 360.0), (3600.0, 360, 360.0)]
+    assert hours[-1][6] == 7190.0
+
+
+def test_rollup_ring_drops_buckets_older_than_its_window():
+    rollup = Rollup(60, slots=3)
+    for minute in range(5):
+        rollup.add(minute * 60 + 1, float(minute))
+    assert [b[0] for b in rollup.range(0, 1e9)] == [120.0, 180.0, 240.0]
+    # A late reading for a bucket that was reused is ignored
+    rollup.add(61, 99.0)
+    assert [b[5] for b in rollup.range(0, 1e9)] == [2.0, 3.0, 4.0]
+
+
+def test_update_rollups_fills_every_level():
+    rollups = new_rollups()
+    timestamps = array("d", [86400 * 3 + i * 30 for i in range(240)])  # two hours
+    update_rollups(rollups, timestamps, array("d", [2.0] * 240))
+    minute, hour, day = rollups
+    assert sum(b[1] for b in minute.range(0, 1e12)) == 240
+    assert [b[1] for b in hour.range(0, 1e12)] == [120, 120]
+    assert [b[1] for b in day.range(0, 1e12)] == [240]
+
+
+def test_rollup_for_picks_the_coarsest_divisor():
+    rollups = new_rollups()
+    assert rollup_for(rollups, 300).width == 60
+    assert rollup_for(rollups, 7200).width == 3600
+    assert rollup_for(rollups, 86400 * 7).width == 86400
+    assert rollup_for(rollups, 90) is None
+
+
+def test_render():
+    agg = (0.0, 4, 10.0, 1.0, 4.0, 3.0, 50.0)
+    assert render(agg, ("mean", "count", "last")) == {"mean": 2.5, "count": 4, "last": 3.0}
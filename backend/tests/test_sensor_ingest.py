@@ -0,0 +1,140 @@
+import json
+import math
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.v1.endpoints import sensors
+from app.services.sensor_ingest import (
+    IngestResult, InvalidBatchError, ingest_items, ingest_json_array, ingest_ndjson
+)
+from app.services.sensor_store import store
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    store.clear()
+    yield
+    store.clear()
+
+
+def reading(sensor_id="s1", **fields):
+    item = {"sensor_id": sensor_id, "sensor_type": "temperature", "value": 21.5, "unit": "C", "timestamp": 1_700_000_000}
+    item.update(fields)
+    return item
+
+
+def test_valid_readings_are_stored_and_invalid_ones_reported_by_index():
+    result = IngestResult()
+    items = [
+        reading(),
+        reading(value="hot"),
+        {"sensor_id": "s1"},
+        reading(value=True),
+        reading(metadata=[1]),
+        reading("s2", timestamp="2024-01-01T00:00:00"),
+        reading(sensor_id=""),
+    ]
+    ingest_items(items, result, offset=10)
+    assert (result.accepted, result.rejected) == (2, 5)
+    assert [e["index"] for e in result.errors] == [11, 12, 13, 14, 16]
+    assert len(store.series["s1"]) == 1 and len(store.series["s2"]) == 1
+
+
+@pytest.mark.parametrize("timestamp", [
+    math.nan, math.inf, -math.inf, 1e20, -1e20, 10 ** 400, "9999-12-31T23:59:59", "0001-01-01T00:00:00", "yesterday", [1],
+])
+def test_unusable_timestamps_are_rejected(timestamp):
+    result = IngestResult()
+    ingest_items([reading(timestamp=timestamp)], result)
+    assert (result.accepted, result.rejected) == (0, 1)
+    assert "s1" not in store.series
+
+
+def test_missing_timestamp_defaults_to_receive_time():
+    result = IngestResult()
+    item = reading()
+    del item["timestamp"]
+    ingest_items([item], result, received_at=1_600_000_000.0)
+    assert store.series["s1"].timestamps[0] == 1_600_000_000.0
+
+
+@pytest.mark.anyio
+async def test_json_array_body():
+    result = await ingest_json_array(json.dumps({"readings": [reading(), reading(value=None)]}).encode())
+    assert (result.accepted, result.rejected) == (1, 1)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("body", [b"[{", b'{"readings": 3}', b'"text"'])
+async def test_malformed_json_body_is_an_invalid_batch(body):
+    with pytest.raises(InvalidBatchError):
+        await ingest_json_array(body)
+
+
+@pytest.mark.anyio
+async def test_ndjson_lines_split_across_chunks():
+    lines = b"\n".join(json.dumps(reading(value=float(i))).encode() for i in range(5))
+    lines += b"\nnot json\n\n" + json.dumps(reading(value=5.0)).encode()
+
+    async def chunks():
+        for i in range(0, len(lines), 7):
+            yield lines[i:i + 7]
+
+    result = await ingest_ndjson(chunks())
+    assert (result.accepted, result.rejected) == (6, 1)
+    assert result.errors == [{"index": 5, "error": "invalid JSON"}]
+    assert list(store.series["s1"].values) == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+@pytest.mark.anyio
+async def test_malformed_ndjson_lines_never_merge_into_a_reading():
+    lines = b'{"sensor_id":"x","sensor_type":"t"\n"value":1,"unit":"C"}\n5, 6\n' + json.dumps(reading()).encode()
+
+    async def chunks():
+        yield lines
+
+    result = await ingest_ndjson(chunks())
+    assert (result.accepted, result.rejected) == (1, 3)
+    assert [e["index"] for e in result.errors] == [0, 1, 2]
+    assert "x" not in store.series
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(sensors.router, prefix="/api/v1/sensors")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.anyio
+async def test_batch_endpoint_answers_400_for_bad_input_and_500_for_internal_errors(client, monkeypatch):
+    async with client:
+        response = await client.post("/api/v1/sensors/readings/batch", content=b"[{")
+        assert response.status_code == 400
+
+        async def broken(body):
+            raise RuntimeError("disk on fire")
+
+        monkeypatch.setattr(sensors, "ingest_json_array", broken)
+        response = await client.post("/api/v1/sensors/readings/batch", content=b"[]")
+        assert response.status_code == 500
+
+
+@pytest.mark.anyio
+async def test_chunked_json_batch_over_the_size_cap_is_refused(client, monkeypatch):
+    monkeypatch.setattr(sensors.settings, "SENSOR_BATCH_MAX_MB", 1)
+    item = json.dumps(reading()).encode()
+
+    async def body():
+        # No Content-Length: httpx sends an async iterable chunked
+        yield b"["
+        for _ in range(1024 * 1024 // len(item) + 1):
+            yield item + b","
+        yield item + b"]"
+
+    async with client:
+        response = await client.post("/api/v1/sensors/readings/batch", content=body())
+    assert response.status_code == 413
+    assert "s1" not in store.series
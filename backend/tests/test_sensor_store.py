@@ -0,0 +1,168 @@
+import random
+from array import array
+
+import pytest
+
+from app.services.rollups import aggregate
+from app.services.sensor_store import (
+    BYTES_PER_READING, ROLLUP_BYTES, SensorSeries, SensorStore, SensorStoreFullError, last_disorder
+)
+
+
+def make_store(capacity: int = 8, sensors: int = 4) -> SensorStore:
+    """A store with room for exactly ``sensors`` sensors"""
+    return SensorStore(capacity=capacity, memory_budget_bytes=sensors * (capacity * BYTES_PER_READING + ROLLUP_BYTES))
+
+
+def shuffle_tail(values: list, count: int, seed: int):
+    tail = values[-count:]
+    random.Random(seed).shuffle(tail)
+    values[-count:] = tail
+
+
+def test_recent_keeps_the_newest_readings_after_wrapping():
+    store = make_store(capacity=4)
+    for i in range(10):
+        store.append("s1", "temperature", float(i), "C", timestamp=1000.0 + i)
+    assert [r["value"] for r in store.recent("s1", 10)] == [6.0, 7.0, 8.0, 9.0]
+    assert [r["value"] for r in store.recent("s1", 2)] == [8.0, 9.0]
+    assert store.recent("missing", 5) == []
+
+
+def test_extend_matches_appending_one_by_one():
+    one, bulk = make_store(capacity=5), make_store(capacity=5)
+    for start in (0, 3, 7):
+        ts = array("d", [100.0 + start + i for i in range(4)])
+        vals = array("d", [float(start + i) for i in range(4)])
+        for t, v in zip(ts, vals):
+            one.append("s", "t", v, "u", timestamp=t)
+        bulk.extend("s", "t", "u", ts, vals)
+    assert bulk.recent("s", 10) == one.recent("s", 10)
+    assert bulk.series["s"].total == one.series["s"].total == 12
+
+
+def test_metadata_is_dropped_with_overwritten_readings():
+    store = make_store(capacity=3)
+    store.append("s", "t", 1.0, "u", timestamp=1.0, metadata={"n": 1})
+    for i in range(2, 5):
+        store.append("s", "t", float(i), "u", timestamp=float(i))
+    assert store.series["s"].metadata == {}
+    store.extend("s", "t", "u", array("d", [5.0, 6.0]), array("d", [5.0, 6.0]), {1: {"n": 6}})
+    assert store.recent("s", 1)[0]["metadata"] == {"n": 6}
+
+
+def test_new_sensor_beyond_budget_is_refused():
+    store = make_store(capacity=4, sensors=2)
+    store.append("a", "t", 1.0, "u", timestamp=1.0)
+    store.append("b", "t", 1.0, "u", timestamp=1.0)
+    with pytest.raises(SensorStoreFullError):
+        store.append("c", "t", 1.0, "u", timestamp=1.0)
+    # Existing sensors keep accepting readings
+    store.append("a", "t", 2.0, "u", timestamp=2.0)
+
+
+def test_last_disorder():
+    assert last_disorder(array("d")) is None
+    assert last_disorder(array("d", [1, 2, 2, 3])) is None
+    assert last_disorder(array("d", [1, 3, 2, 4, 0, 5])) == 4
+
+
+def test_series_tracks_order_through_wraparound():
+    series = SensorSeries("s", capacity=4)
+    for t in (1.0, 2.0, 1.5, 3.0):
+        series.append(t, t, 0, 0)
+    assert not series.in_order
+    # Once the out-of-order reading's predecessor is overwritten the ring is sorted again
+    for t in (4.0, 5.0):
+        series.append(t, t, 0, 0)
+    assert series.in_order
+    assert list(series.columns()[0]) == [1.5, 3.0, 4.0, 5.0]
+
+
+@pytest.mark.parametrize("right", [False, True])
+def test_bisect_across_the_wrap_point(right):
+    series = SensorSeries("s", capacity=7)
+    timestamps = [float(t // 2) for t in range(17)]  # duplicates, wraps more than twice
+    for t in timestamps:
+        series.append(t, t, 0, 0)
+    kept = timestamps[-7:]
+    for probe in [kept[0] - 1] + kept + [kept[-1] + 0.5, kept[-1] + 1]:
+        expected = sum(1 for t in kept if (t <= probe if right else t < probe))
+        assert series.bisect(probe, right=right) == series.first_seq + expected
+
+
+def brute_force_page(readings, since, until):
+    return [r for r in readings if (since is None or r[1] >= since) and (until is None or r[1] <= until)]
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_pages_cover_the_range_exactly_once(shuffle):
+    store = make_store(capacity=50)
+    timestamps = [float(i) for i in range(120)]
+    if shuffle:
+        shuffle_tail(timestamps, 20, seed=7)  # out of order within the retained window
+    for i, t in enumerate(timestamps):
+        store.append("s", "t", float(i), "u", timestamp=1_000_000.0 + t)
+    retained = [(i, 1_000_000.0 + t) for i, t in enumerate(timestamps)][-50:]
+    assert store.series["s"].in_order is not shuffle
+
+    for since, until in [(None, None), (1_000_080.0, None), (None, 1_000_100.0), (1_000_075.5, 1_000_110.0)]:
+        seen, cursor = [], None
+        while True:
+            rows, cursor = store.page("s", since=since, until=until, cursor=cursor, limit=7)
+            seen.extend(r["value"] for r in rows)
+            if cursor is None:
+                break
+        assert seen == [float(i) for i, _ in brute_force_page(retained, since, until)]
+
+
+def test_cursor_survives_appends_and_overwrites():
+    store = make_store(capacity=10)
+    for i in range(10):
+        store.append("s", "t", float(i), "u", timestamp=100.0 + i)
+    rows, cursor = store.page("s", limit=3)
+    assert [r["value"] for r in rows] == [0.0, 1.0, 2.0]
+    # Overwrite past the cursor: the next page resumes at the oldest reading left
+    for i in range(10, 16):
+        store.append("s", "t", float(i), "u", timestamp=100.0 + i)
+    rows, cursor = store.page("s", cursor=cursor, limit=3)
+    assert [r["value"] for r in rows] == [6.0, 7.0, 8.0]
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_raw_downsample_matches_aggregating_the_filtered_readings(shuffle):
+    store = make_store(capacity=200)
+    timestamps = [1000.0 + i * 1.7 for i in range(300)]
+    if shuffle:
+        shuffle_tail(timestamps, 50, seed=3)
+    for t in timestamps:
+        store.append("s", "t", t * 2, "u", timestamp=t)
+    kept = timestamps[-200:]
+    since, until = 1200.0, 1400.0
+    source, buckets = store.downsample("s", 7, since, until)
+    assert source == "raw"
+    rows = [(t, t * 2) for t in kept if since // 7 * 7 <= t <= until]
+    expected = aggregate(array("d", [t for t, _ in rows]), array("d", [v for _, v in rows]), 7)
+    assert sorted(buckets) == sorted(expected)
+
+
+def test_downsample_uses_rollups_for_whole_minutes():
+    store = make_store(capacity=4)
+    for i in range(180):
+        store.append("s", "t", float(i), "u", timestamp=60_000.0 + i)
+    source, buckets = store.downsample("s", 60, 60_000.0, 60_179.0)
+    assert source == "rollup_1m"
+    # Beyond the raw ring: every reading is still counted
+    assert [b[1] for b in buckets] == [60, 60, 60]
+
+
+def test_restore_keeps_order_tracking():
+    store = make_store(capacity=5)
+    for t in (1.0, 3.0, 2.0, 4.0):
+        store.append("s", "t", t, "u", timestamp=t)
+    restored = make_store(capacity=5)
+    restored.restore(store.snapshot())
+    series = restored.series["s"]
+    assert not series.in_order
+    assert series.disorder == store.series["s"].disorder
+    assert restored.recent("s", 5) == store.recent("s", 5)
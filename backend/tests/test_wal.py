@@ -0,0 +1,156 @@
+import os
+from array import array
+
+import pytest
+
+from app.services.motion_log import motion_log
+from app.services.persistence import Journal, encode_readings, snapshot_name
+from app.services.sensor_store import store
+from app.services.wal import FRAME, WriteAheadLog, segment_name
+
+
+def open_wal(directory, segment_bytes=1 << 20) -> WriteAheadLog:
+    wal = WriteAheadLog(str(directory), segment_bytes, flush_interval=60)
+    wal.start()
+    return wal
+
+
+def test_records_survive_a_restart_in_order(tmp_path):
+    wal = open_wal(tmp_path)
+    for i in range(100):
+        wal.append(f"record {i}".encode())
+    wal.close()
+    assert list(open_wal(tmp_path).replay()) == [f"record {i}".encode() for i in range(100)]
+
+
+def test_nothing_is_written_before_a_flush(tmp_path):
+    wal = open_wal(tmp_path)
+    wal.append(b"buffered")
+    assert list(WriteAheadLog(str(tmp_path), 1 << 20, 60).replay()) == []
+    wal.flush()
+    assert list(WriteAheadLog(str(tmp_path), 1 << 20, 60).replay()) == [b"buffered"]
+    wal.close()
+
+
+def test_segments_rotate_by_size(tmp_path):
+    wal = open_wal(tmp_path, segment_bytes=100)
+    payloads = [bytes([i]) * 40 for i in range(10)]
+    for payload in payloads:
+        wal.append(payload)
+    wal.close()
+    assert len(wal.segments()) > 1
+    assert list(wal.replay()) == payloads
+
+
+def test_rotate_marks_a_replay_boundary(tmp_path):
+    wal = open_wal(tmp_path)
+    wal.append(b"old")
+    boundary = wal.rotate()
+    wal.append(b"new")
+    wal.flush()
+    assert list(wal.replay(from_segment=boundary)) == [b"new"]
+    assert wal.remove_segments_before(boundary) == 1
+    assert list(wal.replay()) == [b"new"]
+    wal.close()
+
+
+@pytest.mark.parametrize("damage", ["truncate", "corrupt"])
+def test_a_torn_tail_keeps_the_intact_records(tmp_path, damage):
+    wal = open_wal(tmp_path)
+    for payload in (b"first", b"second", b"third"):
+        wal.append(payload)
+    wal.close()
+    path = tmp_path / segment_name(wal.segments()[-1])
+    data = bytearray(path.read_bytes())
+    if damage == "truncate":
+        data = data[:-2]
+    else:
+        data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    assert list(WriteAheadLog(str(tmp_path), 1 << 20, 60).replay()) == [b"first", b"second"]
+
+
+def test_restart_never_appends_to_an_old_segment(tmp_path):
+    wal = open_wal(tmp_path)
+    wal.append(b"a")
+    wal.close()
+    before = wal.segments()
+    wal = open_wal(tmp_path)
+    wal.append(b"b")
+    wal.close()
+    assert wal.segments() == before + [before[-1] + 1]
+    assert (tmp_path / segment_name(before[-1])).stat().st_size == FRAME.size + 1
+
+
+@pytest.fixture
+def empty_stores():
+    store.clear()
+    motion_log.clear()
+    yield
+    store.clear()
+    motion_log.clear()
+
+
+def log_batch(journal: Journal, sensor_id: str, timestamps, values):
+    ts, vals = array("d", timestamps), array("d", values)
+    store.extend(sensor_id, "temperature", "C", ts, vals)
+    journal.log_readings(sensor_id, "temperature", "C", ts, vals)
+
+
+def test_journal_restores_snapshot_plus_later_records(tmp_path, empty_stores):
+    journal = Journal()
+    journal.open(str(tmp_path), segment_bytes=1 << 20, flush_interval=60)
+    log_batch(journal, "s1", [1.0, 2.0], [10.0, 20.0])
+    segment_id, state = journal._capture()
+    journal._write_snapshot(segment_id, state)
+    log_batch(journal, "s1", [3.0], [30.0])
+    journal.wal.close()  # crash after the last group commit: no final snapshot
+    expected = store.recent("s1", 10)
+
+    store.clear()
+    restored = Journal()
+    restored.open(str(tmp_path), segment_bytes=1 << 20, flush_interval=60)
+    assert store.recent("s1", 10) == expected
+    # The snapshot replaced the segments before it
+    assert snapshot_name(segment_id) in os.listdir(tmp_path)
+    assert min(restored.wal.segments()) == segment_id
+    restored.close()
+
+
+def test_readings_written_after_a_clean_restart_survive_a_crash(tmp_path, empty_stores):
+    journal = Journal()
+    journal.open(str(tmp_path), segment_bytes=1 << 20, flush_interval=60)
+    log_batch(journal, "s1", [1.0, 2.0], [10.0, 20.0])
+    journal.close()  # final snapshot; its empty segment is removed
+
+    store.clear()
+    journal = Journal()
+    journal.open(str(tmp_path), segment_bytes=1 << 20, flush_interval=60)
+    log_batch(journal, "s1", [3.0], [30.0])
+    journal.wal.close()  # crash: no final snapshot
+
+    store.clear()
+    journal = Journal()
+    journal.open(str(tmp_path), segment_bytes=1 << 20, flush_interval=60)
+    assert [r["value"] for r in store.recent("s1", 10)] == [10.0, 20.0, 30.0]
+    log_batch(journal, "s1", [4.0], [40.0])
+    journal.close()
+
+    # The newest snapshot supersedes the older ones
+    store.clear()
+    journal = Journal()
+    journal.open(str(tmp_path), segment_bytes=1 << 20, flush_interval=60)
+    assert [r["value"] for r in store.recent("s1", 10)] == [10.0, 20.0, 30.0, 40.0]
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("snapshot-")]) == 1
+    journal.close()
+
+
+def test_encoded_readings_round_trip(tmp_path, empty_stores):
+    wal = open_wal(tmp_path)
+    wal.append(encode_readings("s1", "humidity", "%", array("d", [5.0]), array("d", [55.0]), {0: {"room": "a"}}))
+    wal.close()
+    journal = Journal()
+    journal.open(str(tmp_path), segment_bytes=1 << 20, flush_interval=60)
+    [row] = store.recent("s1", 1)
+    assert (row["sensor_type"], row["value"], row["unit"], row["metadata"]) == ("humidity", 55.0, "%", {"room": "a"})
+    journal.close()
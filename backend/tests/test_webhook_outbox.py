@@ -0,0 +1,161 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services import webhook_outbox
+from app.services.webhook_outbox import OutboxFull, WebhookOutbox
+
+pytestmark = pytest.mark.anyio
+
+
+class Response:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+class FakeN8n:
+    """Records webhook calls and answers with the queued statuses (200 once they run out)"""
+
+    def __init__(self):
+        self.calls = []
+        self.statuses = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def webhook(self, webhook, body, timeout=None):
+        await self.gate.wait()
+        self.calls.append((webhook, json.loads(body)))
+        return Response(self.statuses.pop(0) if self.statuses else 200)
+
+
+@pytest.fixture
+def n8n(monkeypatch):
+    fake = FakeN8n()
+    monkeypatch.setattr(webhook_outbox, "n8n", fake)
+    return fake
+
+
+@pytest.fixture
+async def make_outbox(tmp_path):
+    outboxes = []
+
+    def make(**overrides) -> WebhookOutbox:
+        options = dict(
+            path=str(tmp_path / "outbox.sqlite3"), workers=4, per_webhook=2, max_pending=100, max_attempts=3,
+            backoff_base=0.01, backoff_max=0.02, batch_webhooks=set(), batch_max=10, batch_window=0.05,
+            retention=3600,
+        )
+        options.update(overrides)
+        outbox = WebhookOutbox(**options)
+        outboxes.append(outbox)
+        return outbox
+
+    yield make
+    for outbox in outboxes:
+        await outbox.stop()
+
+
+async def settled(outbox: WebhookOutbox, timeout: float = 5.0):
+    """Wait until nothing is pending"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while (await outbox.stats())["pending_per_webhook"]:
+        assert asyncio.get_running_loop().time() < deadline, "outbox did not settle"
+        await asyncio.sleep(0.01)
+
+
+async def test_entries_are_delivered_in_order(n8n, make_outbox):
+    outbox = make_outbox(per_webhook=1)
+    ids = [await outbox.enqueue("motion", {"n": i}) for i in range(5)]
+    await settled(outbox)
+    assert [payload["n"] for _, payload in n8n.calls] == list(range(5))
+    assert {(await outbox.get(entry_id))["status"] for entry_id in ids} == {"delivered"}
+
+
+async def test_server_errors_are_retried_until_delivered(n8n, make_outbox):
+    outbox = make_outbox()
+    n8n.statuses = [503, 500]
+    entry_id = await outbox.enqueue("motion", {})
+    await settled(outbox)
+    entry = await outbox.get(entry_id)
+    assert (entry["status"], entry["attempts"], len(n8n.calls)) == ("delivered", 3, 3)
+
+
+@pytest.mark.parametrize("statuses, attempts", [([404], 1), ([500, 500, 500], 3)])
+async def test_permanent_errors_and_exhausted_retries_fail(n8n, make_outbox, statuses, attempts):
+    outbox = make_outbox()
+    n8n.statuses = list(statuses)
+    entry_id = await outbox.enqueue("motion", {})
+    await settled(outbox)
+    entry = await outbox.get(entry_id)
+    assert (entry["status"], entry["attempts"], entry["last_status_code"]) == ("failed", attempts, statuses[-1])
+
+
+async def test_full_webhook_refuses_new_entries(n8n, make_outbox):
+    outbox = make_outbox(max_pending=2)
+    n8n.gate.clear()
+    await outbox.enqueue("motion", {})
+    await outbox.enqueue("motion", {})
+    with pytest.raises(OutboxFull):
+        await outbox.enqueue("motion", {})
+    # Other webhooks are unaffected
+    await outbox.enqueue("door", {})
+    n8n.gate.set()
+    await settled(outbox)
+    await outbox.enqueue("motion", {})
+
+
+async def test_retry_requeues_a_failed_entry_within_the_pending_cap(n8n, make_outbox):
+    outbox = make_outbox(max_pending=1)
+    n8n.statuses = [400]
+    failed = await outbox.enqueue("motion", {"n": 0})
+    await settled(outbox)
+    assert (await outbox.get(failed))["status"] == "failed"
+
+    n8n.gate.clear()
+    await outbox.enqueue("motion", {"n": 1})
+    with pytest.raises(OutboxFull):
+        await outbox.retry(failed)
+    assert (await outbox.get(failed))["status"] == "failed"
+
+    n8n.gate.set()
+    await settled(outbox)
+    assert await outbox.retry(failed)
+    assert not await outbox.retry(failed)  # no longer failed
+    await settled(outbox)
+    assert (await outbox.get(failed))["status"] == "delivered"
+
+
+async def test_entries_deleted_before_delivery_stop_counting_as_pending(n8n, make_outbox):
+    outbox = make_outbox(per_webhook=1)
+    n8n.gate.clear()
+    await outbox.enqueue("motion", {"n": 0})
+    gone = await outbox.enqueue("motion", {"n": 1})
+    await asyncio.to_thread(outbox._execute, "DELETE FROM outbox WHERE id = ?", (gone,))
+    n8n.gate.set()
+    await settled(outbox)
+    assert [payload["n"] for _, payload in n8n.calls] == [0]
+
+
+async def test_batch_webhooks_send_one_post_per_window(n8n, make_outbox):
+    outbox = make_outbox(batch_webhooks={"readings"}, batch_max=3, batch_window=0.5)
+    for i in range(5):
+        await outbox.enqueue("readings", {"n": i})
+    await settled(outbox)
+    assert [body["count"] for _, body in n8n.calls] == [3, 2]
+    assert [event["n"] for _, body in n8n.calls for event in body["events"]] == list(range(5))
+
+
+async def test_pending_entries_are_resent_after_a_restart(n8n, make_outbox):
+    outbox = make_outbox()
+    n8n.gate.clear()
+    entry_id = await outbox.enqueue("motion", {"n": 0})
+    await asyncio.sleep(0.05)
+    await outbox.stop()
+
+    n8n.gate.set()
+    restarted = make_outbox()
+    restarted.start()
+    await settled(restarted)
+    assert (await restarted.get(entry_id))["status"] == "delivered"
+    assert len(n8n.calls) == 1
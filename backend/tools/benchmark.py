@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite for the FastAPI backend
+
+Runs the application in-process against the local ESP32 simulator and the
+n8n stub, measures throughput and latency percentiles per scenario and
+optionally compares the results with a stored baseline.
+
+Run from the backend directory:
+    python -m tools.benchmark --output bench.json
+    python -m tools.benchmark --baseline bench-baseline.json --tolerance 0.15
+    python -m tools.benchmark --scenarios capture,sensor_ingest --concurrency 32 --save-baseline bench-baseline.json
+
+Exit status is 1 when any scenario regresses beyond the tolerance.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from tools.esp32_simulator import SimulatorConfig, build_device
+from tools.n8n_stub import StubConfig, start_stub
+from tools.simhttp import serve
+
+logger = logging.getLogger("benchmark")
+
+ALL_SCENARIOS = [
+    "capture", "list_images", "image_download", "sensor_ingest", "sensor_batch", "webhook_fanout", "workflows"
+]
+
+RequestFn = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+# Optional per-scenario step run after the timed requests: (result, wall clock start) -> final result
+SettleFn = Callable[["ScenarioResult", float], Awaitable["ScenarioResult"]]
+
+
+@dataclass
+class ScenarioResult:
+    """Measured outcome of one scenario"""
+    name: str
+    requests: int
+    errors: int
+    concurrency: int
+    duration_s: float
+    throughput_rps: float
+    latency_ms: Dict[str, float]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, rank))]
+
+
+def summarize(name: str, latencies: List[float], total: int, errors: int, concurrency: int,
+              duration: float) -> ScenarioResult:
+    """ScenarioResult from per-request latencies in milliseconds"""
+    latencies.sort()
+    return ScenarioResult(
+        name=name,
+        requests=total,
+        errors=errors,
+        concurrency=concurrency,
+        duration_s=round(duration, 4),
+        throughput_rps=round(total / duration, 2) if duration else 0.0,
+        latency_ms={
+            "mean": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 3),
+            "p90": round(percentile(latencies, 90), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+    )
+
+
+async def run_load(
+    name: str,
+    client: httpx.AsyncClient,
+    request_fn: RequestFn,
+    total: int,
+    concurrency: int,
+) -> ScenarioResult:
+    """Issue ``total`` requests with at most ``concurrency`` in flight"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await request_fn(client, i)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    duration = time.perf_counter() - started
+    return summarize(name, latencies, total, errors, concurrency, duration)
+
+
+async def wait_for_deliveries(stub, result: ScenarioResult, started: float, timeout: float) -> ScenarioResult:
+    """
+    Re-measure a webhook run by delivery to n8n rather than by enqueue
+
+    Payloads carry their send time; latency is send to arrival at the n8n
+    stand-in, including outbox queueing and retries, and throughput counts
+    deliveries over the time until the last one arrived. Deliveries that do
+    not arrive within ``timeout`` count as errors.
+    """
+    expected = result.requests - result.errors
+    deadline = time.time() + timeout
+    while True:
+        arrived = [r for r in stub.received
+                   if isinstance(r["body"], dict) and r["body"].get("sent_at", 0) >= started]
+        if len(arrived) >= expected or time.time() > deadline:
+            break
+        await asyncio.sleep(0.02)
+    latencies = [(r["received_at"] - r["body"]["sent_at"]) * 1000 for r in arrived]
+    duration = max((r["received_at"] for r in arrived), default=started) - started
+    errors = result.errors + max(0, expected - len(arrived))
+    return summarize(result.name, latencies, result.requests, errors, result.concurrency, duration)
+
+
+def populate_capture_dir(path: str, count: int):
+    """Fill ``path`` with ``count`` empty capture files (reused across runs)"""
+    os.makedirs(path, exist_ok=True)
+    existing = sum(1 for f in os.listdir(path) if f.endswith(".jpg"))
+    if existing == count:
+        return
+    logger.info(f"Creating {count} files in {path}")
+    for i in range(existing, count):
+        open(os.path.join(path, f"capture_{i:012d}.jpg"), "wb").close()
+
+
+async def run_suite(args) -> List[ScenarioResult]:
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="esp32-bench-")
+
+    sim_config = SimulatorConfig(
+        latency_ms=args.sim_latency_ms,
+        jitter_ms=args.sim_jitter_ms,
+        bandwidth_kbps=args.sim_bandwidth_kbps,
+        failure_rate=0.0,
+        image_size_kb=args.image_size_kb,
+        images_dir=None,
+        serialize=True,
+        seed=0,
+    )
+    device = build_device("esp32-bench", sim_config, seed=0)
+    esp32_server = await serve(device.handle, "127.0.0.1", 0, keep_alive=False, serialize=True)
+    esp32_port = esp32_server.sockets[0].getsockname()[1]
+    n8n_config = StubConfig(
+        latency_ms=args.n8n_latency_ms,
+        jitter_ms=0.0,
+        failure_rate=args.n8n_failure_rate,
+        fail_on="webhook",
+        api_key="",
+        basic_auth="",
+        # Keep every payload of a run so deliveries can be matched to sends
+        record_limit=args.requests + args.warmup,
+        seed=0,
+    )
+    n8n_stub, n8n_server = await start_stub("127.0.0.1", 0, n8n_config)
+    n8n_port = n8n_server.sockets[0].getsockname()[1]
+
+    # Settings are read from the environment at import time
+    capture_dir = os.path.join(work_dir, "captures")
+    os.environ.update({
+        "ESP32_IP": "127.0.0.1",
+        "ESP32_PORT": str(esp32_port),
+        "N8N_URL": f"http://127.0.0.1:{n8n_port}",
+        "CAPTURE_DIR": capture_dir,
+        "DATA_DIR": os.path.join(work_dir, "data"),
+        # One client sends everything; per-client limits would measure 429s
+        "RATE_LIMIT_ENABLED": "false",
+        # Queue every in-flight request for the device, so capture measures latency rather than 503s
+        "ESP32_MAX_WAITING": str(args.concurrency),
+        "ESP32_QUEUE_TIMEOUT_SECONDS": "300",
+    })
+    logging.getLogger("app").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    from app.core.config import settings
+    from app.main import app
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            api = settings.API_V1_STR
+            # Each scenario yields (name, request function, total[, settle function])
+            scenarios: Dict[str, Callable[[], List[tuple]]] = {}
+
+            def capture():
+                settings.CAPTURE_DIR = capture_dir
+
+                async def call(c, i):
+                    return await c.post(f"{api}/camera/capture", params={"save": "true", "label": f"b{i}"})
+                return [("capture", call, args.capture_requests)]
+
+            def list_images():
+                runs = []
+                for size in args.list_sizes:
+                    directory = os.path.join(work_dir, f"list_{size}")
+                    populate_capture_dir(directory, size)
+
+                    async def call(c, i, directory=directory):
+                        settings.CAPTURE_DIR = directory
+                        return await c.get(f"{api}/camera/images", params={"limit": 50, "offset": 0})
+                    runs.append((f"list_images_{size}", call, args.list_requests))
+                return runs
+
+            def image_download():
+                directory = os.path.join(work_dir, "download")
+                os.makedirs(directory, exist_ok=True)
+                with open(os.path.join(directory, "capture_download.jpg"), "wb") as f:
+                    f.write(device.frames[0])
+
+                async def call(c, i):
+                    settings.CAPTURE_DIR = directory
+                    return await c.get(f"{api}/camera/images/capture_download.jpg")
+                return [("image_download", call, args.requests)]
+
+            def sensor_ingest():
+                async def call(c, i):
+                    return await c.post(f"{api}/sensors/reading", json={
+                        "sensor_id": f"bench_{i % args.sensors}",
+                        "sensor_type": "temperature",
+                        "value": 20.0 + (i % 100) / 10,
+                        "unit": "celsius",
+                    })
+                return [("sensor_ingest", call, args.requests)]
+
+            def sensor_batch():
+                def readings(i):
+                    now = time.time()
+                    return [{
+                        "sensor_id": f"bench_batch_{(i + k) % args.sensors}",
+                        "sensor_type": "temperature",
+                        "value": 20.0 + k % 100 / 10,
+                        "unit": "celsius",
+                        "timestamp": now,
+                    } for k in range(args.batch_size)]
+
+                async def call_json(c, i):
+                    return await c.post(f"{api}/sensors/readings/batch", json=readings(i))
+
+                async def call_ndjson(c, i):
+                    body = "\n".join(json.dumps(r) for r in readings(i))
+                    return await c.post(
+                        f"{api}/sensors/readings/batch", content=body,
+                        headers={"Content-Type": "application/x-ndjson"},
+                    )
+                return [
+                    ("sensor_batch_json", call_json, args.batch_requests),
+                    ("sensor_batch_ndjson", call_ndjson, args.batch_requests),
+                ]
+
+            def webhook_fanout():
+                async def call(c, i):
+                    return await c.post(
+                        f"{api}/n8n/webhook/bench-{i % args.webhooks}", json={"seq": i, "sent_at": time.time()}
+                    )
+
+                async def settle(result, started):
+                    return await wait_for_deliveries(n8n_stub, result, started, args.delivery_timeout)
+                return [("webhook_fanout", call, args.requests, settle)]
+
+            def workflows():
+                async def call(c, i):
+                    return await c.get(f"{api}/n8n/workflows")
+                return [("workflows", call, args.requests)]
+
+            scenarios.update({
+                "capture": capture,
+                "list_images": list_images,
+                "image_download": image_download,
+                "sensor_ingest": sensor_ingest,
+                "sensor_batch": sensor_batch,
+                "webhook_fanout": webhook_fanout,
+                "workflows": workflows,
+            })
+
+            for scenario in args.scenarios:
+                for name, call, total, *settle in scenarios[scenario]():
+                    # A short warm-up keeps import and connection costs out of the numbers
+                    await run_load(name, client, call, min(total, args.warmup), args.concurrency)
+                    started = time.time()
+                    result = await run_load(name, client, call, total, args.concurrency)
+                    if settle:
+                        result = await settle[0](result, started)
+                    logger.info(
+                        f"{name}: {result.throughput_rps} req/s, p50 {result.latency_ms['p50']}ms, "
+                        f"p99 {result.latency_ms['p99']}ms, errors {result.errors}"
+                    )
+                    results.append(result)
+
+    logger.info(f"n8n stand-in: {json.dumps(n8n_stub.snapshot())}")
+    esp32_server.close()
+    n8n_server.close()
+    return results
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, min_delta_ms: float = 1.0) -> List[str]:
+    """Return human-readable regressions of ``current`` against ``baseline``"""
+    regressions = []
+    base_by_name = {r["name"]: r for r in baseline.get("results", [])}
+    for result in current["results"]:
+        base = base_by_name.get(result["name"])
+        if base is None:
+            continue
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{result['name']}: throughput {result['throughput_rps']} req/s "
+                f"< baseline {base['throughput_rps']} req/s"
+            )
+        p99, base_p99 = result["latency_ms"]["p99"], base["latency_ms"]["p99"]
+        # Sub-millisecond wobble is scheduler noise, not a regression
+        if p99 > base_p99 * (1 + tolerance) and p99 - base_p99 > min_delta_ms:
+            regressions.append(
+                f"{result['name']}: p99 {result['latency_ms']['p99']}ms "
+                f"> baseline {base['latency_ms']['p99']}ms"
+            )
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{result['name']}: {result['errors']} errors (baseline {base['errors']})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backend against simulated dependencies")
+    parser.add_argument("--scenarios", default=",".join(ALL_SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(ALL_SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--capture-requests", type=int, default=100, help="Requests for the capture scenario")
+    parser.add_argument("--list-requests", type=int, default=50, help="Requests per list_images size")
+    parser.add_argument("--list-sizes", default="1000,100000",
+                        help="Capture folder sizes for list_images (e.g. 1000,100000,1000000)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="Warm-up requests per scenario")
+    parser.add_argument("--sensors", type=int, default=10, help="Distinct sensor ids for ingest")
+    parser.add_argument("--webhooks", type=int, default=4, help="Distinct webhook names for fan-out")
+    parser.add_argument("--delivery-timeout", type=float, default=60.0,
+                        help="Seconds to wait for webhook_fanout deliveries to reach n8n")
+    parser.add_argument("--batch-size", type=int, default=500, help="Readings per sensor_batch request")
+    parser.add_argument("--batch-requests", type=int, default=100, help="Requests per sensor_batch format")
+    parser.add_argument("--sim-latency-ms", type=float, default=5.0)
+    parser.add_argument("--sim-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--sim-bandwidth-kbps", type=float, default=0.0)
+    parser.add_argument("--image-size-kb", type=int, default=75)
+    parser.add_argument("--n8n-latency-ms", type=float, default=0.0, help="Latency of the n8n stand-in")
+    parser.add_argument("--n8n-failure-rate", type=float, default=0.0,
+                        help="Fraction of webhook deliveries the n8n stand-in fails (exercises outbox retries)")
+    parser.add_argument("--work-dir", help="Keep generated capture folders here between runs")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--baseline", help="Compare against this results JSON")
+    parser.add_argument("--save-baseline", help="Write results JSON as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore p99 increases smaller than this")
+    args = parser.parse_args(argv)
+
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(ALL_SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    args.list_sizes = [int(s) for s in args.list_sizes.split(",") if s.strip()]
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run_suite(args))
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "concurrency": args.concurrency,
+            "sim_latency_ms": args.sim_latency_ms,
+            "sim_jitter_ms": args.sim_jitter_ms,
+            "sim_bandwidth_kbps": args.sim_bandwidth_kbps,
+            "image_size_kb": args.image_size_kb,
+            "n8n_latency_ms": args.n8n_latency_ms,
+            "n8n_failure_rate": args.n8n_failure_rate,
+        },
+        "results": [asdict(r) for r in results],
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        for line in regressions:
+            logger.error(f"Regression: {line}")
+        if regressions:
+            return 1
+        logger.info("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    sys.exit(main())
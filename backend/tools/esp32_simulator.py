@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Local ESP32 camera simulator
+Implements the HTTP surface of camera_webserver.ino so the backend can be
+developed and load tested without a physical board.
+
+Run from the backend directory:
+    python -m tools.esp32_simulator --port 8081
+    python -m tools.esp32_simulator --instances 4 --latency-ms 120 --bandwidth-kbps 600
+
+Then point the backend at it:
+    ESP32_IP=127.0.0.1 ESP32_PORT=8081 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from tools.simhttp import Request, Response, serve
+
+logger = logging.getLogger("esp32_simulator")
+
+# JPEG markers used to frame synthetic images
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+APP0_JFIF = b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+MAX_SEGMENT_PAYLOAD = 65533
+NO_MARKER_BYTES = bytes(range(255)) + b"\xfe"
+
+DEFAULT_SETTINGS = {
+    "resolution": "UXGA",
+    "quality": 10,
+    "brightness": 0,
+    "contrast": 0,
+    "saturation": 0,
+}
+
+
+@dataclass
+class SimulatorConfig:
+    """Behaviour knobs for a simulated device"""
+    latency_ms: float = float(os.getenv("SIM_LATENCY_MS", "80"))
+    jitter_ms: float = float(os.getenv("SIM_JITTER_MS", "20"))
+    bandwidth_kbps: float = float(os.getenv("SIM_BANDWIDTH_KBPS", "0"))  # 0 = unlimited
+    failure_rate: float = float(os.getenv("SIM_FAILURE_RATE", "0"))
+    image_size_kb: int = int(os.getenv("SIM_IMAGE_SIZE_KB", "75"))
+    images_dir: Optional[str] = os.getenv("SIM_IMAGES_DIR")
+    serialize: bool = os.getenv("SIM_SERIALIZE", "true").lower() == "true"
+    restart_seconds: float = float(os.getenv("SIM_RESTART_SECONDS", "10"))
+    seed: Optional[int] = None
+
+
+def synthetic_jpeg(size_bytes: int, rng: random.Random) -> bytes:
+    """
+    Build a JPEG-framed payload of roughly ``size_bytes``
+
+    The body is random filler carried in COM segments, so the file has a
+    valid SOI/EOI structure and realistic size without needing an encoder.
+    """
+    parts = [SOI, APP0_JFIF]
+    remaining = max(0, size_bytes - len(SOI) - len(APP0_JFIF) - len(EOI))
+    while remaining > 4:
+        payload = min(MAX_SEGMENT_PAYLOAD, remaining - 4)
+        parts.append(b"\xff\xfe" + (payload + 2).to_bytes(2, "big"))
+        # 0xff bytes are mapped away so the filler never looks like a marker
+        parts.append(rng.randbytes(payload).translate(NO_MARKER_BYTES))
+        remaining -= payload + 4
+    parts.append(EOI)
+    return b"".join(parts)
+
+
+def load_recorded_images(images_dir: str) -> List[bytes]:
+    """Load recorded captures to replay instead of synthetic frames"""
+    paths = sorted(Path(images_dir).glob("*.jp*g"))
+    return [p.read_bytes() for p in paths]
+
+
+@dataclass
+class SimulatedDevice:
+    """One simulated ESP32 camera board"""
+    name: str
+    config: SimulatorConfig
+    frames: List[bytes]
+    rng: random.Random
+    settings: Dict = field(default_factory=lambda: dict(DEFAULT_SETTINGS))
+    booted_at: float = field(default_factory=time.monotonic)
+    offline_until: float = 0.0
+    frame_index: int = 0
+    lcd: Dict[str, List[str]] = field(default_factory=dict)
+    sensor_config: Dict[str, Dict] = field(default_factory=dict)
+    stats: Dict[str, int] = field(default_factory=lambda: {
+        "requests": 0, "captures": 0, "failures": 0, "bytes_sent": 0, "restarts": 0, "lcd_frames": 0,
+        "config_pushes": 0
+    })
+
+    async def _camera_delay(self):
+        delay_ms = self.config.latency_ms + self.rng.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+
+    def _bandwidth(self) -> Optional[float]:
+        if self.config.bandwidth_kbps <= 0:
+            return None
+        return self.config.bandwidth_kbps * 1024
+
+    async def handle(self, request: Request) -> Optional[Response]:
+        if time.monotonic() < self.offline_until:
+            # Rebooting: the board does not answer at all
+            return None
+
+        self.stats["requests"] += 1
+        route = (request.method, request.path)
+
+        if route == ("GET", "/"):
+            return self._root()
+        if route == ("GET", "/capture"):
+            return await self._capture()
+        if route == ("POST", "/restart"):
+            return self._restart()
+        if request.path == "/settings":
+            if request.method == "GET":
+                return Response.json(self.settings)
+            if request.method == "POST":
+                self.settings.update(request.json() or {})
+                return Response.json(self.settings)
+            return Response(status=405, body=b"Method Not Allowed")
+        if request.path == "/lcd":
+            if request.method == "GET":
+                return Response.json(self.lcd)
+            if request.method == "POST":
+                frame = request.json() or {}
+                self.lcd[frame.get("display_id", "lcd_screen_1")] = frame.get("lines", [])
+                self.stats["lcd_frames"] += 1
+                return Response.json({"success": True})
+            return Response(status=405, body=b"Method Not Allowed")
+        if request.path == "/sensors/config":
+            if request.method == "GET":
+                return Response.json(self.sensor_config)
+            if request.method == "POST":
+                for item in (request.json() or {}).get("sensors", []):
+                    self.sensor_config[item["sensor_id"]] = item.get("config", {})
+                self.stats["config_pushes"] += 1
+                return Response.json({"success": True})
+            return Response(status=405, body=b"Method Not Allowed")
+        if route == ("GET", "/sim/stats"):
+            return Response.json({"name": self.name, **self.stats})
+
+        return Response(status=404, body=b"Not found")
+
+    def _root(self) -> Response:
+        uptime = int(time.monotonic() - self.booted_at)
+        html = (
+            "<html><body><h1>ESP32 Camera Server</h1>"
+            f"<p>Uptime: {uptime}s</p>"
+            f"<p>Free Heap: {270556 - self.rng.randrange(0, 4096)} bytes</p>"
+            "<img id='camera' src='/capture' /></body></html>"
+        )
+        return Response(body=html.encode(), content_type="text/html")
+
+    async def _capture(self) -> Response:
+        await self._camera_delay()
+        if self.rng.random() < self.config.failure_rate:
+            self.stats["failures"] += 1
+            return Response(status=500, body=b"Camera capture failed")
+
+        frame = self.frames[self.frame_index % len(self.frames)]
+        self.frame_index += 1
+        self.stats["captures"] += 1
+        self.stats["bytes_sent"] += len(frame)
+        return Response(
+            body=frame,
+            content_type="image/jpeg",
+            headers={"Content-Disposition": "inline; filename=capture.jpg"},
+            bandwidth_bps=self._bandwidth(),
+        )
+
+    def _restart(self) -> Response:
+        self.stats["restarts"] += 1
+        now = time.monotonic()
+        self.offline_until = now + self.config.restart_seconds
+        self.booted_at = self.offline_until
+        logger.info(f"{self.name}: restarting, offline for {self.config.restart_seconds}s")
+        return Response(body=b"Restarting")
+
+
+def build_device(name: str, config: SimulatorConfig, seed: Optional[int]) -> SimulatedDevice:
+    rng = random.Random(seed)
+    if config.images_dir:
+        frames = load_recorded_images(config.images_dir)
+        if not frames:
+            raise SystemExit(f"No JPEG files found in {config.images_dir}")
+    else:
+        # A small pool of distinct frames keeps captures from being byte-identical
+        size = config.image_size_kb * 1024
+        frames = [synthetic_jpeg(int(size * rng.uniform(0.9, 1.1)), rng) for _ in range(8)]
+    return SimulatedDevice(name=name, config=config, frames=frames, rng=rng)
+
+
+async def start_fleet(host: str, port: int, instances: int, config: SimulatorConfig):
+    """Start ``instances`` devices on consecutive ports; returns (devices, servers)"""
+    devices = []
+    servers = []
+    for i in range(instances):
+        seed = None if config.seed is None else config.seed + i
+        device = build_device(f"esp32-sim-{i}", config, seed)
+        # The firmware closes the connection after every response
+        server = await serve(device.handle, host, port + i, keep_alive=False, serialize=config.serialize)
+        devices.append(device)
+        servers.append(server)
+        logger.info(f"{device.name} listening on http://{host}:{port + i}")
+    return devices, servers
+
+
+def parse_args(argv=None):
+    defaults = SimulatorConfig()
+    parser = argparse.ArgumentParser(description="Simulate one or more ESP32 camera boards")
+    parser.add_argument("--host", default=os.getenv("SIM_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SIM_PORT", "8081")))
+    parser.add_argument("--instances", type=int, default=1, help="Number of devices on consecutive ports")
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Mean capture latency")
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms, help="Uniform +/- latency jitter")
+    parser.add_argument("--bandwidth-kbps", type=float, default=defaults.bandwidth_kbps,
+                        help="Transfer rate in KiB/s (0 = unlimited)")
+    parser.add_argument("--failure-rate", type=float, default=defaults.failure_rate,
+                        help="Probability a capture returns HTTP 500")
+    parser.add_argument("--image-size-kb", type=int, default=defaults.image_size_kb,
+                        help="Synthetic JPEG size")
+    parser.add_argument("--images-dir", default=defaults.images_dir, help="Replay recorded JPEGs from this folder")
+    parser.add_argument("--restart-seconds", type=float, default=defaults.restart_seconds)
+    parser.add_argument("--no-serialize", action="store_true",
+                        help="Handle connections concurrently (the real board serves one at a time)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible runs")
+    return parser.parse_args(argv)
+
+
+def config_from_args(args) -> SimulatorConfig:
+    return SimulatorConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        bandwidth_kbps=args.bandwidth_kbps,
+        failure_rate=args.failure_rate,
+        image_size_kb=args.image_size_kb,
+        images_dir=args.images_dir,
+        serialize=not args.no_serialize,
+        restart_seconds=args.restart_seconds,
+        seed=args.seed,
+    )
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    _, servers = await start_fleet(args.host, args.port, args.instances, config_from_args(args))
+    await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Local n8n stand-in
+Implements the parts of the n8n HTTP surface the backend calls, so the n8n
+endpoints, outbox deliveries and workflow cache can be exercised and
+benchmarked without an n8n container:
+
+- ``GET /healthz``
+- ``GET /api/v1/workflows``, ``GET /api/v1/workflows/{id}`` (ETag / 304)
+  and ``PATCH /api/v1/workflows/{id}`` to (de)activate
+- ``GET /api/v1/executions``, newest first, with status/workflowId filters and
+  cursors keyed on execution id (stable while webhooks add executions)
+- ``POST /webhook/{name}`` and ``/webhook-test/{name}``, recording every payload
+
+Latency and failures can be injected; the API requires the same API key or
+basic auth as the real instance when they are configured. Recorded
+payloads and counters are served under ``/stub/``.
+
+Run from the backend directory:
+    python -m tools.n8n_stub --port 5679
+    python -m tools.n8n_stub --latency-ms 50 --failure-rate 0.1 --fail-on webhook
+
+Then point the backend at it:
+    N8N_URL=http://127.0.0.1:5679 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, Optional
+
+from tools.simhttp import Request, Response, serve
+
+logger = logging.getLogger("n8n_stub")
+
+# Scopes failure injection can be limited to
+FAIL_SCOPES = ("all", "api", "webhook")
+EXECUTION_STATUSES = ("success", "error", "waiting")
+PAGE_DEFAULT = 100
+PAGE_MAX = 250
+
+
+@dataclass
+class StubConfig:
+    """Behaviour knobs for the stand-in"""
+    latency_ms: float = float(os.getenv("N8N_STUB_LATENCY_MS", "0"))
+    jitter_ms: float = float(os.getenv("N8N_STUB_JITTER_MS", "0"))
+    failure_rate: float = float(os.getenv("N8N_STUB_FAILURE_RATE", "0"))
+    failure_status: int = int(os.getenv("N8N_STUB_FAILURE_STATUS", "503"))  # 0 = drop the connection
+    fail_on: str = os.getenv("N8N_STUB_FAIL_ON", "all")
+    api_key: str = os.getenv("N8N_STUB_API_KEY", "")
+    basic_auth: str = os.getenv("N8N_STUB_BASIC_AUTH", "")  # user:password
+    workflows: int = int(os.getenv("N8N_STUB_WORKFLOWS", "5"))
+    executions: int = int(os.getenv("N8N_STUB_EXECUTIONS", "200"))
+    execution_limit: int = int(os.getenv("N8N_STUB_EXECUTION_LIMIT", "10000"))  # oldest are dropped
+    record_limit: int = int(os.getenv("N8N_STUB_RECORD_LIMIT", "1000"))
+    seed: Optional[int] = None
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _etag(data) -> str:
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+    return f'W/"{digest[:16]}"'
+
+
+def _encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"lastId": last_id}).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> int:
+    return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["lastId"])
+
+
+class N8nStub:
+    """In-memory workflows and executions plus a recorder for webhook calls"""
+
+    def __init__(self, config: Optional[StubConfig] = None):
+        self.config = config or StubConfig()
+        if self.config.fail_on not in FAIL_SCOPES:
+            raise ValueError(f"fail_on must be one of {', '.join(FAIL_SCOPES)}")
+        self.rng = random.Random(self.config.seed)
+        self.started_at = time.time()
+        self.workflows: Dict[str, dict] = {}
+        # Oldest first with consecutive ids, so an id maps straight to a position
+        self.executions: Deque[dict] = deque(maxlen=self.config.execution_limit)
+        self.next_execution_id = 1
+        self.webhook_counts: Dict[str, int] = {}
+        self.received: Deque[dict] = deque(maxlen=self.config.record_limit)
+        self.stats: Dict[str, int] = {
+            "requests": 0, "webhooks": 0, "injected_failures": 0, "unauthorized": 0, "not_modified": 0,
+        }
+        self._auth_headers = self._expected_auth()
+        self._seed_data()
+
+    # Data
+
+    def _seed_data(self):
+        now = datetime.now(timezone.utc)
+        for i in range(1, self.config.workflows + 1):
+            workflow_id = str(i)
+            self.workflows[workflow_id] = {
+                "id": workflow_id,
+                "name": f"Stub workflow {i}",
+                "active": i % 2 == 1,
+                "createdAt": _iso(now - timedelta(days=30)),
+                "updatedAt": _iso(now - timedelta(days=30)),
+                "tags": [],
+                "nodes": [
+                    {"name": "Webhook", "type": "n8n-nodes-base.webhook", "parameters": {"path": f"workflow-{i}"}},
+                    {"name": "NoOp", "type": "n8n-nodes-base.noOp", "parameters": {}},
+                ],
+                "connections": {"Webhook": {"main": [[{"node": "NoOp", "type": "main", "index": 0}]]}},
+            }
+        workflow_ids = list(self.workflows) or [None]
+        for i in range(self.config.executions, 0, -1):
+            self._add_execution(
+                self.rng.choice(workflow_ids), self.rng.choice(EXECUTION_STATUSES), now - timedelta(minutes=i), None
+            )
+
+    def _add_execution(self, workflow_id: Optional[str], status: str, started: datetime, data: Optional[dict]):
+        self.executions.append({
+            "id": str(self.next_execution_id),
+            "finished": status != "waiting",
+            "mode": "webhook",
+            "status": status,
+            "startedAt": _iso(started),
+            "stoppedAt": None if status == "waiting" else _iso(started + timedelta(milliseconds=120)),
+            "workflowId": workflow_id,
+            "data": data or {"resultData": {"runData": {}}},
+        })
+        self.next_execution_id += 1
+
+    # Request handling
+
+    def _expected_auth(self) -> List[tuple]:
+        expected = []
+        if self.config.api_key:
+            expected.append(("x-n8n-api-key", self.config.api_key))
+        if self.config.basic_auth:
+            expected.append(("authorization", f"Basic {base64.b64encode(self.config.basic_auth.encode()).decode()}"))
+        return expected
+
+    def _authorized(self, request: Request) -> bool:
+        if not self._auth_headers:
+            return True
+        return any(request.headers.get(name) == value for name, value in self._auth_headers)
+
+    def _should_fail(self, scope: str) -> bool:
+        if self.config.failure_rate <= 0 or self.config.fail_on not in ("all", scope):
+            return False
+        return self.rng.random() < self.config.failure_rate
+
+    async def _delay(self):
+        delay_ms = self.config.latency_ms + self.rng.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+
+    async def handle(self, request: Request) -> Optional[Response]:
+        path = request.path.rstrip("/") or "/"
+        if path.startswith("/stub/"):
+            return self._stub(request, path)
+
+        self.stats["requests"] += 1
+        await self._delay()
+        scope = "api" if path.startswith("/api/") else "webhook"
+        if path != "/healthz" and self._should_fail(scope):
+            self.stats["injected_failures"] += 1
+            if not self.config.failure_status:
+                return None
+            return Response.json({"message": "Injected failure"}, status=self.config.failure_status)
+
+        if path == "/healthz":
+            return Response.json({"status": "ok"})
+        for prefix in ("/webhook/", "/webhook-test/"):
+            if path.startswith(prefix):
+                return self._webhook(request, path[len(prefix):])
+        if path.startswith("/api/v1/"):
+            if not self._authorized(request):
+                self.stats["unauthorized"] += 1
+                return Response.json({"message": "unauthorized"}, status=401)
+            return self._api(request, path[len("/api/v1"):])
+        return Response(status=404, body=b"Not found")
+
+    def _api(self, request: Request, path: str) -> Response:
+        parts = path.strip("/").split("/")
+        if parts[0] == "workflows":
+            if len(parts) == 1 and request.method == "GET":
+                return self._conditional(request, {"data": list(self.workflows.values()), "nextCursor": None})
+            if len(parts) == 2:
+                workflow = self.workflows.get(parts[1])
+                if workflow is None:
+                    return Response.json({"message": "Not Found"}, status=404)
+                if request.method == "GET":
+                    return self._conditional(request, workflow)
+                if request.method == "PATCH":
+                    return self._update_workflow(workflow, request.json() or {})
+            return Response(status=405, body=b"Method Not Allowed")
+        if parts[0] == "executions" and len(parts) == 1 and request.method == "GET":
+            return self._list_executions(request.query)
+        return Response.json({"message": "Not Found"}, status=404)
+
+    def _conditional(self, request: Request, data) -> Response:
+        etag = _etag(data)
+        if request.headers.get("if-none-match") == etag:
+            self.stats["not_modified"] += 1
+            return Response(status=304, headers={"ETag": etag})
+        response = Response.json(data)
+        response.headers["ETag"] = etag
+        return response
+
+    def _update_workflow(self, workflow: dict, changes: dict) -> Response:
+        if "active" in changes:
+            workflow["active"] = bool(changes["active"])
+        if "name" in changes:
+            workflow["name"] = str(changes["name"])
+        workflow["updatedAt"] = _iso(datetime.now(timezone.utc))
+        return Response.json(workflow)
+
+    def _list_executions(self, query: Dict[str, str]) -> Response:
+        try:
+            limit = min(PAGE_MAX, max(1, int(query.get("limit", PAGE_DEFAULT))))
+            before = _decode_cursor(query["cursor"]) if query.get("cursor") else self.next_execution_id
+        except (ValueError, KeyError, TypeError):
+            return Response.json({"message": "Invalid limit or cursor"}, status=400)
+
+        # Walk back from the newest execution older than the cursor; one extra match tells if there is more
+        status, workflow_id = query.get("status"), query.get("workflowId")
+        first_id = self.next_execution_id - len(self.executions)
+        pos = min(before - first_id, len(self.executions)) - 1
+        page = []
+        while pos >= 0 and len(page) <= limit:
+            execution = self.executions[pos]
+            pos -= 1
+            if (not status or execution["status"] == status) and (not workflow_id or execution["workflowId"] == workflow_id):
+                page.append(execution)
+        next_cursor = _encode_cursor(int(page[limit - 1]["id"])) if len(page) > limit else None
+        page = page[:limit]
+        if query.get("includeData") != "true":
+            page = [{k: v for k, v in e.items() if k != "data"} for e in page]
+        return Response.json({"data": page, "nextCursor": next_cursor})
+
+    def _webhook(self, request: Request, name: str) -> Response:
+        if not name:
+            return Response.json({"message": "Webhook not registered"}, status=404)
+        try:
+            body = request.json()
+        except ValueError:
+            body = request.body.decode("utf-8", "replace")
+        self.webhook_counts[name] = self.webhook_counts.get(name, 0) + 1
+        self.stats["webhooks"] += 1
+        self.received.append({
+            "webhook": name,
+            "method": request.method,
+            "received_at": time.time(),
+            "body": body,
+        })
+        workflow_id = next(
+            (w["id"] for w in self.workflows.values()
+             if any(n["parameters"].get("path") == name for n in w["nodes"])),
+            None,
+        )
+        self._add_execution(
+            workflow_id, "success", datetime.now(timezone.utc),
+            {"resultData": {"runData": {"Webhook": [{"data": {"main": [[{"json": body}]]}}]}}},
+        )
+        return Response.json({"message": "Workflow was started"})
+
+    # Inspection
+
+    def _stub(self, request: Request, path: str) -> Response:
+        if path == "/stub/stats" and request.method == "GET":
+            return Response.json(self.snapshot())
+        if path == "/stub/received":
+            if request.method == "GET":
+                name = request.query.get("webhook")
+                items = [r for r in self.received if name is None or r["webhook"] == name]
+                return Response.json({"count": len(items), "received": items})
+            if request.method == "DELETE":
+                self.reset()
+                return Response.json({"success": True})
+            return Response(status=405, body=b"Method Not Allowed")
+        return Response(status=404, body=b"Not found")
+
+    def reset(self):
+        """Forget recorded payloads and counters"""
+        self.received.clear()
+        self.webhook_counts.clear()
+        for key in self.stats:
+            self.stats[key] = 0
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "webhook_counts": dict(self.webhook_counts),
+            "recorded": len(self.received),
+            "workflows": len(self.workflows),
+            "executions": len(self.executions),
+        }
+
+
+async def start_stub(host: str, port: int, config: Optional[StubConfig] = None):
+    """Start the stand-in; returns (stub, server)"""
+    stub = N8nStub(config)
+    server = await serve(stub.handle, host, port)
+    return stub, server
+
+
+def parse_args(argv=None):
+    defaults = StubConfig()
+    parser = argparse.ArgumentParser(description="Local n8n stand-in")
+    parser.add_argument("--host", default=os.getenv("N8N_STUB_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("N8N_STUB_PORT", "5679")))
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms, help="Uniform +/- latency jitter")
+    parser.add_argument("--failure-rate", type=float, default=defaults.failure_rate,
+                        help="Probability a request fails")
+    parser.add_argument("--failure-status", type=int, default=defaults.failure_status,
+                        help="Status of injected failures (0 = drop the connection)")
+    parser.add_argument("--fail-on", choices=FAIL_SCOPES, default=defaults.fail_on,
+                        help="Inject failures into API calls, webhooks or both")
+    parser.add_argument("--api-key", default=defaults.api_key, help="Require this X-N8N-API-KEY on /api/v1")
+    parser.add_argument("--basic-auth", default=defaults.basic_auth, help="Accept this user:password on /api/v1")
+    parser.add_argument("--workflows", type=int, default=defaults.workflows, help="Workflows to serve")
+    parser.add_argument("--executions", type=int, default=defaults.executions, help="Past executions to serve")
+    parser.add_argument("--execution-limit", type=int, default=defaults.execution_limit,
+                        help="Executions kept; webhooks add one each and the oldest are dropped")
+    parser.add_argument("--record-limit", type=int, default=defaults.record_limit,
+                        help="Webhook payloads kept for /stub/received")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible runs")
+    return parser.parse_args(argv)
+
+
+def config_from_args(args) -> StubConfig:
+    return StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+        fail_on=args.fail_on,
+        api_key=args.api_key,
+        basic_auth=args.basic_auth,
+        workflows=args.workflows,
+        executions=args.executions,
+        execution_limit=args.execution_limit,
+        record_limit=args.record_limit,
+        seed=args.seed,
+    )
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    _, server = await start_stub(args.host, args.port, config_from_args(args))
+    logger.info(f"n8n stand-in listening on http://{args.host}:{args.port}")
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
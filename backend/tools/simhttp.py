@@ -0,0 +1,181 @@
+"""
+Minimal asyncio HTTP/1.1 server used by the local simulators
+
+Only implements what the simulators need: request line, headers,
+Content-Length bodies, keep-alive and paced (bandwidth-limited) writes.
+It is not meant to be exposed to untrusted networks.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    202: "Accepted",
+    204: "No Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+}
+
+MAX_HEADER_BYTES = 64 * 1024
+WRITE_CHUNK_BYTES = 4096
+
+
+@dataclass
+class Request:
+    """Parsed HTTP request"""
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes = b""
+
+    def json(self):
+        return json.loads(self.body or b"null")
+
+
+@dataclass
+class Response:
+    """HTTP response; ``bandwidth_bps`` paces the body write when set"""
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain"
+    headers: Dict[str, str] = field(default_factory=dict)
+    bandwidth_bps: Optional[float] = None
+
+    @classmethod
+    def json(cls, data, status: int = 200) -> "Response":
+        return cls(status=status, body=json.dumps(data).encode(), content_type="application/json")
+
+
+# A handler returning None drops the connection without answering
+Handler = Callable[[Request], Awaitable[Optional[Response]]]
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise ValueError("Request header too large")
+
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    body = b""
+    length = int(headers.get("content-length", "0") or 0)
+    if length:
+        body = await reader.readexactly(length)
+
+    url = urlsplit(target)
+    return Request(
+        method=method.upper(),
+        path=url.path,
+        query=dict(parse_qsl(url.query)),
+        headers=headers,
+        body=body,
+    )
+
+
+async def _write_response(writer: asyncio.StreamWriter, response: Response, keep_alive: bool):
+    reason = REASONS.get(response.status, "")
+    headers = {
+        "Content-Type": response.content_type,
+        "Content-Length": str(len(response.body)),
+        "Connection": "keep-alive" if keep_alive else "close",
+        **response.headers,
+    }
+    head = f"HTTP/1.1 {response.status} {reason}\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    writer.write(head.encode("latin-1") + b"\r\n")
+
+    if not response.bandwidth_bps:
+        writer.write(response.body)
+        await writer.drain()
+        return
+
+    # Pace the body so the transfer takes len/bandwidth seconds overall
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    view = memoryview(response.body)
+    sent = 0
+    while sent < len(view):
+        chunk = view[sent:sent + WRITE_CHUNK_BYTES]
+        writer.write(chunk)
+        await writer.drain()
+        sent += len(chunk)
+        delay = start + sent / response.bandwidth_bps - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def serve(
+    handler: Handler,
+    host: str,
+    port: int,
+    *,
+    keep_alive: bool = True,
+    serialize: bool = False,
+) -> asyncio.AbstractServer:
+    """
+    Start an HTTP server calling ``handler`` for every request
+
+    With ``serialize`` only one connection is handled at a time, like the
+    single-threaded Arduino ``WebServer`` on the ESP32.
+    """
+    gate = asyncio.Lock() if serialize else None
+
+    async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError):
+                    break
+                if request is None:
+                    break
+
+                wants_keep_alive = keep_alive and request.headers.get("connection", "").lower() != "close"
+                try:
+                    response = await handler(request)
+                except Exception as e:
+                    logger.exception(f"Simulator handler failed: {str(e)}")
+                    response = Response(status=500, body=b"Internal error")
+                if response is None:
+                    break
+
+                await _write_response(writer, response, wants_keep_alive)
+                if not wants_keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if gate is None:
+            await handle_connection(reader, writer)
+            return
+        async with gate:
+            await handle_connection(reader, writer)
+
+    return await asyncio.start_server(on_connect, host, port, limit=MAX_HEADER_BYTES)